@@ -6,7 +6,22 @@ require('dotenv').config();
 
 const app = express();
 const PORT = process.env.PORT || 3000;
-const PYTHON_SERVICE_URL = process.env.PYTHON_SERVICE_URL || 'http://localhost:8001';
+// Socket de escuta herdado do manager (handoff); sem ele, abre a porta
+const LISTEN_FD = process.env.LISTEN_FD ? parseInt(process.env.LISTEN_FD, 10) : null;
+// Mutável: o manager troca o upstream durante um restart blue/green.
+// Com réplicas do serviço Python, PYTHON_SERVICE_URLS lista todas (round-robin)
+const parseUpstreams = (value) => value.split(',').map(url => url.trim().replace(/\/+$/, '')).filter(Boolean);
+let PYTHON_SERVICE_URLS = parseUpstreams(
+  process.env.PYTHON_SERVICE_URLS || process.env.PYTHON_SERVICE_URL || 'http://localhost:8001'
+);
+let PYTHON_SERVICE_URL = PYTHON_SERVICE_URLS[0];
+let upstreamIndex = 0;
+
+const nextPythonUpstream = () => {
+  const url = PYTHON_SERVICE_URLS[upstreamIndex % PYTHON_SERVICE_URLS.length];
+  upstreamIndex = (upstreamIndex + 1) % PYTHON_SERVICE_URLS.length;
+  return url;
+};
 
 // Configuração de logging para console
 const consoleLog = (level, message) => {
@@ -18,6 +33,37 @@ const consoleLog = (level, message) => {
 app.use(cors());
 app.use(bodyParser.json());
 
+// Drenagem: o manager pede /admin/drain antes de parar o processo; novas
+// requisições recebem 503 e as em andamento terminam normalmente
+const DRAIN_EXEMPT_PATHS = ['/health', '/admin/drain', '/admin/inflight'];
+let inflight = 0;
+let served = 0;
+let draining = false;
+let drainStartedAt = null;
+
+app.use((req, res, next) => {
+  if (DRAIN_EXEMPT_PATHS.includes(req.path)) {
+    return next();
+  }
+  if (draining) {
+    res.set('Retry-After', '2');
+    res.set('Connection', 'close');
+    return res.status(503).json({ error: 'Service draining' });
+  }
+  inflight++;
+  let done = false;
+  const release = () => {
+    if (!done) {
+      done = true;
+      inflight--;
+      served++;
+    }
+  };
+  res.on('finish', release);
+  res.on('close', release);
+  next();
+});
+
 // Middleware de autenticação
 const authenticateApiKey = (req, res, next) => {
   const apiKey = req.headers['x-api-key'];
@@ -48,8 +94,11 @@ app.get('/health', (req, res) => {
     service: 'Telegram Query Bridge API',
     version: '1.0.0',
     python_service_url: PYTHON_SERVICE_URL,
+    python_service_urls: PYTHON_SERVICE_URLS,
     node_version: process.version,
-    platform: process.platform
+    platform: process.platform,
+    inflight,
+    draining
   };
   
   consoleLog('info', `Health check response: ${JSON.stringify(healthData)}`);
@@ -102,10 +151,11 @@ app.post('/query', authenticateApiKey, async (req, res) => {
       }
 
       const command = `${commandMap[type]} ${query}`;
+      const upstream = nextPythonUpstream();
 
       // Verificar se o serviço Python está disponível antes de enviar
       try {
-        const healthCheck = await axios.get(`${PYTHON_SERVICE_URL}/health`, { timeout: 5000 });
+        const healthCheck = await axios.get(`${upstream}/health`, { timeout: 5000 });
         
         if (!healthCheck.data.telegram_connected && healthCheck.data.status !== 'OK') {
           console.warn('Python service não está totalmente conectado ao Telegram, tentando mesmo assim...');
@@ -115,12 +165,12 @@ app.post('/query', authenticateApiKey, async (req, res) => {
         return res.status(503).json({
           error: "Service unavailable",
           details: "Python service is not responding",
-          python_service_url: PYTHON_SERVICE_URL
+          python_service_url: upstream
         });
       }
 
       // Enviar requisição para o serviço Python com timeout aumentado
-      const pythonResponse = await axios.post(`${PYTHON_SERVICE_URL}/send-command`, {
+      const pythonResponse = await axios.post(`${upstream}/send-command`, {
         command: `${commandMap[type]} ${query}`
       }, {
         timeout: 30000,
@@ -186,7 +236,7 @@ app.post('/send-command', authenticateApiKey, async (req, res) => {
       }
 
       // Enviar requisição para o serviço Python com timeout aumentado
-      const response = await axios.post(`${PYTHON_SERVICE_URL}/send-command`, {
+      const response = await axios.post(`${nextPythonUpstream()}/send-command`, {
         command: command,
         timeout: 45000 // 45 segundos timeout aumentado
       }, {
@@ -244,6 +294,43 @@ app.post('/send-command', authenticateApiKey, async (req, res) => {
   });
 });
 
+// Troca do upstream Python (usado pelo manager no blue/green)
+app.post('/admin/upstream', authenticateApiKey, (req, res) => {
+  const { python_service_url, python_service_urls } = req.body;
+  const urls = Array.isArray(python_service_urls) ? python_service_urls : [python_service_url];
+
+  if (!urls.length || !urls.every(url => typeof url === 'string' && /^https?:\/\/[^\s,]+$/.test(url))) {
+    return res.status(400).json({ error: 'Invalid python_service_url' });
+  }
+
+  const previous = PYTHON_SERVICE_URLS;
+  PYTHON_SERVICE_URLS = urls.map(url => url.replace(/\/+$/, ''));
+  PYTHON_SERVICE_URL = PYTHON_SERVICE_URLS[0];
+  upstreamIndex = 0;
+  consoleLog('info', `Upstream Python alterado: ${previous.join(',')} -> ${PYTHON_SERVICE_URLS.join(',')}`);
+  res.json({ success: true, previous, python_service_url: PYTHON_SERVICE_URL, python_service_urls: PYTHON_SERVICE_URLS });
+});
+
+// Protocolo de drenagem (usado pelo manager antes de parar o processo)
+app.post('/admin/drain', authenticateApiKey, (req, res) => {
+  if (!draining) {
+    draining = true;
+    drainStartedAt = new Date().toISOString();
+    consoleLog('info', `Drenagem iniciada com ${inflight} requisições em andamento`);
+  }
+  res.json({ inflight, draining, drain_started_at: drainStartedAt, served });
+});
+
+app.delete('/admin/drain', authenticateApiKey, (req, res) => {
+  draining = false;
+  drainStartedAt = null;
+  res.json({ inflight, draining, drain_started_at: drainStartedAt, served });
+});
+
+app.get('/admin/inflight', authenticateApiKey, (req, res) => {
+  res.json({ inflight, draining, drain_started_at: drainStartedAt, served });
+});
+
 // Rota para verificar status do proxy
 app.get('/proxy/status', authenticateApiKey, (req, res) => {
   res.json({
@@ -259,8 +346,10 @@ app.get('/proxy/status', authenticateApiKey, (req, res) => {
 });
 
 // Iniciar servidor
-const server = app.listen(PORT, () => {
-  consoleLog('info', `Servidor Node.js iniciado na porta ${PORT}`);
+const server = app.listen(LISTEN_FD !== null ? { fd: LISTEN_FD } : PORT, () => {
+  consoleLog('info', LISTEN_FD !== null
+    ? `Servidor Node.js iniciado no socket herdado (fd ${LISTEN_FD}, porta ${PORT})`
+    : `Servidor Node.js iniciado na porta ${PORT}`);
   consoleLog('info', `Python Service URL: ${PYTHON_SERVICE_URL}`);
   consoleLog('info', 'Health check disponível em /health');
   consoleLog('info', 'API endpoints disponíveis em /query e /send-command');
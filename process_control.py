@@ -0,0 +1,397 @@
+"""
+Controle de árvores de processos dos serviços supervisionados
+Cada serviço nasce no seu próprio grupo de processos (e, no Linux, opcionalmente
+num cgroup v2 próprio); parar, matar e medir viram uma operação sobre o grupo,
+sem varrer conexões de todos os processos do sistema
+"""
+
+import os
+import json
+import time
+import signal
+import logging
+import subprocess
+from typing import Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+IS_WINDOWS = os.name == 'nt'
+
+# Diretório cgroup v2 delegado ao manager (ex.: /sys/fs/cgroup/telegram-bridge,
+# com Delegate=yes no systemd); vazio = só grupos de processos
+SERVICE_CGROUP_ROOT = os.getenv('SERVICE_CGROUP_ROOT', '')
+CGROUP_FS = '/sys/fs/cgroup'
+CGROUP_CONTROLLERS = ('cpu', 'memory', 'io')
+
+# Limites por serviço (chave = nome do cgroup, ex. "python-8011", ou só o
+# serviço, ex. "python"); memória aceita sufixos do kernel (K, M, G) ou "max".
+# O owner do Telegram recebe mais CPU/IO que o Node por padrão.
+DEFAULT_CGROUP_LIMITS = {
+    'python': {'cpu_weight': 200, 'io_weight': 200, 'memory_high': 'max', 'memory_max': 'max'},
+    'node': {'cpu_weight': 100, 'io_weight': 100, 'memory_high': 'max', 'memory_max': 'max'},
+}
+PSI_RESOURCES = ('cpu', 'memory', 'io')
+
+
+def load_cgroup_limits() -> Dict[str, Dict]:
+    """Limites padrão sobrescritos por SERVICE_CGROUP_LIMITS (JSON)
+
+    Exemplo: {"python": {"memory_high": "768M", "memory_max": "1G"}, "node": {"cpu_weight": 50}}
+    """
+    limits = {name: dict(values) for name, values in DEFAULT_CGROUP_LIMITS.items()}
+    raw = os.getenv('SERVICE_CGROUP_LIMITS')
+    if raw:
+        try:
+            for name, values in json.loads(raw).items():
+                limits.setdefault(name, {}).update(values)
+        except (ValueError, AttributeError) as e:
+            logger.error(f"SERVICE_CGROUP_LIMITS inválido, usando padrões: {e}")
+    return limits
+
+
+CGROUP_LIMITS = load_cgroup_limits()
+
+
+def cgroups_available() -> bool:
+    """cgroup v2 montado e diretório raiz configurado e gravável"""
+    if IS_WINDOWS or not SERVICE_CGROUP_ROOT:
+        return False
+    if not os.path.exists(os.path.join(CGROUP_FS, 'cgroup.controllers')):
+        return False
+    try:
+        os.makedirs(SERVICE_CGROUP_ROOT, exist_ok=True)
+    except OSError:
+        return False
+    return os.access(SERVICE_CGROUP_ROOT, os.W_OK)
+
+
+CGROUPS_ENABLED = cgroups_available()
+if SERVICE_CGROUP_ROOT and not CGROUPS_ENABLED:
+    logger.warning(f"cgroup v2 indisponível em {SERVICE_CGROUP_ROOT}, usando apenas grupos de processos")
+
+
+def cgroup_path(name: str) -> Optional[str]:
+    return os.path.join(SERVICE_CGROUP_ROOT, name) if CGROUPS_ENABLED else None
+
+
+def _read_cgroup_file(path: str, filename: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, filename)) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_cgroup_file(path: str, filename: str, value: str) -> bool:
+    try:
+        with open(os.path.join(path, filename), 'w') as f:
+            f.write(value)
+        return True
+    except OSError as e:
+        logger.warning(f"Falha ao gravar {filename} em {path}: {e}")
+        return False
+
+
+def enable_controllers():
+    """Habilita cpu/memory/io para os cgroups dos serviços (subtree_control da raiz)"""
+    available = (_read_cgroup_file(SERVICE_CGROUP_ROOT, 'cgroup.controllers') or '').split()
+    wanted = [c for c in CGROUP_CONTROLLERS if c in available]
+    missing = [c for c in CGROUP_CONTROLLERS if c not in available]
+    if missing:
+        logger.warning(f"Controladores cgroup ausentes em {SERVICE_CGROUP_ROOT}: {', '.join(missing)}")
+    if wanted:
+        _write_cgroup_file(SERVICE_CGROUP_ROOT, 'cgroup.subtree_control',
+                           ' '.join(f"+{c}" for c in wanted))
+
+
+if CGROUPS_ENABLED:
+    enable_controllers()
+
+
+def limits_for(name: str) -> Dict:
+    """Limites do cgroup: configuração do nome exato ou, na falta, do serviço"""
+    service = name.rsplit('-', 1)[0]
+    return CGROUP_LIMITS.get(name) or CGROUP_LIMITS.get(service) or {}
+
+
+def apply_limits(name: str):
+    """Grava cpu.weight, io.weight, memory.high e memory.max do cgroup do serviço"""
+    path = cgroup_path(name)
+    if path is None:
+        return
+    limits = limits_for(name)
+    if limits.get('cpu_weight') is not None:
+        _write_cgroup_file(path, 'cpu.weight', str(int(limits['cpu_weight'])))
+    if limits.get('io_weight') is not None and os.path.exists(os.path.join(path, 'io.weight')):
+        _write_cgroup_file(path, 'io.weight', f"default {int(limits['io_weight'])}")
+    # memory.high primeiro: com memory.max menor que o high atual o kernel recusa
+    for key, filename in (('memory_high', 'memory.high'), ('memory_max', 'memory.max')):
+        if limits.get(key) is not None:
+            _write_cgroup_file(path, filename, str(limits[key]))
+
+
+def popen_kwargs() -> dict:
+    """Argumentos do Popen para o filho liderar um grupo de processos novo
+
+    Sinais do terminal (Ctrl+C no manager) também deixam de atingir os filhos.
+    """
+    if IS_WINDOWS:
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def spawn(name: str, cmd: List[str], **kwargs) -> subprocess.Popen:
+    """Inicia o serviço no seu grupo de processos (e cgroup, se habilitado)
+
+    O filho é movido para o cgroup logo após o fork; processos que ele criar
+    depois disso (workers do uvicorn, filhos do Node) já nascem lá dentro.
+    """
+    process = subprocess.Popen(cmd, **popen_kwargs(), **kwargs)
+    # Usado por terminate/kill para achar o cgroup do serviço
+    process.group_name = name
+    # Identidade do líder: o PID pode ser reaproveitado depois que ele sair
+    process.create_time = process_create_time(process.pid)
+    path = cgroup_path(name)
+    if path is not None:
+        try:
+            os.makedirs(path, exist_ok=True)
+            apply_limits(name)
+            _write_cgroup_file(path, 'cgroup.procs', str(process.pid))
+        except OSError as e:
+            logger.warning(f"Não foi possível criar o cgroup {path}: {e}")
+    return process
+
+
+def process_create_time(pid: int) -> Optional[float]:
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+def _same_process(pid: int, create_time: Optional[float]) -> Optional[psutil.Process]:
+    """Processo com esse PID, desde que o create_time confira (None = não conferir)"""
+    try:
+        proc = psutil.Process(pid)
+        if create_time is not None and abs(proc.create_time() - create_time) > 0.01:
+            # PID reaproveitado por outro processo
+            return None
+        return proc
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+def signal_group(pid: int, sig: int, create_time: Optional[float] = None) -> bool:
+    """Envia o sinal ao grupo liderado por pid
+
+    O kernel não reaproveita um PID enquanto existir um grupo com esse id, então
+    o grupo continua alcançável mesmo depois que o líder saiu. Processos que não
+    lideram um grupo (iniciados antes desta versão) recebem o sinal junto com
+    seus descendentes, só se o create_time do líder conferir.
+    """
+    if not IS_WINDOWS:
+        try:
+            os.killpg(pid, sig)
+            return True
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            return False
+    parent = _same_process(pid, create_time)
+    if parent is None:
+        return False
+    try:
+        targets = parent.children(recursive=True) + [parent]
+    except psutil.NoSuchProcess:
+        return False
+    for proc in targets:
+        try:
+            proc.send_signal(sig)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return True
+
+
+def terminate_group(pid: int, create_time: Optional[float] = None) -> bool:
+    if IS_WINDOWS:
+        proc = _same_process(pid, create_time)
+        try:
+            proc.send_signal(signal.CTRL_BREAK_EVENT)
+            return True
+        except (AttributeError, psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+    return signal_group(pid, signal.SIGTERM, create_time)
+
+
+def kill_group(pid: int, name: Optional[str] = None, create_time: Optional[float] = None) -> bool:
+    """SIGKILL no grupo; com cgroup, cgroup.kill alcança até quem saiu do grupo"""
+    path = cgroup_path(name) if name else None
+    if path is not None and os.path.exists(os.path.join(path, 'cgroup.kill')):
+        if _write_cgroup_file(path, 'cgroup.kill', '1'):
+            return True
+    if IS_WINDOWS:
+        parent = _same_process(pid, create_time)
+        try:
+            for proc in parent.children(recursive=True) + [parent]:
+                proc.kill()
+            return True
+        except (AttributeError, psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+    return signal_group(pid, signal.SIGKILL, create_time)
+
+
+def group_pids(pid: int, name: Optional[str] = None) -> List[int]:
+    """PIDs vivos do serviço: cgroup.procs ou o líder e seus descendentes"""
+    path = cgroup_path(name) if name else None
+    if path is not None:
+        content = _read_cgroup_file(path, 'cgroup.procs')
+        if content is not None:
+            return [int(line) for line in content.split()]
+    try:
+        parent = psutil.Process(pid)
+        return [parent.pid] + [child.pid for child in parent.children(recursive=True)]
+    except psutil.NoSuchProcess:
+        return []
+
+
+def group_alive(pid: int, name: Optional[str] = None, create_time: Optional[float] = None) -> bool:
+    """Algum processo do serviço ainda existe (inclusive filhos órfãos do líder)"""
+    if name and cgroup_path(name) is not None:
+        return bool(group_pids(pid, name))
+    if not IS_WINDOWS:
+        try:
+            os.killpg(pid, 0)
+            return True
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            return True
+    proc = _same_process(pid, create_time)
+    try:
+        return proc is not None and proc.status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def remove_cgroup(name: str):
+    """Apaga o cgroup vazio do serviço depois que ele parou"""
+    path = cgroup_path(name)
+    if path is None:
+        return
+    try:
+        os.rmdir(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"cgroup {path} ainda em uso: {e}")
+
+
+def group_usage(pid: int, name: Optional[str] = None) -> Dict:
+    """Memória e CPU do serviço inteiro (líder + filhos)"""
+    path = cgroup_path(name) if name else None
+    if path is not None:
+        memory = _read_cgroup_file(path, 'memory.current')
+        cpu_stat = _read_cgroup_file(path, 'cpu.stat') or ''
+        cpu = dict(line.split() for line in cpu_stat.splitlines() if len(line.split()) == 2)
+        return {
+            "source": "cgroup",
+            "processes": len(group_pids(pid, name)),
+            "memory_mb": round(int(memory) / 1024 / 1024, 2) if memory else None,
+            "cpu_seconds": round(int(cpu['usage_usec']) / 1e6, 2) if 'usage_usec' in cpu else None
+        }
+    rss = 0
+    cpu_seconds = 0.0
+    pids = group_pids(pid)
+    for member in pids:
+        try:
+            proc = psutil.Process(member)
+            rss += proc.memory_info().rss
+            times = proc.cpu_times()
+            cpu_seconds += times.user + times.system
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return {
+        "source": "process_group",
+        "processes": len(pids),
+        "memory_mb": round(rss / 1024 / 1024, 2),
+        "cpu_seconds": round(cpu_seconds, 2)
+    }
+
+
+def stop_group_sync(pid: int, name: Optional[str] = None, grace: float = 3,
+                    create_time: Optional[float] = None) -> bool:
+    """SIGTERM no grupo, espera até grace segundos e SIGKILL no que sobrar"""
+    terminate_group(pid, create_time)
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        if not group_alive(pid, name, create_time):
+            break
+        time.sleep(0.1)
+    else:
+        kill_group(pid, name, create_time)
+    if name:
+        remove_cgroup(name)
+    return True
+
+
+def listener_pid(port: int) -> Optional[int]:
+    """PID que escuta na porta, numa única leitura da tabela de sockets do kernel"""
+    try:
+        for conn in psutil.net_connections(kind='tcp'):
+            if conn.status == psutil.CONN_LISTEN and conn.laddr.port == port and conn.pid:
+                if conn.pid != os.getpid():
+                    return conn.pid
+    except (psutil.AccessDenied, OSError) as e:
+        logger.error(f"Erro ao buscar PID pela porta {port}: {e}")
+    return None
+
+
+def parse_pressure(content: Optional[str]) -> Optional[Dict]:
+    """Linhas PSI ("some avg10=0.12 avg60=... total=...") em dicionário"""
+    if not content:
+        return None
+    result = {}
+    for line in content.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        values = dict(part.split('=', 1) for part in parts[1:] if '=' in part)
+        result[parts[0]] = {
+            "avg10": float(values.get('avg10', 0)),
+            "avg60": float(values.get('avg60', 0)),
+            "avg300": float(values.get('avg300', 0)),
+            "total_us": int(values.get('total', 0))
+        }
+    return result
+
+
+def cgroup_stats(name: Optional[str]) -> Optional[Dict]:
+    """Limites efetivos, pressão (PSI) e memory.events do cgroup do serviço"""
+    path = cgroup_path(name) if name else None
+    if path is None or not os.path.isdir(path):
+        return None
+    events = _read_cgroup_file(path, 'memory.events') or ''
+    io_weight = (_read_cgroup_file(path, 'io.weight') or '').split()
+    return {
+        "path": path,
+        "limits": {
+            "cpu_weight": (_read_cgroup_file(path, 'cpu.weight') or '').strip() or None,
+            "io_weight": io_weight[1] if len(io_weight) >= 2 else None,
+            "memory_high": (_read_cgroup_file(path, 'memory.high') or '').strip() or None,
+            "memory_max": (_read_cgroup_file(path, 'memory.max') or '').strip() or None
+        },
+        "pressure": {resource: parse_pressure(_read_cgroup_file(path, f"{resource}.pressure"))
+                     for resource in PSI_RESOURCES},
+        "memory_events": {key: int(value) for key, value in
+                          (line.split() for line in events.splitlines() if len(line.split()) == 2)}
+    }
+
+
+def system_pressure() -> Optional[Dict]:
+    """PSI do host inteiro (/proc/pressure), disponível mesmo sem cgroups próprios"""
+    if not os.path.isdir('/proc/pressure'):
+        return None
+    return {resource: parse_pressure(_read_cgroup_file('/proc/pressure', resource))
+            for resource in PSI_RESOURCES}
@@ -0,0 +1,146 @@
+"""
+Reciclagem preventiva do serviço Python por crescimento de memória ou volume
+O manager amostra o RSS do grupo e o contador de requisições atendidas; ao
+passar de um limite, agenda um restart drenado para a próxima janela de pouco
+tráfego (ou força depois de um prazo máximo)
+"""
+
+import os
+import logging
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+RECYCLE_ENABLED = os.getenv('RECYCLE_ENABLED', 'true').lower() == 'true'
+RECYCLE_CHECK_INTERVAL = int(os.getenv('RECYCLE_CHECK_INTERVAL', '60'))
+# Crescimento do RSS (MB, pela reta ajustada) acima da linha de base pós-aquecimento
+RECYCLE_RSS_GROWTH_MB = float(os.getenv('RECYCLE_RSS_GROWTH_MB', '400'))
+RECYCLE_MAX_REQUESTS = int(os.getenv('RECYCLE_MAX_REQUESTS', '200000'))
+# Tempo de aquecimento antes de fixar a linha de base (caches enchendo é normal)
+RECYCLE_WARMUP_SECONDS = int(os.getenv('RECYCLE_WARMUP_SECONDS', '900'))
+RECYCLE_MIN_UPTIME = int(os.getenv('RECYCLE_MIN_UPTIME', '3600'))
+# Janela de pouco tráfego: taxa e requisições em andamento abaixo destes limites
+RECYCLE_LOW_TRAFFIC_RPS = float(os.getenv('RECYCLE_LOW_TRAFFIC_RPS', '0.2'))
+RECYCLE_LOW_TRAFFIC_INFLIGHT = int(os.getenv('RECYCLE_LOW_TRAFFIC_INFLIGHT', '1'))
+# Sem janela calma até este prazo após o gatilho, recicla mesmo assim
+RECYCLE_MAX_DEFER_SECONDS = int(os.getenv('RECYCLE_MAX_DEFER_SECONDS', '21600'))
+RECYCLE_RETRY_SECONDS = 600
+RECYCLE_TREND_SAMPLES = 360
+
+
+class MemoryTrend:
+    """Amostras (t, MB) com reta de mínimos quadrados para ignorar picos isolados"""
+
+    def __init__(self, maxlen: int = RECYCLE_TREND_SAMPLES):
+        self.samples = deque(maxlen=maxlen)
+
+    def add(self, timestamp: float, memory_mb: float):
+        self.samples.append((timestamp, memory_mb))
+
+    def slope(self) -> Optional[float]:
+        """MB por segundo; None com menos de 3 amostras"""
+        n = len(self.samples)
+        if n < 3:
+            return None
+        mean_t = sum(t for t, _ in self.samples) / n
+        mean_m = sum(m for _, m in self.samples) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in self.samples)
+        if var_t == 0:
+            return None
+        return sum((t - mean_t) * (m - mean_m) for t, m in self.samples) / var_t
+
+    def fitted_latest(self) -> Optional[float]:
+        """Valor da reta no instante da última amostra"""
+        slope = self.slope()
+        if slope is None:
+            return self.samples[-1][1] if self.samples else None
+        n = len(self.samples)
+        mean_t = sum(t for t, _ in self.samples) / n
+        mean_m = sum(m for _, m in self.samples) / n
+        return mean_m + slope * (self.samples[-1][0] - mean_t)
+
+
+class RecycleMonitor:
+    """Estado de reciclagem de uma geração do serviço"""
+
+    def __init__(self, generation: int, started_at: float):
+        self.generation = generation
+        self.started_at = started_at
+        self.trend = MemoryTrend()
+        self.baseline_mb: Optional[float] = None
+        self.served: Optional[int] = None
+        self.rps: Optional[float] = None
+        self.inflight: Optional[int] = None
+        self._last_served: Optional[tuple] = None
+        self.reason: Optional[str] = None
+        self.triggered_at: Optional[float] = None
+        self.not_before = 0.0
+
+    def observe(self, now: float, memory_mb: Optional[float], served: Optional[int],
+                inflight: Optional[int]):
+        """Registra uma amostra e dispara o gatilho se algum limite foi passado"""
+        if memory_mb is not None:
+            self.trend.add(now, memory_mb)
+            if self.baseline_mb is None and now - self.started_at >= RECYCLE_WARMUP_SECONDS:
+                self.baseline_mb = self.trend.fitted_latest()
+        self.inflight = inflight
+        if served is not None:
+            if self._last_served is not None and served >= self._last_served[1] and now > self._last_served[0]:
+                self.rps = (served - self._last_served[1]) / (now - self._last_served[0])
+            self._last_served = (now, served)
+            self.served = served
+
+        if self.reason is not None or now - self.started_at < RECYCLE_MIN_UPTIME:
+            return
+        growth = self.growth_mb()
+        if growth is not None and growth >= RECYCLE_RSS_GROWTH_MB:
+            self._trigger(now, f"RSS cresceu {growth:.0f} MB desde a linha de base")
+        elif self.served is not None and self.served >= RECYCLE_MAX_REQUESTS:
+            self._trigger(now, f"{self.served} requisições atendidas")
+
+    def _trigger(self, now: float, reason: str):
+        self.reason = reason
+        self.triggered_at = now
+        logger.info(f"♻️ Reciclagem agendada (geração {self.generation}): {reason}")
+
+    def growth_mb(self) -> Optional[float]:
+        fitted = self.trend.fitted_latest()
+        if self.baseline_mb is None or fitted is None:
+            return None
+        return fitted - self.baseline_mb
+
+    def low_traffic(self) -> bool:
+        if self.inflight is not None and self.inflight > RECYCLE_LOW_TRAFFIC_INFLIGHT:
+            return False
+        return self.rps is None or self.rps <= RECYCLE_LOW_TRAFFIC_RPS
+
+    def due(self, now: float) -> bool:
+        """Gatilho disparado e (tráfego baixo ou prazo de adiamento esgotado)"""
+        if self.reason is None or now < self.not_before:
+            return False
+        return self.low_traffic() or now - self.triggered_at >= RECYCLE_MAX_DEFER_SECONDS
+
+    def postpone(self, now: float, seconds: float = RECYCLE_RETRY_SECONDS):
+        """Restart falhou: mantém o gatilho e tenta de novo mais tarde"""
+        self.not_before = now + seconds
+
+    def to_dict(self) -> dict:
+        slope = self.trend.slope()
+        growth = self.growth_mb()
+        latest = self.trend.samples[-1][1] if self.trend.samples else None
+        return {
+            "generation": self.generation,
+            "memory_mb": latest,
+            "baseline_mb": round(self.baseline_mb, 1) if self.baseline_mb is not None else None,
+            "growth_mb": round(growth, 1) if growth is not None else None,
+            "trend_mb_per_hour": round(slope * 3600, 2) if slope is not None else None,
+            "served": self.served,
+            "rps": round(self.rps, 3) if self.rps is not None else None,
+            "pending_reason": self.reason,
+            "pending_since": self.triggered_at,
+            "thresholds": {
+                "rss_growth_mb": RECYCLE_RSS_GROWTH_MB,
+                "max_requests": RECYCLE_MAX_REQUESTS
+            }
+        }
@@ -4,9 +4,9 @@ Servidor de Gerenciamento para Telegram Query Bridge - Versão 2.0
 Sistema robusto de gerenciamento de serviços com detecção precisa
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import subprocess
@@ -27,6 +27,10 @@ import logging
 from pathlib import Path
 from dotenv import load_dotenv
 
+import process_control
+import service_registry
+from recycling import RECYCLE_ENABLED, RECYCLE_CHECK_INTERVAL, RecycleMonitor
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -41,14 +45,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Portas do serviço Python fora do registro: cor green do blue/green e owner
+# da sessão no modo split
+PYTHON_STANDBY_PORT = int(os.getenv('PYTHON_STANDBY_PORT', '8002'))
+PYTHON_OWNER_PORT = int(os.getenv('PYTHON_OWNER_PORT', '8011'))
+
+# Serviços, comandos, portas e réplicas vêm do registro (services.json)
+REGISTRY = service_registry.load_registry(reserved_ports={
+    PYTHON_STANDBY_PORT: 'python (PYTHON_STANDBY_PORT)',
+    PYTHON_OWNER_PORT: 'python (PYTHON_OWNER_PORT)'
+})
+MANAGED_SERVICES = service_registry.supervised_by(REGISTRY, 'manager')
+_missing = [name for name in ('python', 'node') if name not in MANAGED_SERVICES]
+if _missing:
+    raise ValueError(f"Registro de serviços sem {', '.join(_missing)} supervisionado pelo manager "
+                     f"(confira services.json e SERVICES_OVERRIDES)")
+PYTHON_SPEC = REGISTRY['python']
+NODE_SPEC = REGISTRY['node']
+
 # Configurações
-PYTHON_SERVICE_PORT = 8001
-NODE_SERVICE_PORT = 3000
-MANAGER_PORT = 9000
+PYTHON_SERVICE_PORT = PYTHON_SPEC.port
+NODE_SERVICE_PORT = NODE_SPEC.port
+MANAGER_PORT = REGISTRY['manager'].port if 'manager' in REGISTRY else 9000
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
-SERVICE_TIMEOUT = 30
 HEALTH_CHECK_INTERVAL = 5
 
+# Modo do serviço Python: 'single' (um uvicorn com a sessão do Telegram) ou
+# 'split' (N workers HTTP + um owner da sessão, ligados por Unix socket)
+PYTHON_SERVICE_MODE = os.getenv('PYTHON_SERVICE_MODE', 'single')
+PYTHON_HTTP_WORKERS = int(os.getenv('PYTHON_HTTP_WORKERS', str(os.cpu_count() or 2)))
+BRIDGE_IPC_SOCKET = os.getenv(
+    'BRIDGE_IPC_SOCKET',
+    os.path.join(PROJECT_DIR, 'telegram_service', 'data', 'bridge.sock')
+)
+
+# Restart do serviço Python: 'restart' (parar e iniciar) ou 'bluegreen'
+# (nova instância na porta alternativa com sessão própria, drenagem da antiga
+# e troca do upstream)
+PYTHON_DEPLOY_MODE = os.getenv('PYTHON_DEPLOY_MODE', 'restart')
+PYTHON_DRAIN_SECONDS = int(os.getenv('PYTHON_DRAIN_SECONDS', '50'))
+COLOR_PORTS = {'blue': PYTHON_SERVICE_PORT, 'green': PYTHON_STANDBY_PORT}
+SESSION_BASE = os.path.join(PROJECT_DIR, 'telegram_service', 'data', 'telegram_bridge')
+
+# Handoff de sockets: o manager abre os sockets de escuta e repassa o fd aos
+# filhos; durante um restart as conexões esperam no backlog do kernel em vez
+# de receber ECONNREFUSED. Sem suporte a pass_fds (Windows), usa host/porta.
+SOCKET_HANDOFF = os.getenv('SOCKET_HANDOFF', 'true').lower() == 'true' and os.name != 'nt'
+LISTEN_BACKLOG = 1024
+
+# Drenagem antes de parar: o serviço recusa trabalho novo (503) e o manager
+# espera as requisições em andamento zerarem, até DRAIN_TIMEOUT segundos
+DRAIN_TIMEOUT = int(os.getenv('DRAIN_TIMEOUT', '45'))
+DRAIN_POLL_INTERVAL = 0.5
+
+# Estado de supervisão persistido: um manager reiniciado readota os filhos
+# vivos (identificados por PID + create_time) em vez de matá-los e relançá-los
+MANAGER_STATE_FILE = os.getenv('MANAGER_STATE_FILE', os.path.join(PROJECT_DIR, 'data', 'manager_state.json'))
+# Saída dos filhos vai para arquivos: um pipe morreria junto com o manager
+LOG_DIR = os.getenv('SERVICE_LOG_DIR', os.path.join(PROJECT_DIR, 'logs'))
+
 app = FastAPI(title="Telegram Query Bridge Manager v2.0", version="2.0.0")
 
 # Middleware CORS
@@ -60,23 +115,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Estado dos serviços
-services_state = {
-    'python': {
-        'process': None,
-        'pid': None,
-        'status': 'stopped',
-        'last_check': None,
-        'startup_time': None
-    },
-    'node': {
+def new_instance_state() -> dict:
+    return {
         'process': None,
         'pid': None,
         'status': 'stopped',
         'last_check': None,
-        'startup_time': None
+        'startup_time': None,
+        'startup_timings': None,
+        'generation': 0,
+        'adopted': False
     }
-}
+
+# Estado dos serviços: os campos de topo são da réplica 0; as demais ficam
+# em 'replicas' (índice -> mesmo formato)
+services_state = {name: dict(new_instance_state(), replicas={}) for name in MANAGED_SERVICES}
+services_state['python'].update({
+    'mode': PYTHON_SERVICE_MODE,
+    'owner_process': None,
+    'owner_pid': None
+})
+
+# Sockets de escuta mantidos pelo manager (porta -> socket)
+listen_sockets: Dict[int, socket.socket] = {}
+
+# Instância Python que recebe o tráfego (blue na porta padrão, green na alternativa)
+python_active = {'color': 'blue', 'port': PYTHON_SERVICE_PORT}
+
+# Reciclagem preventiva do serviço Python (uma instância por geração)
+python_recycle: Optional[RecycleMonitor] = None
+# Serializa start/stop/restart (painel, autenticação e reciclagem)
+service_lock = asyncio.Lock()
+# Referências das tarefas em background (evita coleta pelo GC no meio da execução)
+background_tasks: set = set()
+last_recycle: Dict = {}
+
+# Último estado da sessão do Telegram enviado pelo keepalive do serviço Python
+telegram_session_state: Dict = {}
+
+class AdoptedProcess:
+    """Filho de um manager anterior, com a interface de Popen usada aqui
+    
+    Não é filho deste processo: não há pipes nem código de saída confiável,
+    e a identidade é conferida pelo create_time (PIDs são reaproveitados).
+    """
+    
+    def __init__(self, proc: psutil.Process, group_name: Optional[str] = None):
+        self._proc = proc
+        self.pid = proc.pid
+        self.group_name = group_name
+        self.create_time = proc.create_time()
+        self.returncode: Optional[int] = None
+    
+    def poll(self) -> Optional[int]:
+        if self.returncode is None:
+            try:
+                alive = self._proc.is_running() and self._proc.status() != psutil.STATUS_ZOMBIE
+            except psutil.NoSuchProcess:
+                alive = False
+            if not alive:
+                self.returncode = -1
+        return self.returncode
+    
+    def terminate(self):
+        process_control.terminate_group(self.pid, self.create_time)
+    
+    def kill(self):
+        process_control.kill_group(self.pid, self.group_name, self.create_time)
+
+class TelegramSessionStatus(BaseModel):
+    telegram_connected: bool
+    last_ping_ms: Optional[float] = None
+    last_ok_at: Optional[float] = None
+    ping_interval: Optional[float] = None
+    reconnects: int = 0
 
 class ServiceRequest(BaseModel):
     service: str
@@ -100,14 +212,8 @@ def is_port_available(port: int) -> bool:
         return False
 
 def get_process_pid_by_port(port: int) -> Optional[int]:
-    """Obtém PID do processo usando a porta"""
-    try:
-        for conn in psutil.net_connections():
-            if conn.laddr.port == port and conn.pid:
-                return conn.pid
-    except Exception as e:
-        logger.error(f"Erro ao buscar PID pela porta {port}: {e}")
-    return None
+    """Obtém PID do processo usando a porta (ignora o próprio manager no modo handoff)"""
+    return process_control.listener_pid(port)
 
 def get_process_details(pid: int) -> dict:
     """Obtém detalhes do processo"""
@@ -130,17 +236,188 @@ def kill_process_by_port(port: int) -> bool:
     pid = get_process_pid_by_port(port)
     if pid:
         try:
-            process = psutil.Process(pid)
-            process.terminate()
-            time.sleep(2)
-            if process.is_running():
-                process.kill()
+            # Leva junto o grupo/descendentes (reloader e workers do uvicorn)
+            process_control.stop_group_sync(pid, grace=2,
+                                            create_time=process_control.process_create_time(pid))
             logger.info(f"Processo PID {pid} na porta {port} finalizado")
             return True
         except Exception as e:
             logger.error(f"Erro ao matar processo {pid}: {e}")
     return False
 
+def open_service_log(name: str):
+    """Arquivo de log (append) que recebe stdout/stderr de um serviço"""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    return open(os.path.join(LOG_DIR, f"{name}.log"), 'ab')
+
+def process_identity(pid: Optional[int]) -> Optional[float]:
+    """create_time do processo, usado para reconhecê-lo depois de um restart do manager"""
+    if not pid:
+        return None
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+def instance_snapshot(service_name: str, replica: int) -> dict:
+    state = instance_state(service_name, replica)
+    return {
+        "pid": state['pid'],
+        "create_time": process_identity(state['pid']),
+        "port": instance_port(service_name, replica),
+        "generation": state['generation'],
+        "startup_time": state['startup_time'].isoformat() if state['startup_time'] else None,
+        "startup_timings": state['startup_timings']
+    }
+
+def save_manager_state():
+    """Grava PIDs, create_time, portas e gerações no arquivo de estado (escrita atômica)"""
+    services = {}
+    for service_name, state in services_state.items():
+        entry = instance_snapshot(service_name, 0)
+        entry["replicas"] = {
+            str(replica): instance_snapshot(service_name, replica)
+            for replica in range(1, REGISTRY[service_name].replicas)
+        }
+        if service_name == 'python':
+            entry["mode"] = state['mode']
+            entry["owner_pid"] = state['owner_pid']
+            entry["owner_create_time"] = process_identity(state['owner_pid'])
+        services[service_name] = entry
+    payload = {
+        "saved_at": time.time(),
+        "manager_pid": os.getpid(),
+        "python_active": dict(python_active),
+        "services": services
+    }
+    try:
+        os.makedirs(os.path.dirname(MANAGER_STATE_FILE), exist_ok=True)
+        tmp_path = f"{MANAGER_STATE_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        os.replace(tmp_path, MANAGER_STATE_FILE)
+    except OSError as e:
+        logger.warning(f"Não foi possível salvar o estado do manager: {e}")
+
+def adopt_process(pid: Optional[int], create_time: Optional[float],
+                  group_name: Optional[str] = None) -> Optional[AdoptedProcess]:
+    """Processo vivo com o mesmo PID e create_time registrados, ou None"""
+    if not pid or create_time is None:
+        return None
+    try:
+        proc = psutil.Process(pid)
+        if abs(proc.create_time() - create_time) > 0.01 or proc.status() == psutil.STATUS_ZOMBIE:
+            # PID reaproveitado por outro processo
+            return None
+        return AdoptedProcess(proc, group_name)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+async def adopt_instance(service_name: str, replica: int, entry: dict,
+                         process: Optional[AdoptedProcess] = None) -> bool:
+    """Readota uma réplica registrada no arquivo de estado, se ainda viva"""
+    state = instance_state(service_name, replica)
+    port = instance_port(service_name, replica)
+    state['generation'] = entry.get('generation') or 0
+    if process is None:
+        process = adopt_process(entry.get('pid'), entry.get('create_time'),
+                                REGISTRY[service_name].group_name(port))
+        if process is None:
+            return False
+    state['process'] = process
+    state['pid'] = process.pid
+    state['adopted'] = True
+    state['startup_timings'] = entry.get('startup_timings')
+    if entry.get('startup_time'):
+        state['startup_time'] = datetime.fromisoformat(entry['startup_time'])
+    state['status'] = 'running' if await check_service_health(port) else 'unhealthy'
+    logger.info(f"♻️ Serviço {instance_label(service_name, replica)} readotado (PID {process.pid}, "
+                f"geração {state['generation']}, porta {port})")
+    return True
+
+async def adopt_children():
+    """Readota os serviços de um manager anterior a partir do arquivo de estado
+    
+    Os sockets de escuta não voltam para o manager (ficam só com o filho);
+    o handoff volta a valer a partir do próximo restart do serviço.
+    """
+    try:
+        with open(MANAGER_STATE_FILE, encoding='utf-8') as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.warning(f"Arquivo de estado do manager ilegível, ignorando: {e}")
+        return
+    
+    active = saved.get('python_active') or {}
+    if active.get('color') in COLOR_PORTS:
+        python_active['color'] = active['color']
+        python_active['port'] = COLOR_PORTS[active['color']]
+    
+    for service_name, entry in (saved.get('services') or {}).items():
+        state = services_state.get(service_name)
+        if state is None:
+            continue
+        for replica, replica_entry in (entry.get('replicas') or {}).items():
+            # Réplicas além do número atual do registro ficam para o fluxo normal
+            if 0 < int(replica) < REGISTRY[service_name].replicas:
+                await adopt_instance(service_name, int(replica), replica_entry)
+        state['generation'] = entry.get('generation') or 0
+        port = instance_port(service_name, 0)
+        process = adopt_process(entry.get('pid'), entry.get('create_time'),
+                                REGISTRY[service_name].group_name(port))
+        if process is None:
+            continue
+        if service_name == 'python':
+            owner = adopt_process(entry.get('owner_pid'), entry.get('owner_create_time'),
+                                  f"python-{PYTHON_OWNER_PORT}")
+            if entry.get('mode') == 'split' and owner is None:
+                # Workers sem owner: deixa o fluxo normal de start resolver
+                logger.warning(f"Owner da sessão (PID {entry.get('owner_pid')}) não encontrado, "
+                               f"workers não readotados")
+                continue
+            state['mode'] = entry.get('mode') or PYTHON_SERVICE_MODE
+            state['owner_process'] = owner
+            state['owner_pid'] = owner.pid if owner else None
+        await adopt_instance(service_name, 0, entry, process)
+    save_manager_state()
+
+async def acquire_listen_socket(port: int, host: str = "0.0.0.0") -> Optional[socket.socket]:
+    """Socket de escuta do manager para a porta (criado uma vez e reaproveitado)"""
+    if not SOCKET_HANDOFF:
+        return None
+    sock = listen_sockets.get(port)
+    if sock is not None:
+        return sock
+    for attempt in range(2):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((host, port))
+        except OSError as e:
+            sock.close()
+            if attempt == 0:
+                # Porta presa por um processo fora da supervisão do manager
+                logger.warning(f"Porta {port} ocupada ({e}), liberando")
+                kill_process_by_port(port)
+                await asyncio.sleep(1)
+                continue
+            logger.error(f"Não foi possível abrir a porta {port}: {e}")
+            return None
+        sock.listen(LISTEN_BACKLOG)
+        sock.set_inheritable(True)
+        listen_sockets[port] = sock
+        logger.info(f"🔌 Manager escutando na porta {port} (fd {sock.fileno()})")
+        return sock
+    return None
+
+def release_listen_socket(port: int):
+    """Fecha o socket da porta (parada definitiva: clientes voltam a ver ECONNREFUSED)"""
+    sock = listen_sockets.pop(port, None)
+    if sock is not None:
+        sock.close()
+
 async def check_service_health(port: int, timeout: int = 5) -> bool:
     """Verifica health do serviço via HTTP"""
     try:
@@ -150,205 +427,637 @@ async def check_service_health(port: int, timeout: int = 5) -> bool:
     except Exception:
         return False
 
-async def start_python_service() -> bool:
-    """Inicia serviço Python"""
+async def get_service_health_payload(port: int, timeout: int = 5,
+                                     path: str = '/health') -> Optional[dict]:
+    """Retorna o JSON do /health do serviço, ou None se indisponível"""
     try:
-        logger.info("Iniciando serviço Python...")
-        
-        # Verificar se já está rodando
-        if await check_service_health(PYTHON_SERVICE_PORT):
-            logger.info("Serviço Python já está rodando")
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.get(f"http://localhost:{port}{path}")
+            if response.status_code != 200:
+                return None
+            try:
+                return response.json()
+            except ValueError:
+                return {}
+    except Exception:
+        return None
+
+def is_service_ready(payload: Optional[dict]) -> bool:
+    """Pronto = health OK e warm start do Telegram concluído (quando reportado)"""
+    return payload is not None and payload.get('ready', True)
+
+async def get_inflight(port: int, timeout: int = 3) -> Optional[dict]:
+    """Requisições em andamento do serviço (GET /admin/inflight), ou None"""
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.get(
+                f"http://localhost:{port}/admin/inflight",
+                headers={"x-api-key": os.getenv('API_KEY', '')}
+            )
+            return response.json() if response.status_code == 200 else None
+    except Exception:
+        return None
+
+async def drain_service(port: int, timeout: float = DRAIN_TIMEOUT) -> Optional[int]:
+    """Pede a drenagem e espera o in-flight zerar ou o prazo acabar
+    
+    Retorna quantas requisições ainda estavam em andamento (0 = drenado) ou
+    None se o serviço não implementa o protocolo ou não respondeu.
+    """
+    try:
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.post(
+                f"http://localhost:{port}/admin/drain",
+                headers={"x-api-key": os.getenv('API_KEY', '')}
+            )
+            if response.status_code != 200:
+                return None
+            inflight = response.json().get('inflight', 0)
+            deadline = time.monotonic() + timeout
+            while inflight and time.monotonic() < deadline:
+                await asyncio.sleep(DRAIN_POLL_INTERVAL)
+                response = await client.get(
+                    f"http://localhost:{port}/admin/inflight",
+                    headers={"x-api-key": os.getenv('API_KEY', '')}
+                )
+                if response.status_code != 200:
+                    return None
+                inflight = response.json().get('inflight', 0)
+    except Exception as e:
+        logger.warning(f"Drenagem da porta {port} indisponível: {e}")
+        return None
+    
+    if inflight:
+        logger.warning(f"⏱️ Prazo de drenagem esgotado na porta {port} com {inflight} requisições em andamento")
+    else:
+        logger.info(f"🚰 Porta {port} drenada")
+    return inflight
+
+async def terminate_process(process: subprocess.Popen, grace: float = 2):
+    """SIGTERM no grupo do serviço e SIGKILL no que sobrar depois do prazo"""
+    name = getattr(process, 'group_name', None)
+    create_time = getattr(process, 'create_time', None)
+    process_control.terminate_group(process.pid, create_time)
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        # poll() recolhe o líder; filhos órfãos ainda contam no grupo
+        process.poll()
+        if not process_control.group_alive(process.pid, name, create_time):
+            break
+        await asyncio.sleep(0.1)
+    else:
+        process_control.kill_group(process.pid, name, create_time)
+        await asyncio.sleep(0.1)
+        process.poll()
+    if name:
+        process_control.remove_cgroup(name)
+
+def active_python_port() -> int:
+    return python_active['port']
+
+def instance_state(service_name: str, replica: int = 0) -> dict:
+    """Estado de uma réplica (a réplica 0 é o próprio estado do serviço)"""
+    state = services_state[service_name]
+    if replica == 0:
+        return state
+    return state['replicas'].setdefault(replica, new_instance_state())
+
+def instance_port(service_name: str, replica: int = 0) -> int:
+    """Porta da réplica; a réplica 0 do Python segue a cor ativa do blue/green"""
+    if service_name == 'python' and replica == 0:
+        return active_python_port()
+    return REGISTRY[service_name].replica_port(replica)
+
+def instance_label(service_name: str, replica: int) -> str:
+    return service_name if replica == 0 else f"{service_name}#{replica}"
+
+def python_upstream_urls() -> List[str]:
+    """URLs de todas as réplicas Python, para o round-robin do Node"""
+    return [f"http://localhost:{instance_port('python', replica)}"
+            for replica in range(PYTHON_SPEC.replicas)]
+
+def node_upstream_env() -> Dict[str, str]:
+    urls = python_upstream_urls()
+    return {'PYTHON_SERVICE_URL': urls[0], 'PYTHON_SERVICE_URLS': ','.join(urls)}
+
+def spawn_instance(spec: service_registry.ServiceSpec, port: int, replica: int = 0,
+                   host: Optional[str] = None, sock: Optional[socket.socket] = None,
+                   extra_env: Optional[Dict[str, str]] = None, extra_args: List[str] = (),
+                   log_name: Optional[str] = None) -> subprocess.Popen:
+    """Inicia uma instância do serviço conforme o registro (comando, cwd e env)
+
+    Com sock, o filho herda o socket do manager (--fd ou LISTEN_FD, conforme
+    o 'listen' do serviço) em vez de abrir a porta.
+    """
+    cmd, listen_env = spec.build_command(port, host, sock.fileno() if sock is not None else None)
+    env = os.environ.copy()
+    env.update(spec.instance_env(replica, port))
+    env.update(listen_env)
+    if extra_env:
+        env.update(extra_env)
+    
+    with open_service_log(log_name or spec.log_name(replica)) as log:
+        return process_control.spawn(
+            spec.group_name(port),
+            cmd + list(extra_args),
+            cwd=spec.cwd,
+            env=env,
+            pass_fds=(sock.fileno(),) if sock is not None else (),
+            stdout=log,
+            stderr=subprocess.STDOUT
+        )
+
+def spawn_python_process(port: int, host: str = "0.0.0.0", role: str = 'all',
+                         workers: Optional[int] = None,
+                         extra_env: Optional[Dict[str, str]] = None,
+                         sock: Optional[socket.socket] = None) -> subprocess.Popen:
+    """Inicia um uvicorn do serviço Python com o papel (BRIDGE_ROLE) indicado"""
+    env = {'BRIDGE_ROLE': role, 'BRIDGE_IPC_SOCKET': BRIDGE_IPC_SOCKET}
+    if extra_env:
+        env.update(extra_env)
+    return spawn_instance(
+        PYTHON_SPEC, port, host=host, sock=sock, extra_env=env,
+        extra_args=["--workers", str(workers)] if workers else [],
+        log_name='python-owner' if role == 'owner' else 'python'
+    )
+
+async def wait_instance_ready(spec: service_registry.ServiceSpec, port: int,
+                              process: subprocess.Popen) -> Optional[dict]:
+    """Aguarda o probe de health reportar pronto; None se o processo morrer ou estourar o tempo"""
+    for i in range(spec.ready_timeout):
+        await asyncio.sleep(1)
+        if process.poll() is not None:
+            return None
+        payload = await get_service_health_payload(port, path=spec.health_path)
+        if is_service_ready(payload):
+            return payload
+    return None
+
+async def wait_python_ready(port: int, process: subprocess.Popen) -> Optional[dict]:
+    return await wait_instance_ready(PYTHON_SPEC, port, process)
+
+def copy_python_env():
+    """Copia o .env da raiz para o serviço Python"""
+    env_src = os.path.join(PROJECT_DIR, ".env")
+    env_dst = os.path.join(PROJECT_DIR, "telegram_service", ".env")
+    if os.path.exists(env_src):
+        shutil.copy2(env_src, env_dst)
+
+class InstanceHooks:
+    """Pontos de extensão do fluxo genérico de start/stop de uma réplica"""
+    
+    __slots__ = ()
+    
+    async def before_spawn(self, state: dict) -> bool:
+        """Preparação antes de iniciar o processo; False aborta o start"""
+        return True
+    
+    def spawn(self, spec: service_registry.ServiceSpec, port: int, replica: int,
+              sock: Optional[socket.socket], extra_env: Optional[Dict[str, str]]) -> subprocess.Popen:
+        return spawn_instance(spec, port, replica, sock=sock, extra_env=extra_env)
+    
+    def startup_info(self, payload: dict) -> Optional[dict]:
+        return payload.get('startup')
+    
+    def drain_port(self, state: dict, port: int) -> int:
+        return port
+    
+    async def after_stop(self, state: dict):
+        pass
+
+class PythonHooks(InstanceHooks):
+    """Serviço Python: sessão por réplica, cor do blue/green e owner do modo split"""
+    
+    __slots__ = ('replica', 'owner_payload')
+    
+    def __init__(self, replica: int):
+        self.replica = replica
+        self.owner_payload: Optional[dict] = None
+    
+    async def before_spawn(self, state: dict) -> bool:
+        copy_python_env()
+        if self.replica > 0:
+            spec = PYTHON_SPEC
+            port = instance_port('python', self.replica)
+            session = spec.instance_env(self.replica, port).get('SESSION_NAME')
+            session_file = os.path.join(spec.cwd, f"{session}.session") if session else None
+            if session_file and not os.path.exists(session_file):
+                # Sessões não são copiadas entre réplicas (chave duplicada derruba as duas)
+                logger.warning(f"⚠️ Réplica {instance_label('python', self.replica)} sem sessão do Telegram "
+                               f"({session_file}); autentique-a antes de colocar em produção")
             return True
         
-        # Limpar porta se necessário
-        if not is_port_available(PYTHON_SERVICE_PORT):
-            logger.warning(f"Limpando porta {PYTHON_SERVICE_PORT}")
-            kill_process_by_port(PYTHON_SERVICE_PORT)
+        state['mode'] = PYTHON_SERVICE_MODE
+        if PYTHON_SERVICE_MODE != 'split':
+            return True
+        # Owner: única conexão com o Telegram, IPC no Unix socket e
+        # /health apenas em localhost
+        sock = await acquire_listen_socket(PYTHON_OWNER_PORT, "127.0.0.1")
+        if sock is None and not is_port_available(PYTHON_OWNER_PORT):
+            logger.warning(f"Limpando porta {PYTHON_OWNER_PORT}")
+            kill_process_by_port(PYTHON_OWNER_PORT)
             await asyncio.sleep(2)
-        
-        # Copiar .env
-        env_src = os.path.join(PROJECT_DIR, ".env")
-        env_dst = os.path.join(PROJECT_DIR, "telegram_service", ".env")
-        if os.path.exists(env_src):
-            shutil.copy2(env_src, env_dst)
-        
-        # Iniciar processo
-        cmd = [
-            "python", "-m", "uvicorn", 
-            "main:app", 
-            "--host", "0.0.0.0", 
-            "--port", str(PYTHON_SERVICE_PORT),
-            "--log-level", "info"
-        ]
-        
-        working_dir = os.path.join(PROJECT_DIR, "telegram_service")
-        
-        process = subprocess.Popen(
-            cmd,
-            cwd=working_dir,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        # Atualizar estado
-        services_state['python']['process'] = process
-        services_state['python']['pid'] = process.pid
-        services_state['python']['status'] = 'starting'
-        services_state['python']['startup_time'] = datetime.now()
-        
-        # Aguardar serviço ficar disponível
-        for i in range(SERVICE_TIMEOUT):
-            await asyncio.sleep(1)
-            if await check_service_health(PYTHON_SERVICE_PORT):
-                services_state['python']['status'] = 'running'
-                logger.info(f"✅ Serviço Python iniciado (PID {process.pid})")
-                return True
-        
-        # Se não iniciou
-        services_state['python']['status'] = 'failed'
-        logger.error(f"❌ Falha ao iniciar serviço Python")
-        return False
-        
-    except Exception as e:
-        services_state['python']['status'] = 'failed'
-        logger.error(f"Erro ao iniciar serviço Python: {e}")
-        return False
+        owner = spawn_python_process(PYTHON_OWNER_PORT, host="127.0.0.1", role='owner', sock=sock)
+        state['owner_process'] = owner
+        state['owner_pid'] = owner.pid
+        self.owner_payload = await wait_python_ready(PYTHON_OWNER_PORT, owner)
+        if self.owner_payload is None:
+            logger.error("❌ Owner da sessão do Telegram não ficou pronto")
+            return False
+        logger.info(f"✅ Owner da sessão iniciado (PID {owner.pid}); "
+                    f"iniciando {PYTHON_HTTP_WORKERS} workers HTTP")
+        return True
+    
+    def spawn(self, spec: service_registry.ServiceSpec, port: int, replica: int,
+              sock: Optional[socket.socket], extra_env: Optional[Dict[str, str]]) -> subprocess.Popen:
+        if self.replica > 0:
+            return super().spawn(spec, port, replica, sock, extra_env)
+        if PYTHON_SERVICE_MODE == 'split':
+            return spawn_python_process(port, role='worker', workers=PYTHON_HTTP_WORKERS, sock=sock)
+        return spawn_python_process(port, extra_env=color_session_env(python_active['color']), sock=sock)
+    
+    def startup_info(self, payload: dict) -> Optional[dict]:
+        return (self.owner_payload or payload).get('startup')
+    
+    def drain_port(self, state: dict, port: int) -> int:
+        # Cada worker do uvicorn tem seu próprio contador; o owner vê todas
+        # as consultas encaminhadas, então a drenagem é feita nele
+        return PYTHON_OWNER_PORT if self.replica == 0 and state.get('mode') == 'split' else port
+    
+    async def after_stop(self, state: dict):
+        """Para o owner da sessão (modo split), depois dos workers HTTP"""
+        if self.replica > 0:
+            return
+        owner = state['owner_process']
+        if owner:
+            await terminate_process(owner)
+        elif PYTHON_SERVICE_MODE == 'split':
+            kill_process_by_port(PYTHON_OWNER_PORT)
+        state['owner_process'] = None
+        state['owner_pid'] = None
+
+def instance_hooks(service_name: str, replica: int) -> InstanceHooks:
+    return PythonHooks(replica) if service_name == 'python' else InstanceHooks()
 
-async def start_node_service() -> bool:
-    """Inicia serviço Node.js"""
+async def start_instance(service_name: str, replica: int = 0,
+                         extra_env: Optional[Dict[str, str]] = None) -> bool:
+    """Inicia uma réplica de um serviço do registro"""
+    spec = REGISTRY[service_name]
+    state = instance_state(service_name, replica)
+    port = instance_port(service_name, replica)
+    label = instance_label(service_name, replica)
+    hooks = instance_hooks(service_name, replica)
     try:
-        logger.info("Iniciando serviço Node.js...")
+        logger.info(f"Iniciando serviço {label} (porta {port})...")
         
         # Verificar se já está rodando
-        if await check_service_health(NODE_SERVICE_PORT):
-            logger.info("Serviço Node.js já está rodando")
+        process = state['process']
+        if port in listen_sockets:
+            if process and process.poll() is None and await check_service_health(port):
+                logger.info(f"Serviço {label} já está rodando")
+                return True
+        elif await check_service_health(port):
+            logger.info(f"Serviço {label} já está rodando")
             return True
         
-        # Limpar porta se necessário
-        if not is_port_available(NODE_SERVICE_PORT):
-            logger.warning(f"Limpando porta {NODE_SERVICE_PORT}")
-            kill_process_by_port(NODE_SERVICE_PORT)
+        sock = await acquire_listen_socket(port, spec.host) if spec.listen != 'none' else None
+        if sock is None and not is_port_available(port):
+            # Sem handoff: limpar porta se necessário
+            logger.warning(f"Limpando porta {port}")
+            kill_process_by_port(port)
             await asyncio.sleep(2)
         
-        # Iniciar processo
-        cmd = ["node", "api/index.js"]
-        working_dir = PROJECT_DIR
+        state['status'] = 'starting'
+        state['startup_time'] = datetime.now()
+        spawn_time = time.monotonic()
+        if not await hooks.before_spawn(state):
+            state['status'] = 'failed'
+            return False
         
-        process = subprocess.Popen(
-            cmd,
-            cwd=working_dir,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        process = hooks.spawn(spec, port, replica, sock, extra_env)
         
         # Atualizar estado
-        services_state['node']['process'] = process
-        services_state['node']['pid'] = process.pid
-        services_state['node']['status'] = 'starting'
-        services_state['node']['startup_time'] = datetime.now()
+        state['process'] = process
+        state['pid'] = process.pid
+        state['generation'] += 1
+        state['adopted'] = False
+        save_manager_state()
         
         # Aguardar serviço ficar disponível
-        for i in range(SERVICE_TIMEOUT):
-            await asyncio.sleep(1)
-            if await check_service_health(NODE_SERVICE_PORT):
-                services_state['node']['status'] = 'running'
-                logger.info(f"✅ Serviço Node.js iniciado (PID {process.pid})")
-                return True
+        payload = await wait_instance_ready(spec, port, process)
+        if payload is not None:
+            state['status'] = 'running'
+            state['startup_timings'] = {
+                "ready_after_ms": round((time.monotonic() - spawn_time) * 1000),
+                "service": hooks.startup_info(payload)
+            }
+            logger.info(f"✅ Serviço {label} iniciado (PID {process.pid}) em "
+                        f"{state['startup_timings']['ready_after_ms']} ms")
+            return True
         
         # Se não iniciou
-        services_state['node']['status'] = 'failed'
-        logger.error(f"❌ Falha ao iniciar serviço Node.js")
+        state['status'] = 'failed'
+        logger.error(f"❌ Falha ao iniciar serviço {label}")
         return False
         
     except Exception as e:
-        services_state['node']['status'] = 'failed'
-        logger.error(f"Erro ao iniciar serviço Node.js: {e}")
+        state['status'] = 'failed'
+        logger.error(f"Erro ao iniciar serviço {label}: {e}")
         return False
 
-async def stop_python_service() -> bool:
-    """Para serviço Python"""
-    try:
-        logger.info("Parando serviço Python...")
-        
-        if services_state['python']['process']:
-            process = services_state['python']['process']
-            process.terminate()
-            await asyncio.sleep(2)
-            if process.poll() is None:
-                process.kill()
-            
-            services_state['python']['process'] = None
-            services_state['python']['pid'] = None
-            services_state['python']['status'] = 'stopped'
-            logger.info("✅ Serviço Python parado")
-            return True
-        
-        # Tentar por porta
-        kill_process_by_port(PYTHON_SERVICE_PORT)
-        services_state['python']['status'] = 'stopped'
-        return True
-        
-    except Exception as e:
-        logger.error(f"Erro ao parar serviço Python: {e}")
+def color_session_env(color: str) -> Dict[str, str]:
+    """Cada cor usa sua própria sessão autorizada do Telegram (SESSION_NAME)"""
+    if color == 'blue':
+        return {}
+    return {'SESSION_NAME': f"{SESSION_BASE}_{color}"}
+
+def color_session_file(color: str) -> str:
+    """Arquivo SQLite da sessão da cor (o Telethon acrescenta .session)"""
+    return color_session_env(color).get('SESSION_NAME', SESSION_BASE) + '.session'
+
+async def set_node_upstream() -> bool:
+    """Atualiza, em todas as réplicas do Node, a lista de upstreams Python"""
+    success = True
+    for port in NODE_SPEC.replica_ports():
+        try:
+            async with httpx.AsyncClient(timeout=5) as client:
+                response = await client.post(
+                    f"http://localhost:{port}/admin/upstream",
+                    json={"python_service_urls": python_upstream_urls()},
+                    headers={"x-api-key": os.getenv('API_KEY', '')}
+                )
+                success = success and response.status_code == 200
+        except Exception as e:
+            logger.warning(f"Não foi possível atualizar o upstream do Node (porta {port}): {e}")
+            success = False
+    return success
+
+def spawn_background(coro) -> asyncio.Task:
+    """Tarefa em background com referência guardada e exceção registrada no log"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(_background_done)
+    return task
+
+def _background_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Erro em tarefa de background: {task.exception()!r}")
+
+async def retire_python_process(process: subprocess.Popen, port: int):
+    """Drena a instância antiga (já fora do upstream), encerra e fecha o socket da porta dela"""
+    if await drain_service(port, PYTHON_DRAIN_SECONDS) is None:
+        # Instância sem o protocolo de drenagem: espera o prazo inteiro
+        await asyncio.sleep(PYTHON_DRAIN_SECONDS)
+    await terminate_process(process)
+    # Clientes ainda na porta antiga recebem ECONNREFUSED em vez de esperar no backlog
+    release_listen_socket(port)
+    logger.info(f"✅ Instância Python antiga (porta {port}) encerrada")
+
+async def bluegreen_restart_python() -> Optional[bool]:
+    """Restart com o warm start do Telegram fora da janela de indisponibilidade
+
+    Sobe a outra cor na porta alternativa, com a sessão própria dela, e espera
+    o warm start. Depois troca o upstream (manager e Node) e só então drena e
+    encerra a instância antiga em segundo plano, sem janela de 503.
+    Enquanto as duas cores convivem, ambas recebem os mesmos updates da conta;
+    cada uma só atribui respostas aos próprios comandos (os enviados pela
+    outra sessão viram lápides no ReplyAssembler).
+    """
+    old_process = services_state['python']['process']
+    old_color, old_port = python_active['color'], python_active['port']
+    if not old_process or old_process.poll() is not None:
+        return await start_instance('python')
+    
+    new_color = 'green' if old_color == 'blue' else 'blue'
+    new_port = COLOR_PORTS[new_color]
+    if not os.path.exists(color_session_file(new_color)):
+        return None
+    logger.info(f"🔄 Blue/green: iniciando {new_color} na porta {new_port}")
+    
+    sock = await acquire_listen_socket(new_port)
+    if sock is None and not is_port_available(new_port):
+        logger.warning(f"Limpando porta {new_port}")
+        kill_process_by_port(new_port)
+        await asyncio.sleep(2)
+    
+    copy_python_env()
+    
+    spawn_time = time.monotonic()
+    process = spawn_python_process(new_port, extra_env=color_session_env(new_color), sock=sock)
+    payload = await wait_python_ready(new_port, process)
+    if payload is None:
+        # A instância atual continua atendendo
+        await terminate_process(process)
+        release_listen_socket(new_port)
+        logger.error(f"❌ Blue/green: {new_color} não ficou pronto, mantendo {old_color}")
         return False
+    
+    # Troca atômica: próximas requisições já vão para a nova instância
+    python_active['color'], python_active['port'] = new_color, new_port
+    services_state['python']['process'] = process
+    services_state['python']['pid'] = process.pid
+    services_state['python']['generation'] += 1
+    services_state['python']['adopted'] = False
+    services_state['python']['status'] = 'running'
+    services_state['python']['startup_time'] = datetime.now()
+    services_state['python']['startup_timings'] = {
+        "ready_after_ms": round((time.monotonic() - spawn_time) * 1000),
+        "service": payload.get('startup')
+    }
+    save_manager_state()
+    await set_node_upstream()
+    logger.info(f"✅ Blue/green: tráfego em {new_color} (porta {new_port}); drenando {old_color}")
+    
+    # Consultas em andamento na cor antiga terminam lá
+    spawn_background(retire_python_process(old_process, old_port))
+    return True
 
-async def stop_node_service() -> bool:
-    """Para serviço Node.js"""
+async def restart_python_service() -> bool:
+    """Restart conforme PYTHON_DEPLOY_MODE: blue/green (modo single) ou parar e iniciar"""
+    if PYTHON_DEPLOY_MODE == 'bluegreen' and PYTHON_SERVICE_MODE != 'split':
+        result = await bluegreen_restart_python()
+        if result is not None:
+            return result
+        # Sessões não são copiadas entre cores (chave duplicada derruba as duas)
+        other = 'green' if python_active['color'] == 'blue' else 'blue'
+        logger.warning(f"⚠️ Blue/green indisponível: sessão da cor {other} não autorizada "
+                       f"({color_session_file(other)}); usando parar e iniciar")
+    await stop_instance('python')
+    await asyncio.sleep(2)
+    return await start_instance('python')
+
+async def check_python_recycle():
+    """Amostra memória/requisições da geração atual e recicla quando for a hora"""
+    global python_recycle
+    state = services_state['python']
+    if state['status'] != 'running' or not state['process'] or service_lock.locked():
+        # Outra operação em andamento: a amostra e a reciclagem ficam para a próxima volta
+        return
+    
+    # Modo split: a sessão do Telegram (e o crescimento de memória) vive no owner
+    split = state['mode'] == 'split' and state['owner_process']
+    target = state['owner_process'] if split else state['process']
+    port = PYTHON_OWNER_PORT if split else active_python_port()
+    
+    if python_recycle is None or python_recycle.generation != state['generation']:
+        started_at = state['startup_time'].timestamp() if state['startup_time'] else time.time()
+        python_recycle = RecycleMonitor(state['generation'], started_at)
+    
+    usage = process_control.group_usage(target.pid, getattr(target, 'group_name', None))
+    drain_info = await get_inflight(port) or {}
+    now = time.time()
+    python_recycle.observe(now, usage.get('memory_mb'), drain_info.get('served'), drain_info.get('inflight'))
+    if not python_recycle.due(now):
+        return
+    
+    # O serviço pode ter sido parado ou reiniciado durante a amostragem
+    if service_lock.locked() or state['status'] != 'running' or python_recycle.generation != state['generation']:
+        return
+    reason = python_recycle.reason
+    logger.info(f"♻️ Reciclando serviço Python (geração {state['generation']}): {reason}")
+    async with service_lock:
+        success = await restart_python_service()
+    last_recycle.update({
+        "at": datetime.now().isoformat(),
+        "generation": python_recycle.generation,
+        "reason": reason,
+        "success": success,
+        "before": python_recycle.to_dict()
+    })
+    if not success:
+        python_recycle.postpone(now)
+
+async def recycle_loop():
+    while True:
+        await asyncio.sleep(RECYCLE_CHECK_INTERVAL)
+        try:
+            await check_python_recycle()
+        except Exception as e:
+            logger.error(f"Erro na verificação de reciclagem: {e}")
+
+async def stop_instance(service_name: str, replica: int = 0) -> bool:
+    """Para uma réplica de um serviço do registro (drenando antes)"""
+    state = instance_state(service_name, replica)
+    port = instance_port(service_name, replica)
+    label = instance_label(service_name, replica)
+    hooks = instance_hooks(service_name, replica)
     try:
-        logger.info("Parando serviço Node.js...")
+        logger.info(f"Parando serviço {label}...")
         
-        if services_state['node']['process']:
-            process = services_state['node']['process']
-            process.terminate()
-            await asyncio.sleep(2)
-            if process.poll() is None:
-                process.kill()
+        if state['process']:
+            process = state['process']
+            await drain_service(hooks.drain_port(state, port))
+            await terminate_process(process)
             
-            services_state['node']['process'] = None
-            services_state['node']['pid'] = None
-            services_state['node']['status'] = 'stopped'
-            logger.info("✅ Serviço Node.js parado")
+            state['process'] = None
+            state['pid'] = None
+            state['status'] = 'stopped'
+            await hooks.after_stop(state)
+            save_manager_state()
+            logger.info(f"✅ Serviço {label} parado")
             return True
         
         # Tentar por porta
-        kill_process_by_port(NODE_SERVICE_PORT)
-        services_state['node']['status'] = 'stopped'
+        kill_process_by_port(port)
+        await hooks.after_stop(state)
+        state['status'] = 'stopped'
+        save_manager_state()
         return True
         
     except Exception as e:
-        logger.error(f"Erro ao parar serviço Node.js: {e}")
+        logger.error(f"Erro ao parar serviço {label}: {e}")
         return False
 
-async def update_service_status():
-    """Atualiza status de todos os serviços"""
-    for service_name in ['python', 'node']:
-        port = PYTHON_SERVICE_PORT if service_name == 'python' else NODE_SERVICE_PORT
-        
-        # Verificar se processo ainda existe
-        if services_state[service_name]['process']:
-            if services_state[service_name]['process'].poll() is not None:
-                services_state[service_name]['status'] = 'stopped'
-                services_state[service_name]['process'] = None
-                services_state[service_name]['pid'] = None
-            else:
-                # Verificar health check
-                is_healthy = await check_service_health(port)
-                if is_healthy and services_state[service_name]['status'] != 'running':
-                    services_state[service_name]['status'] = 'running'
-                elif not is_healthy and services_state[service_name]['status'] == 'running':
-                    services_state[service_name]['status'] = 'unhealthy'
+def service_extra_env(service_name: str) -> Optional[Dict[str, str]]:
+    # Upstreams Python atuais (a réplica 0 pode estar na cor green após um blue/green)
+    return node_upstream_env() if service_name == 'node' else None
+
+async def start_service(service_name: str) -> bool:
+    """Inicia todas as réplicas do serviço"""
+    success = True
+    for replica in range(REGISTRY[service_name].replicas):
+        started = await start_instance(service_name, replica, service_extra_env(service_name))
+        success = success and started
+    return success
+
+async def stop_service(service_name: str) -> bool:
+    """Para todas as réplicas do serviço (na ordem inversa)"""
+    success = True
+    for replica in reversed(range(REGISTRY[service_name].replicas)):
+        stopped = await stop_instance(service_name, replica)
+        success = success and stopped
+    return success
+
+async def restart_service(service_name: str) -> bool:
+    """Restart; com várias réplicas, uma de cada vez (as demais seguem atendendo)"""
+    success = True
+    for replica in range(REGISTRY[service_name].replicas):
+        if service_name == 'python' and replica == 0:
+            restarted = await restart_python_service()
         else:
-            # Verificar se tem processo na porta
-            if await check_service_health(port):
-                pid = get_process_pid_by_port(port)
-                services_state[service_name]['pid'] = pid
-                services_state[service_name]['status'] = 'running'
-            else:
-                services_state[service_name]['status'] = 'stopped'
+            await stop_instance(service_name, replica)
+            await asyncio.sleep(2)
+            restarted = await start_instance(service_name, replica, service_extra_env(service_name))
+        success = success and restarted
+        if not restarted:
+            # Não derruba as próximas réplicas com a anterior fora do ar
+            logger.error(f"❌ Restart de {service_name} interrompido na réplica {replica}")
+            break
+    return success
+
+async def update_instance_status(service_name: str, replica: int):
+    state = instance_state(service_name, replica)
+    port = instance_port(service_name, replica)
+    
+    # Verificar se processo ainda existe
+    if state['process']:
+        if state['process'].poll() is not None:
+            state['status'] = 'stopped'
+            state['process'] = None
+            state['pid'] = None
+            save_manager_state()
+        else:
+            # Verificar health check
+            is_healthy = await check_service_health(port)
+            if is_healthy and state['status'] != 'running':
+                state['status'] = 'running'
+            elif not is_healthy and state['status'] == 'running':
+                state['status'] = 'unhealthy'
+    elif port in listen_sockets:
+        # Socket do manager sem filho: conexões aguardam no backlog
+        state['status'] = 'stopped'
+    else:
+        # Verificar se tem processo na porta
+        if await check_service_health(port):
+            pid = get_process_pid_by_port(port)
+            state['pid'] = pid
+            state['status'] = 'running'
+        else:
+            state['status'] = 'stopped'
+    
+    state['last_check'] = datetime.now()
+
+async def update_service_status():
+    """Atualiza status de todos os serviços (e réplicas)"""
+    for service_name in MANAGED_SERVICES:
+        for replica in range(REGISTRY[service_name].replicas):
+            await update_instance_status(service_name, replica)
         
-        services_state[service_name]['last_check'] = datetime.now()
+        # Modo split: workers sem owner não conseguem atender consultas
+        owner = services_state[service_name].get('owner_process')
+        if owner and owner.poll() is not None:
+            services_state[service_name]['owner_process'] = None
+            services_state[service_name]['owner_pid'] = None
+            if services_state[service_name]['status'] == 'running':
+                services_state[service_name]['status'] = 'unhealthy'
+
+@app.on_event("startup")
+async def on_startup():
+    """Readota os serviços deixados rodando por um manager anterior"""
+    await adopt_children()
+    if RECYCLE_ENABLED:
+        spawn_background(recycle_loop())
 
 # Endpoints
 @app.get("/")
@@ -364,6 +1073,43 @@ async def health_check():
     """Health check do manager"""
     return {"status": "OK", "version": "2.0.0"}
 
+async def instance_entry(service_name: str, replica: int) -> dict:
+    """Status de uma réplica, no formato da lista de /services/status"""
+    state = instance_state(service_name, replica)
+    port = instance_port(service_name, replica)
+    uptime = None
+    
+    if state['startup_time'] and state['status'] in ['running', 'starting']:
+        uptime = str(datetime.now() - state['startup_time'])
+    
+    entry = {
+        "service": service_name,
+        "replica": replica,
+        "status": state['status'],
+        "pid": state['pid'],
+        "port": port,
+        "uptime": uptime,
+        "last_check": state['last_check'].isoformat() if state['last_check'] else None,
+        "startup_timings": state['startup_timings'],
+        "generation": state['generation'],
+        "adopted": state['adopted'],
+        "inflight": None,
+        "draining": None,
+        "resources": None,
+        "cgroup": None
+    }
+    if state['process']:
+        # Líder + workers/filhos, lidos do cgroup ou do grupo de processos
+        group_name = getattr(state['process'], 'group_name', None)
+        entry["resources"] = process_control.group_usage(state['process'].pid, group_name)
+        entry["cgroup"] = process_control.cgroup_stats(group_name)
+    if state['status'] in ['running', 'unhealthy']:
+        drain_info = await get_inflight(port)
+        if drain_info is not None:
+            entry["inflight"] = drain_info.get('inflight')
+            entry["draining"] = drain_info.get('draining')
+    return entry
+
 @app.get("/services/status")
 async def get_services_status():
     """Retorna status atualizado dos serviços"""
@@ -371,66 +1117,106 @@ async def get_services_status():
     
     services = []
     for service_name, state in services_state.items():
-        port = PYTHON_SERVICE_PORT if service_name == 'python' else NODE_SERVICE_PORT
-        uptime = None
-        
-        if state['startup_time'] and state['status'] in ['running', 'starting']:
-            uptime = str(datetime.now() - state['startup_time'])
-        
-        services.append({
-            "service": service_name,
-            "status": state['status'],
-            "pid": state['pid'],
-            "port": port,
-            "uptime": uptime,
-            "last_check": state['last_check'].isoformat() if state['last_check'] else None
-        })
+        entry = await instance_entry(service_name, 0)
+        entry["registry"] = REGISTRY[service_name].to_dict()
+        entry["replicas"] = [await instance_entry(service_name, replica)
+                             for replica in range(1, REGISTRY[service_name].replicas)]
+        if service_name == 'python':
+            entry["mode"] = state['mode']
+            entry["owner_pid"] = state['owner_pid']
+            entry["http_workers"] = PYTHON_HTTP_WORKERS if state['mode'] == 'split' else 1
+            entry["color"] = python_active['color']
+            entry["deploy_mode"] = PYTHON_DEPLOY_MODE
+            entry["recycle"] = python_recycle.to_dict() if python_recycle else None
+            entry["last_recycle"] = last_recycle or None
+            if state['owner_process']:
+                owner_info = await get_inflight(PYTHON_OWNER_PORT)
+                entry["owner_inflight"] = owner_info.get('inflight') if owner_info else None
+        services.append(entry)
     
     return {"services": services}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Uso de recursos, limites e pressão (PSI) de cada processo supervisionado"""
+    processes = {}
+    for service_name, state in services_state.items():
+        members = [(service_name, state['process'])]
+        for replica in range(1, REGISTRY[service_name].replicas):
+            members.append((instance_label(service_name, replica), instance_state(service_name, replica)['process']))
+        if state.get('owner_process'):
+            members.append((f"{service_name}-owner", state['owner_process']))
+        for key, process in members:
+            if not process or process.poll() is not None:
+                continue
+            group_name = getattr(process, 'group_name', None)
+            processes[key] = {
+                "pid": process.pid,
+                "group": group_name,
+                "resources": process_control.group_usage(process.pid, group_name),
+                "cgroup": process_control.cgroup_stats(group_name)
+            }
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "cgroups_enabled": process_control.CGROUPS_ENABLED,
+        "processes": processes,
+        "system_resources": {
+            "cpu_percent": psutil.cpu_percent(),
+            "memory_percent": psutil.virtual_memory().percent,
+            "pressure": process_control.system_pressure()
+        }
+    }
+
 @app.post("/services/control")
 async def control_service(request: ServiceRequest):
     """Controla serviços"""
     service = request.service.lower()
     action = request.action.lower()
     
-    if service not in ['python', 'node']:
+    if service not in MANAGED_SERVICES:
         raise HTTPException(status_code=400, detail="Serviço inválido")
     
     if action not in ['start', 'stop', 'restart']:
         raise HTTPException(status_code=400, detail="Ação inválida")
     
     try:
-        if action == 'start':
-            if service == 'python':
-                success = await start_python_service()
-            else:
-                success = await start_node_service()
-            return {"success": success, "message": f"Serviço {service} {'iniciado' if success else 'falha ao iniciar'}"}
-        
-        elif action == 'stop':
-            if service == 'python':
-                success = await stop_python_service()
-            else:
-                success = await stop_node_service()
-            return {"success": success, "message": f"Serviço {service} {'parado' if success else 'falha ao parar'}"}
-        
-        elif action == 'restart':
-            # Parar
-            if service == 'python':
-                await stop_python_service()
-                await asyncio.sleep(2)
-                success = await start_python_service()
-            else:
-                await stop_node_service()
-                await asyncio.sleep(2)
-                success = await start_node_service()
-            return {"success": success, "message": f"Serviço {service} {'reiniciado' if success else 'falha ao reiniciar'}"}
+        async with service_lock:
+            if action == 'start':
+                success = await start_service(service)
+                return {"success": success, "message": f"Serviço {service} {'iniciado' if success else 'falha ao iniciar'}"}
+            
+            elif action == 'stop':
+                success = await stop_service(service)
+                ports = REGISTRY[service].replica_ports()
+                if service == 'python':
+                    ports += [PYTHON_STANDBY_PORT, PYTHON_OWNER_PORT]
+                for port in ports:
+                    release_listen_socket(port)
+                return {"success": success, "message": f"Serviço {service} {'parado' if success else 'falha ao parar'}"}
+            
+            elif action == 'restart':
+                success = await restart_service(service)
+                return {"success": success, "message": f"Serviço {service} {'reiniciado' if success else 'falha ao reiniciar'}"}
     
     except Exception as e:
         logger.error(f"Erro no controle do serviço {service}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.api_route("/proxy/python/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def proxy_python(path: str, request: Request):
+    """Encaminha para a instância Python ativa (segue a troca blue/green)"""
+    url = f"http://localhost:{active_python_port()}/{path}"
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in ('host', 'content-length')}
+    try:
+        async with httpx.AsyncClient(timeout=60) as client:
+            response = await client.request(request.method, url, params=request.query_params,
+                                            content=await request.body(), headers=headers)
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"Serviço Python indisponível: {e}")
+    return Response(content=response.content, status_code=response.status_code,
+                    media_type=response.headers.get('content-type'))
+
 @app.post("/telegram/auth")
 async def authenticate_telegram():
     """Inicia autenticação do Telegram"""
@@ -448,14 +1234,14 @@ async def authenticate_telegram():
             }
         
         # Verificar se serviço Python está rodando
-        if services_state['python']['status'] not in ['running']:
-            success = await start_python_service()
+        async with service_lock:
+            success = services_state['python']['status'] == 'running' or await start_instance('python')
             if not success:
                 return {"success": False, "message": "Falha ao iniciar serviço Python"}
         
         # Tentar autenticação
         async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post("http://localhost:8001/auth")
+            response = await client.post(f"http://localhost:{active_python_port()}/auth")
             if response.status_code == 200:
                 return response.json()
             else:
@@ -468,15 +1254,26 @@ async def authenticate_telegram():
 @app.get("/telegram/status")
 async def get_telegram_status():
     """Verifica status da autenticação"""
+    session = dict(telegram_session_state) if telegram_session_state else None
     try:
         async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get("http://localhost:8001/status")
+            response = await client.get(f"http://localhost:{active_python_port()}/status")
             if response.status_code == 200:
-                return response.json()
+                return {**response.json(), "session": session}
             else:
-                return {"authenticated": False, "status": "service_offline"}
+                return {"authenticated": False, "status": "service_offline", "session": session}
     except Exception:
-        return {"authenticated": False, "status": "service_unavailable"}
+        return {"authenticated": False, "status": "service_unavailable", "session": session}
+
+@app.post("/telegram/status")
+async def update_telegram_status(status: TelegramSessionStatus):
+    """Recebe o estado real da sessão enviado pelo keepalive do serviço Python"""
+    if telegram_session_state.get('telegram_connected') != status.telegram_connected:
+        logger.info(f"Sessão do Telegram {'conectada' if status.telegram_connected else 'desconectada'} "
+                    f"(reconexões: {status.reconnects})")
+    telegram_session_state.update(status.dict())
+    telegram_session_state['received_at'] = datetime.now().isoformat()
+    return {"success": True}
 
 if __name__ == "__main__":
     import uvicorn
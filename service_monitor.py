@@ -14,6 +14,9 @@ import sys
 from typing import Dict, Optional
 import psutil
 
+import process_control
+import service_registry
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -27,38 +30,33 @@ logger = logging.getLogger(__name__)
 
 class ServiceMonitor:
     def __init__(self):
-        self.services = {
-            'python': {
-                'url': 'http://localhost:8001/health',
-                'port': 8001,
-                'command': ['python', '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', '8001'],
-                'working_dir': os.path.join(os.path.dirname(__file__), 'telegram_service'),
-                'process': None,
-                'restart_delay': 5,
-                'max_restarts': 5,
-                'restart_count': 0
-            },
-            'node': {
-                'url': 'http://localhost:3000/health',
-                'port': 3000,
-                'command': ['node', 'api/index.js'],
-                'process': None,
-                'restart_delay': 5,
-                'max_restarts': 5,
-                'restart_count': 0
-            },
-            'manager': {
-                'url': 'http://localhost:9000/health',
-                'port': 9000,
-                'command': ['python', 'server.py'],
-                'process': None,
-                'restart_delay': 5,
-                'max_restarts': 5,
-                'restart_count': 0
-            }
-        }
+        # Serviços do registro com supervisor "monitor", uma entrada por réplica;
+        # os demais são supervisionados pelo manager
+        self.registry = service_registry.load_registry()
+        python = self.registry.get('python')
+        python_urls = [f"http://localhost:{port}" for port in python.replica_ports()] if python else []
+        self.services = {}
+        for name in service_registry.supervised_by(self.registry, 'monitor'):
+            spec = self.registry[name]
+            for replica, port in enumerate(spec.replica_ports()):
+                command, env = spec.build_command(port)
+                env.update(spec.instance_env(replica, port))
+                if spec.name == 'node':
+                    env['PYTHON_SERVICE_URLS'] = ','.join(python_urls)
+                self.services[spec.log_name(replica)] = {
+                    'url': spec.health_url(port),
+                    'port': port,
+                    'command': command,
+                    'env': env,
+                    'working_dir': spec.cwd,
+                    'process': None,
+                    'restart_delay': 5,
+                    'max_restarts': 5,
+                    'restart_count': 0
+                }
         self.running = True
         self.check_interval = 10  # segundos
+        self.drain_timeout = int(os.getenv('DRAIN_TIMEOUT', '45'))  # segundos
 
     def is_port_in_use(self, port: int) -> bool:
         """Verifica se uma porta está em uso"""
@@ -118,12 +116,13 @@ class ServiceMonitor:
                 time.sleep(2)
             
             logger.info(f"Iniciando serviço {service_name}...")
-            process = subprocess.Popen(
+            process = process_control.spawn(
+                f"{service_name}-{service['port']}",
                 service['command'],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                cwd=os.getcwd(),
-                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0
+                cwd=service['working_dir'],
+                env={**os.environ, **service['env']}
             )
             
             service['process'] = process
@@ -155,16 +154,13 @@ class ServiceMonitor:
         try:
             logger.info(f"Parando serviço {service_name} (PID {process.pid})...")
             
-            # Tenta parar gentilmente primeiro
-            process.terminate()
-            
-            # Aguarda um pouco
-            time.sleep(3)
+            # Espera as requisições em andamento antes de sinalizar o processo
+            self.drain_service(service_name)
             
-            # Se ainda estiver rodando, força
-            if process.poll() is None:
-                process.kill()
-                time.sleep(1)
+            # SIGTERM no grupo inteiro; o que sobrar após 3s recebe SIGKILL
+            process_control.stop_group_sync(process.pid, getattr(process, 'group_name', None), grace=3,
+                                            create_time=getattr(process, 'create_time', None))
+            process.poll()
             
             service['process'] = None
             logger.info(f"✅ Serviço {service_name} parado")
@@ -174,19 +170,45 @@ class ServiceMonitor:
             logger.error(f"Erro ao parar serviço {service_name}: {e}")
             return False
 
+    def drain_service(self, service_name: str) -> Optional[int]:
+        """Pede a drenagem (POST /admin/drain) e espera o in-flight zerar
+        
+        Retorna as requisições ainda em andamento ao fim do prazo, ou None se o
+        serviço não implementa o protocolo ou não respondeu.
+        """
+        base_url = f"http://localhost:{self.services[service_name]['port']}"
+        headers = {'x-api-key': os.getenv('API_KEY', '')}
+        
+        try:
+            response = requests.post(f"{base_url}/admin/drain", headers=headers, timeout=5)
+            if response.status_code != 200:
+                return None
+            inflight = response.json().get('inflight', 0)
+            deadline = time.monotonic() + self.drain_timeout
+            while inflight and time.monotonic() < deadline:
+                time.sleep(0.5)
+                response = requests.get(f"{base_url}/admin/inflight", headers=headers, timeout=5)
+                if response.status_code != 200:
+                    return None
+                inflight = response.json().get('inflight', 0)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Drenagem de {service_name} indisponível: {e}")
+            return None
+        
+        if inflight:
+            logger.warning(f"Prazo de drenagem de {service_name} esgotado com {inflight} requisições em andamento")
+        else:
+            logger.info(f"Serviço {service_name} drenado")
+        return inflight
+
     def kill_process_on_port(self, port: int):
         """Mata processo usando uma porta específica"""
         try:
-            for proc in psutil.process_iter(['pid', 'name', 'connections']):
-                try:
-                    for conn in proc.info['connections'] or []:
-                        if conn.laddr.port == port:
-                            logger.info(f"Matar processo PID {proc.info['pid']} usando porta {port}")
-                            proc.kill()
-                            time.sleep(1)
-                            return
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+            pid = process_control.listener_pid(port)
+            if pid:
+                logger.info(f"Matar processo PID {pid} usando porta {port}")
+                process_control.kill_group(pid, create_time=process_control.process_create_time(pid))
+                time.sleep(1)
         except Exception as e:
             logger.error(f"Erro ao matar processo na porta {port}: {e}")
 
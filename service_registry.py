@@ -0,0 +1,160 @@
+"""
+Registro declarativo dos serviços supervisionados (services.json)
+Comando, diretório, portas, réplicas, probe de health e dependências de cada
+serviço; lido pelo manager (server.py) e pelo service_monitor.py
+"""
+
+import os
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_FILE = os.getenv('SERVICES_FILE', os.path.join(PROJECT_DIR, 'services.json'))
+LISTEN_STYLES = ('uvicorn', 'env', 'none')
+SUPERVISORS = ('manager', 'monitor')
+
+
+class ServiceSpec:
+    """Definição de um serviço e de como cada réplica recebe porta e ambiente
+
+    listen: 'uvicorn' (--fd herdado ou --host/--port), 'env' (LISTEN_FD/PORT no
+    ambiente) ou 'none' (o processo abre a própria porta).
+    """
+
+    __slots__ = ('name', 'command', 'cwd', 'port', 'port_step', 'ports', 'host', 'replicas',
+                 'listen', 'health_path', 'ready_timeout', 'depends_on', 'env', 'replica_env',
+                 'supervisor')
+
+    def __init__(self, name: str, config: dict):
+        self.name = name
+        self.command: List[str] = list(config['command'])
+        self.cwd = os.path.normpath(os.path.join(PROJECT_DIR, config.get('cwd', '.')))
+        self.port = int(config['port'])
+        self.port_step = int(config.get('port_step', 1))
+        self.ports: Optional[List[int]] = [int(p) for p in config['ports']] if config.get('ports') else None
+        self.host = config.get('host', '0.0.0.0')
+        self.replicas = int(config.get('replicas', 1))
+        self.listen = config.get('listen', 'none')
+        health = config.get('health') or {}
+        self.health_path = health.get('path', '/health')
+        self.ready_timeout = int(health.get('timeout', 30))
+        self.depends_on: List[str] = list(config.get('depends_on', []))
+        self.env: Dict[str, str] = {k: str(v) for k, v in (config.get('env') or {}).items()}
+        self.replica_env: Dict[str, str] = {k: str(v) for k, v in (config.get('replica_env') or {}).items()}
+        self.supervisor = config.get('supervisor', 'manager')
+
+        if self.listen not in LISTEN_STYLES:
+            raise ValueError(f"{name}: listen deve ser um de {LISTEN_STYLES}")
+        if self.supervisor not in SUPERVISORS:
+            raise ValueError(f"{name}: supervisor deve ser um de {SUPERVISORS}")
+        if self.replicas < 1:
+            raise ValueError(f"{name}: replicas deve ser >= 1")
+        if self.ports is not None and len(self.ports) < self.replicas:
+            raise ValueError(f"{name}: {self.replicas} réplicas mas só {len(self.ports)} portas em 'ports'")
+
+    def replica_port(self, replica: int) -> int:
+        if self.ports is not None:
+            return self.ports[replica]
+        return self.port + replica * self.port_step
+
+    def replica_ports(self) -> List[int]:
+        return [self.replica_port(i) for i in range(self.replicas)]
+
+    def group_name(self, port: int) -> str:
+        """Nome do grupo/cgroup da instância (estável entre restarts)"""
+        return f"{self.name}-{port}"
+
+    def log_name(self, replica: int) -> str:
+        return self.name if replica == 0 else f"{self.name}-{replica}"
+
+    def instance_env(self, replica: int, port: int) -> Dict[str, str]:
+        """env do registro (+ replica_env a partir da segunda réplica), com {replica}/{port}"""
+        values = dict(self.env)
+        if replica > 0:
+            values.update(self.replica_env)
+        return {key: value.format(replica=replica, port=port) for key, value in values.items()}
+
+    def build_command(self, port: int, host: Optional[str] = None,
+                      fd: Optional[int] = None) -> Tuple[List[str], Dict[str, str]]:
+        """Linha de comando e variáveis extras para escutar na porta (ou no fd herdado)"""
+        host = host or self.host
+        if self.listen == 'uvicorn':
+            if fd is not None:
+                return self.command + ['--fd', str(fd)], {}
+            return self.command + ['--host', host, '--port', str(port)], {}
+        if self.listen == 'env':
+            env = {'PORT': str(port)}
+            if fd is not None:
+                env['LISTEN_FD'] = str(fd)
+            return list(self.command), env
+        return list(self.command), {}
+
+    def health_url(self, port: int) -> str:
+        return f"http://localhost:{port}{self.health_path}"
+
+    def to_dict(self) -> dict:
+        return {
+            "replicas": self.replicas,
+            "ports": self.replica_ports(),
+            "listen": self.listen,
+            "depends_on": self.depends_on,
+            "supervisor": self.supervisor
+        }
+
+
+def _start_order(specs: Dict[str, ServiceSpec]) -> List[str]:
+    """Ordem topológica pelas dependências (dependências primeiro)"""
+    order: List[str] = []
+    visiting = set()
+
+    def visit(name: str, path: Tuple[str, ...]):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependência circular: {' -> '.join(path + (name,))}")
+        if name not in specs:
+            raise ValueError(f"{path[-1]} depende de serviço inexistente: {name}")
+        visiting.add(name)
+        for dependency in specs[name].depends_on:
+            visit(dependency, path + (name,))
+        visiting.discard(name)
+        order.append(name)
+
+    for name in specs:
+        visit(name, ())
+    return order
+
+
+def load_registry(path: str = SERVICES_FILE,
+                  reserved_ports: Optional[Dict[int, str]] = None) -> Dict[str, ServiceSpec]:
+    """Serviços em ordem de inicialização; SERVICES_OVERRIDES (JSON) ajusta campos
+
+    reserved_ports: portas usadas fora do registro (porta -> dono), também
+    checadas contra conflito.
+    Exemplo: SERVICES_OVERRIDES='{"python": {"replicas": 4}}'
+    """
+    with open(path, encoding='utf-8') as f:
+        raw = json.load(f)['services']
+    overrides = os.getenv('SERVICES_OVERRIDES')
+    if overrides:
+        try:
+            for name, values in json.loads(overrides).items():
+                raw.setdefault(name, {}).update(values)
+        except (ValueError, AttributeError) as e:
+            logger.error(f"SERVICES_OVERRIDES inválido, ignorando: {e}")
+    specs = {name: ServiceSpec(name, config) for name, config in raw.items()}
+    ports = dict(reserved_ports or {})
+    for spec in specs.values():
+        for port in spec.replica_ports():
+            if port in ports:
+                raise ValueError(f"Porta {port} usada por {ports[port]} e {spec.name}")
+            ports[port] = spec.name
+    return {name: specs[name] for name in _start_order(specs)}
+
+
+def supervised_by(registry: Dict[str, ServiceSpec], supervisor: str) -> List[str]:
+    """Serviços de um supervisor, na ordem de inicialização"""
+    return [name for name, spec in registry.items() if spec.supervisor == supervisor]
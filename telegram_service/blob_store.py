@@ -0,0 +1,276 @@
+"""
+Armazenamento de arquivos enviados pelo bot (PDF/TXT/mídia) por conteúdo
+Download do Telegram em streaming direto para data/blobs/ab/<sha256>,
+deduplicado por file id e por hash; servido com suporte a Range
+"""
+
+import os
+import re
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+import unicodedata
+from urllib.parse import quote
+from typing import Iterator, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from telethon import TelegramClient
+from telethon.tl import types
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = os.getenv(
+    'BLOB_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'blobs')
+)
+BLOB_MAX_BYTES = int(os.getenv('BLOB_MAX_BYTES', str(200 * 1024 * 1024)))
+BLOB_DOWNLOAD_CONCURRENCY = int(os.getenv('BLOB_DOWNLOAD_CONCURRENCY', '4'))
+BLOB_DOWNLOAD_CHUNK = 512 * 1024     # múltiplo de 4 KB exigido pelo upload.getFile
+BLOB_READ_CHUNK = 64 * 1024
+
+_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mime_type TEXT,
+    file_name TEXT,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS telegram_files (
+    file_id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL REFERENCES blobs(sha256)
+);
+"""
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+class BlobStore:
+    """Blobs imutáveis endereçados por sha256 + índice file id -> hash"""
+
+    def __init__(self, root: str = BLOB_DIR, max_bytes: int = BLOB_MAX_BYTES,
+                 concurrency: int = BLOB_DOWNLOAD_CONCURRENCY):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(self.root, 'tmp'), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.root, 'index.db'), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # Downloads em andamento por file id: pedidos simultâneos do mesmo
+        # arquivo esperam o primeiro em vez de baixar de novo
+        self._inflight = {}
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def lookup(self, sha256: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, size, mime_type, file_name FROM blobs WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        if row is None or not os.path.exists(self.path_for(row[0])):
+            return None
+        return self._ref(*row)
+
+    def _lookup_file(self, file_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.sha256, b.size, b.mime_type, b.file_name FROM telegram_files f "
+                "JOIN blobs b ON b.sha256 = f.sha256 WHERE f.file_id = ?", (file_id,)
+            ).fetchone()
+        if row is None or not os.path.exists(self.path_for(row[0])):
+            return None
+        return self._ref(*row)
+
+    @staticmethod
+    def _ref(sha256: str, size: int, mime_type: Optional[str], file_name: Optional[str]) -> dict:
+        """Referência incluída no resultado da consulta no lugar do conteúdo"""
+        return {
+            "sha256": sha256,
+            "size": size,
+            "mime_type": mime_type,
+            "file_name": file_name,
+            "url": f"/blobs/{sha256}"
+        }
+
+    def _commit(self, tmp_path: str, sha256: str, size: int, file_id: Optional[int],
+                mime_type: Optional[str], file_name: Optional[str]) -> dict:
+        final_path = self.path_for(sha256)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        if os.path.exists(final_path):
+            # Mesmo conteúdo com outro file id: mantém o blob existente
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (sha256, size, mime_type, file_name, created_at) "
+                "VALUES (?, ?, ?, ?, ?)", (sha256, size, mime_type, file_name, time.time())
+            )
+            if file_id is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO telegram_files (file_id, sha256) VALUES (?, ?)", (file_id, sha256)
+                )
+            self._conn.commit()
+        return self._ref(sha256, size, mime_type, file_name)
+
+    async def store_document(self, client: TelegramClient, message) -> Optional[dict]:
+        """Baixa o documento da mensagem (BotMessage ou tl Message) para o store
+
+        Retorna a referência do blob ou None se a mensagem não tiver arquivo.
+        """
+        raw = getattr(message, 'raw', message)
+        media = getattr(raw, 'media', None)
+        if not isinstance(media, types.MessageMediaDocument) or not isinstance(media.document, types.Document):
+            return None
+        document = media.document
+        ref = await asyncio.to_thread(self._lookup_file, document.id)
+        if ref is not None:
+            return ref
+        if document.size > self.max_bytes:
+            raise BlobTooLarge(f"Arquivo de {document.size} bytes excede o limite de {self.max_bytes}")
+
+        task = self._inflight.get(document.id)
+        if task is None:
+            task = asyncio.ensure_future(self._download(client, document))
+            self._inflight[document.id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(document.id, None))
+        return await asyncio.shield(task)
+
+    async def _download(self, client: TelegramClient, document: types.Document) -> dict:
+        file_name = next((a.file_name for a in document.attributes
+                          if isinstance(a, types.DocumentAttributeFilename)), None)
+        tmp_path = os.path.join(self.root, 'tmp', f"{document.id}.{os.getpid()}.part")
+        digest = hashlib.sha256()
+        size = 0
+        start = time.perf_counter()
+        async with self._semaphore:
+            try:
+                with open(tmp_path, 'wb') as f:
+                    async for chunk in client.iter_download(document, request_size=BLOB_DOWNLOAD_CHUNK,
+                                                            file_size=document.size):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise BlobTooLarge(f"Download excedeu {self.max_bytes} bytes")
+                        digest.update(chunk)
+                        await asyncio.to_thread(f.write, chunk)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        ref = await asyncio.to_thread(self._commit, tmp_path, digest.hexdigest(), size,
+                                      document.id, document.mime_type, file_name)
+        logger.info(f"📎 Arquivo {file_name or document.id} salvo ({size} bytes, "
+                    f"{round((time.perf_counter() - start) * 1000)} ms)")
+        return ref
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(início, fim inclusivo) do cabeçalho Range; None = arquivo inteiro
+
+    Levanta ValueError para intervalo não satisfazível.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        # Múltiplos intervalos ou formato desconhecido: responde o arquivo inteiro
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def content_disposition(file_name: str) -> str:
+    """attachment com nome ASCII (fallback) e filename* UTF-8 (RFC 5987/6266)
+
+    Cabeçalhos HTTP são latin-1; o nome original vai só percent-encoded.
+    """
+    ascii_name = unicodedata.normalize('NFKD', file_name).encode('ascii', 'ignore').decode('ascii')
+    ascii_name = re.sub(r'["\\\x00-\x1f\x7f]', '', ascii_name).strip() or 'arquivo'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(file_name, safe='')}"
+
+
+def _iter_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(BLOB_READ_CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+router = APIRouter()
+_store: Optional[BlobStore] = None
+
+
+def init_blob_store(root: str = BLOB_DIR) -> BlobStore:
+    """Cria o store do serviço; chamar no startup do app"""
+    global _store
+    _store = BlobStore(root)
+    return _store
+
+
+@router.api_route("/blobs/{sha256}", methods=["GET", "HEAD"])
+async def get_blob(sha256: str, request: Request):
+    """Conteúdo de um arquivo recebido do bot, com suporte a Range"""
+    if _store is None:
+        raise HTTPException(status_code=503, detail="Armazenamento de arquivos não inicializado")
+    if not _HASH_RE.match(sha256):
+        raise HTTPException(status_code=400, detail="Hash inválido")
+    ref = await asyncio.to_thread(_store.lookup, sha256)
+    if ref is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+
+    size = ref['size']
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{sha256}"',
+        # Relatórios com dados pessoais: nunca em caches compartilhados
+        "Cache-Control": "private, no-store"
+    }
+    if ref['file_name']:
+        headers["Content-Disposition"] = content_disposition(ref['file_name'])
+    try:
+        byte_range = parse_range(request.headers.get('range'), size)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Intervalo inválido",
+                            headers={"Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None and request.headers.get('if-range', f'"{sha256}"') == f'"{sha256}"':
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+
+    body = iter(()) if request.method == 'HEAD' else _iter_file(_store.path_for(sha256), start, length)
+    return StreamingResponse(body, status_code=status_code, headers=headers,
+                             media_type=ref['mime_type'] or 'application/octet-stream')
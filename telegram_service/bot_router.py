@@ -0,0 +1,257 @@
+"""
+Roteamento de comandos entre vários bots com failover e envio "hedged"
+Cada tipo de consulta (COMMAND_MAP) aponta para um ou mais peers de bot;
+a saúde de cada bot ordena as tentativas e, opcionalmente, um segundo bot
+recebe o comando se o primeiro não responder até o p95 observado
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import APIRouter, Depends, HTTPException
+from telethon import TelegramClient
+
+from validation import COMMAND_MAP, build_command
+from update_filter import BotUpdateDispatcher, default_chat, parse_chat
+from reply_assembler import AssembledReply, ReplyAssembler
+from drain import require_api_key
+
+logger = logging.getLogger(__name__)
+
+BOT_HEDGE_QUANTILE = float(os.getenv('BOT_HEDGE_QUANTILE', '0.95'))
+BOT_FAILURE_THRESHOLD = 3           # falhas seguidas até o bot entrar em cooldown
+BOT_COOLDOWN_SECONDS = float(os.getenv('BOT_COOLDOWN_SECONDS', '30'))
+BOT_HEALTH_ALPHA = 0.2              # peso da amostra mais recente nas médias móveis
+
+
+class RouteConfig:
+    __slots__ = ('bots', 'hedge')
+
+    def __init__(self, bots: List[Union[str, int]], hedge: bool = False):
+        self.bots = bots
+        self.hedge = hedge
+
+    def to_dict(self) -> dict:
+        return {"bots": self.bots, "hedge": self.hedge}
+
+
+def load_routes() -> Dict[str, RouteConfig]:
+    """Tabela tipo -> bots; BOT_ROUTES (JSON) sobrescreve o padrão (todos no CHAT_ID)
+
+    Exemplo: {"cpf": {"bots": ["@botA", "@botB"], "hedge": true}, "nome": ["@botA"]}
+    """
+    chat = default_chat()
+    routes = {query_type: RouteConfig([chat]) for query_type in COMMAND_MAP}
+    raw = os.getenv('BOT_ROUTES')
+    if raw:
+        try:
+            for query_type, config in json.loads(raw).items():
+                if isinstance(config, list):
+                    routes[query_type] = RouteConfig([parse_chat(str(b)) for b in config])
+                else:
+                    routes[query_type] = RouteConfig([parse_chat(str(b)) for b in config['bots']], bool(config.get('hedge')))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.error(f"BOT_ROUTES inválido, usando apenas CHAT_ID: {e}")
+    return routes
+
+
+class BotHealth:
+    """Taxa de sucesso e latência (médias móveis) e cooldown após falhas seguidas"""
+
+    __slots__ = ('success_rate', 'latency_ms', 'consecutive_failures', 'cooldown_until',
+                 'requests', 'failures', 'wins')
+
+    def __init__(self):
+        self.success_rate = 1.0
+        self.latency_ms: Optional[float] = None
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.wins = 0
+
+    def record_success(self, latency_ms: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.success_rate += BOT_HEALTH_ALPHA * (1.0 - self.success_rate)
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += BOT_HEALTH_ALPHA * (latency_ms - self.latency_ms)
+
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.success_rate -= BOT_HEALTH_ALPHA * self.success_rate
+        if self.consecutive_failures >= BOT_FAILURE_THRESHOLD:
+            self.cooldown_until = time.monotonic() + BOT_COOLDOWN_SECONDS
+
+    @property
+    def in_cooldown(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    @property
+    def score(self) -> float:
+        """Maior é melhor; bots em cooldown vão para o fim da fila"""
+        score = self.success_rate / (1.0 + (self.latency_ms or 0.0) / 1000.0)
+        return score - 1.0 if self.in_cooldown else score
+
+    def to_dict(self) -> dict:
+        return {
+            "score": round(self.score, 3),
+            "success_rate": round(self.success_rate, 3),
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "in_cooldown": self.in_cooldown,
+            "requests": self.requests,
+            "failures": self.failures,
+            "wins": self.wins
+        }
+
+
+class BotEndpoint:
+    """Um bot: dispatcher de updates próprio + correlacionador de respostas"""
+
+    def __init__(self, client: TelegramClient, chat: Union[str, int], latency=None):
+        self.chat = chat
+        self.dispatcher = BotUpdateDispatcher(client, chat)
+        self.assembler = ReplyAssembler(latency=latency)
+        self.assembler.attach(self.dispatcher)
+        self.health = BotHealth()
+
+
+class BotRouter:
+    """Envia cada comando ao melhor bot da rota, com failover e hedge opcional"""
+
+    def __init__(self, client: TelegramClient, routes: Optional[Dict[str, RouteConfig]] = None,
+                 latency=None, hedge_quantile: float = BOT_HEDGE_QUANTILE):
+        self.client = client
+        self.routes = routes if routes is not None else load_routes()
+        self.latency = latency
+        self.hedge_quantile = hedge_quantile
+        self.endpoints: Dict[str, BotEndpoint] = {}
+        for config in self.routes.values():
+            for chat in config.bots:
+                if chat not in self.endpoints:
+                    self.endpoints[chat] = BotEndpoint(client, chat, latency)
+        self.failovers = 0
+        self.hedges = 0
+
+    async def start(self, entity_cache=None):
+        """Resolve os peers (cache persistido primeiro) e registra os dispatchers"""
+        for chat, endpoint in self.endpoints.items():
+            input_peer = entity_cache.get(chat) if entity_cache is not None else None
+            await endpoint.dispatcher.start(input_peer)
+            if entity_cache is not None and input_peer is None:
+                entity_cache.put(chat, endpoint.dispatcher.input_peer)
+
+    def stop(self):
+        for endpoint in self.endpoints.values():
+            endpoint.dispatcher.stop()
+
+    def candidates(self, query_type: str) -> List[BotEndpoint]:
+        config = self.routes.get(query_type)
+        if config is None:
+            return []
+        endpoints = [self.endpoints[chat] for chat in config.bots]
+        return sorted(endpoints, key=lambda e: e.health.score, reverse=True)
+
+    def hedge_delay(self, query_type: str) -> Optional[float]:
+        """Espera (s) antes de acionar o segundo bot; None sem amostras suficientes"""
+        if self.latency is None:
+            return None
+        observed = self.latency.quantile(query_type, self.hedge_quantile)
+        return observed / 1000 if observed is not None else None
+
+    async def _send(self, endpoint: BotEndpoint, query_type: str, command: str) -> AssembledReply:
+        message = await self.client.send_message(endpoint.dispatcher.input_peer, command)
+        pending = endpoint.assembler.register(message.id, query_type)
+        reply = await endpoint.assembler.wait(pending)
+        if not reply.complete:
+            # Resposta parcial conta como falha de saúde, mas ainda é um resultado
+            endpoint.health.record_failure()
+        else:
+            endpoint.health.record_success(reply.elapsed_ms)
+        return reply
+
+    async def query(self, query_type: str, value: str) -> Tuple[AssembledReply, str]:
+        """Resposta do primeiro bot a concluir e o peer que respondeu
+
+        Falha (timeout/erro) de um bot aciona o próximo da rota; com hedge
+        ativo, o próximo também é acionado se o atual passar do p95.
+        """
+        remaining = self.candidates(query_type)
+        if not remaining:
+            raise ValueError(f"Nenhum bot configurado para {query_type}")
+        config = self.routes[query_type]
+        command = build_command(query_type, value)
+        tasks: Dict[asyncio.Task, BotEndpoint] = {}
+        last_error: Optional[BaseException] = None
+        hedged = False
+
+        def launch():
+            endpoint = remaining.pop(0)
+            tasks[asyncio.create_task(self._send(endpoint, query_type, command))] = endpoint
+
+        launch()
+        try:
+            while tasks:
+                delay = self.hedge_delay(query_type) if config.hedge and remaining and not hedged else None
+                done, _ = await asyncio.wait(tasks, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.hedges += 1
+                    logger.info(f"Hedge de /{query_type}: acionando segundo bot após {delay:.1f}s")
+                    launch()
+                    continue
+                for task in done:
+                    endpoint = tasks.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        endpoint.health.wins += 1
+                        return task.result(), endpoint.chat
+                    last_error = error
+                    logger.warning(f"Bot {endpoint.chat} falhou em /{query_type}: {type(error).__name__} {error}")
+                    endpoint.health.record_failure()
+                    if remaining and not tasks:
+                        self.failovers += 1
+                        logger.info(f"Failover de /{query_type} para {remaining[0].chat}")
+                        launch()
+        finally:
+            # O perdedor (hedge) ou tarefas restantes deixam de esperar resposta
+            for task in tasks:
+                task.cancel()
+        raise last_error or asyncio.TimeoutError()
+
+    def stats(self) -> dict:
+        return {
+            "routes": {query_type: config.to_dict() for query_type, config in self.routes.items()},
+            "bots": {chat: dict(e.health.to_dict(), pending=e.assembler.pending_count)
+                     for chat, e in self.endpoints.items()},
+            "failovers": self.failovers,
+            "hedges": self.hedges
+        }
+
+
+router = APIRouter(dependencies=[Depends(require_api_key)])
+_bot_router: Optional[BotRouter] = None
+
+
+def init_bot_router(client: TelegramClient, latency=None) -> BotRouter:
+    """Cria o roteador do serviço; chamar no startup do app antes do warm start"""
+    global _bot_router
+    _bot_router = BotRouter(client, latency=latency)
+    return _bot_router
+
+
+@router.get("/bots")
+async def get_bots_status():
+    """Rotas configuradas e saúde de cada bot"""
+    if _bot_router is None:
+        raise HTTPException(status_code=503, detail="Roteador de bots não inicializado")
+    return _bot_router.stats()
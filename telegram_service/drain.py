@@ -0,0 +1,131 @@
+"""
+Protocolo de drenagem para paradas sem perder consultas em andamento
+O manager pede POST /admin/drain, acompanha GET /admin/inflight até zerar e
+só então encerra o processo; durante a drenagem novas requisições recebem 503
+"""
+
+import os
+import time
+import hmac
+import logging
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+logger = logging.getLogger(__name__)
+
+DRAIN_RETRY_AFTER = 2
+# Rotas que continuam atendendo durante a drenagem (controle e health)
+DRAIN_EXEMPT_PATHS = ('/health', '/status', '/admin/drain', '/admin/inflight')
+
+
+class DrainState:
+    """Contador de requisições em andamento e sinalização de drenagem"""
+
+    def __init__(self):
+        self.inflight = 0
+        self.draining = False
+        self.drain_started_at: Optional[float] = None
+        self.rejected = 0
+        # Concluídas desde o início do processo (o manager usa para reciclagem)
+        self.served = 0
+
+    @contextmanager
+    def track(self):
+        """Conta uma unidade de trabalho (requisição HTTP, chamada IPC...)"""
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self.served += 1
+
+    def start_drain(self):
+        if not self.draining:
+            self.draining = True
+            self.drain_started_at = time.time()
+            logger.info(f"🚰 Drenagem iniciada com {self.inflight} requisições em andamento")
+
+    def resume(self):
+        self.draining = False
+        self.drain_started_at = None
+
+    def to_dict(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "draining": self.draining,
+            "drain_started_at": self.drain_started_at,
+            "rejected": self.rejected,
+            "served": self.served
+        }
+
+
+drain_state = DrainState()
+
+
+class DrainMiddleware:
+    """Middleware ASGI: conta requisições e recusa novas durante a drenagem
+
+    Uso: app.add_middleware(DrainMiddleware)
+    """
+
+    def __init__(self, app, state: DrainState = drain_state,
+                 exempt_paths: Iterable[str] = DRAIN_EXEMPT_PATHS):
+        self.app = app
+        self.state = state
+        self.exempt_paths = tuple(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        if self.state.draining:
+            self.state.rejected += 1
+            await send({
+                'type': 'http.response.start',
+                'status': 503,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'retry-after', str(DRAIN_RETRY_AFTER).encode()),
+                    (b'connection', b'close')
+                ]
+            })
+            await send({'type': 'http.response.body', 'body': b'{"detail":"Servi\\u00e7o em drenagem"}'})
+            return
+        with self.state.track():
+            await self.app(scope, receive, send)
+
+
+def drain_fields() -> dict:
+    """Campos para o payload do /health do serviço (lidos pelo manager)"""
+    return {"inflight": drain_state.inflight, "draining": drain_state.draining}
+
+
+def require_api_key(x_api_key: Optional[str] = Header(None)):
+    """Mesma regra do authenticateApiKey da API Node.js: header x-api-key == API_KEY"""
+    expected = os.getenv('API_KEY')
+    if not x_api_key or not expected or not hmac.compare_digest(x_api_key, expected):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+router = APIRouter(dependencies=[Depends(require_api_key)])
+
+
+@router.post("/admin/drain")
+async def start_drain():
+    """Para de aceitar trabalho novo; as requisições em andamento continuam"""
+    drain_state.start_drain()
+    return drain_state.to_dict()
+
+
+@router.delete("/admin/drain")
+async def cancel_drain():
+    """Volta a aceitar requisições (drenagem abortada pelo manager)"""
+    drain_state.resume()
+    return drain_state.to_dict()
+
+
+@router.get("/admin/inflight")
+async def get_inflight():
+    return drain_state.to_dict()
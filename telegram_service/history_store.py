@@ -0,0 +1,317 @@
+"""
+Histórico persistente de consultas e respostas (SQLite em modo WAL)
+Escritas em lote por uma thread dedicada para nunca bloquear o event loop;
+respostas deduplicadas por hash de conteúdo
+"""
+
+import os
+import json
+import time
+import queue
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = os.getenv(
+    'HISTORY_DB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'history.db')
+)
+HISTORY_BATCH_SIZE = 200
+HISTORY_FLUSH_INTERVAL = 0.5
+
+STATUS_OK = 'ok'
+STATUS_NOT_FOUND = 'not_found'
+STATUS_ERROR = 'error'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS replies (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    query_type TEXT NOT NULL,
+    query_value TEXT NOT NULL,
+    api_key_hash TEXT,
+    status TEXT NOT NULL,
+    reply_id INTEGER REFERENCES replies(id),
+    latency_ms REAL,
+    created_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_queries_type_value_ts ON queries(query_type, query_value, created_at);
+CREATE INDEX IF NOT EXISTS idx_queries_api_key_ts ON queries(api_key_hash, created_at);
+CREATE INDEX IF NOT EXISTS idx_queries_status_ts ON queries(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_queries_ts ON queries(created_at);
+
+CREATE TABLE IF NOT EXISTS bulk_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    query_type TEXT NOT NULL,
+    query_value TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+
+CREATE INDEX IF NOT EXISTS idx_bulk_items_status ON bulk_items(job_id, status, position);
+"""
+
+_STOP = object()
+
+
+def hash_api_key(api_key: Optional[str]) -> Optional[str]:
+    """A chave da API nunca é gravada em claro, apenas um hash curto"""
+    if not api_key:
+        return None
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+def _encode_body(result: Any) -> Tuple[str, str]:
+    body = json.dumps(result, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest(), body
+
+
+class HistoryStore:
+    """Armazena consultas, respostas e progresso de jobs em lote
+
+    Também serve de fonte para o tier frio do ResultCache (latest_result)
+    e para a reconstrução do NegativeCache (misses_since/record_miss).
+    """
+
+    def __init__(self, path: str = HISTORY_DB_PATH,
+                 batch_size: int = HISTORY_BATCH_SIZE,
+                 flush_interval: float = HISTORY_FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._queue: 'queue.Queue' = queue.Queue()
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+        self._writer = threading.Thread(target=self._writer_loop, name='history-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        """Conexão de leitura da thread atual (WAL permite leituras concorrentes)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    # Escrita (thread dedicada)
+
+    def _writer_loop(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(conn, batch)
+            except Exception as e:
+                # A thread nunca pode morrer: a fila cresceria sem limite e flush() travaria
+                logger.error(f"Erro inesperado no writer do histórico: {e}")
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        barriers = [args for op, args in batch if op == 'flush']
+        records = [(op, args) for op, args in batch if op != 'flush']
+        try:
+            try:
+                with conn:
+                    for op, args in records:
+                        self._apply(conn, op, args)
+            except Exception as e:
+                # Um registro ruim não pode descartar o lote inteiro: refaz um a um
+                logger.warning(f"Lote de {len(records)} registros falhou ({e}), gravando um a um")
+                for op, args in records:
+                    try:
+                        with conn:
+                            self._apply(conn, op, args)
+                    except Exception as e:
+                        logger.error(f"Registro {op} descartado do histórico: {e}")
+        finally:
+            for event in barriers:
+                event.set()
+
+    def _apply(self, conn: sqlite3.Connection, op: str, args):
+        if op == 'query':
+            self._insert_query(conn, *args)
+        elif op == 'bulk_create':
+            conn.executemany(
+                "INSERT OR IGNORE INTO bulk_items (job_id, position, query_type, query_value, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)", args)
+        elif op == 'bulk_mark':
+            conn.execute(
+                "UPDATE bulk_items SET status = ?, updated_at = ? WHERE job_id = ? AND position = ?", args)
+
+    @staticmethod
+    def _insert_query(conn: sqlite3.Connection, query_type: str, value: str, result: Any,
+                      status: str, api_key_hash: Optional[str], latency_ms: Optional[float], ts: float):
+        reply_id = None
+        if result is not None:
+            content_hash, body = _encode_body(result)
+            conn.execute(
+                "INSERT OR IGNORE INTO replies (content_hash, body, created_at) VALUES (?, ?, ?)",
+                (content_hash, body, ts))
+            reply_id = conn.execute(
+                "SELECT id FROM replies WHERE content_hash = ?", (content_hash,)).fetchone()[0]
+        conn.execute(
+            "INSERT INTO queries (query_type, query_value, api_key_hash, status, reply_id, latency_ms, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (query_type, value, api_key_hash, status, reply_id, latency_ms, ts))
+
+    def record(self, query_type: str, value: str, result: Any = None, status: str = STATUS_OK,
+               api_key: Optional[str] = None, latency_ms: Optional[float] = None, ts: Optional[float] = None):
+        """Enfileira uma consulta para gravação (não bloqueia)"""
+        self._queue.put_nowait(('query', (
+            query_type, value, result, status, hash_api_key(api_key), latency_ms,
+            ts if ts is not None else time.time())))
+
+    def record_miss(self, query_type: str, value: str, ts: float):
+        """Sink do NegativeCache"""
+        self.record(query_type, value, None, STATUS_NOT_FOUND, ts=ts)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda a gravação de tudo que já foi enfileirado (uso fora do event loop)"""
+        event = threading.Event()
+        self._queue.put_nowait(('flush', event))
+        return event.wait(timeout)
+
+    def close(self):
+        self._queue.put_nowait(_STOP)
+        self._writer.join(timeout=10)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Leitura (chamar via asyncio.to_thread a partir do event loop)
+
+    def latest_result(self, query_type: str, value: str,
+                      max_age: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """Último resultado com sucesso para a chave: (resultado, timestamp)"""
+        since = time.time() - max_age if max_age is not None else 0
+        row = self.reader().execute(
+            "SELECT r.body, q.created_at FROM queries q JOIN replies r ON r.id = q.reply_id "
+            "WHERE q.query_type = ? AND q.query_value = ? AND q.status = ? AND q.created_at >= ? "
+            "ORDER BY q.created_at DESC LIMIT 1",
+            (query_type, value, STATUS_OK, since)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def recent_results(self, limit: int) -> List[Tuple[str, str, Any, float]]:
+        """Resultados mais recentes por chave (pré-aquecimento do cache)"""
+        rows = self.reader().execute(
+            "SELECT q.query_type, q.query_value, r.body, max(q.created_at) AS ts "
+            "FROM queries q JOIN replies r ON r.id = q.reply_id WHERE q.status = ? "
+            "GROUP BY q.query_type, q.query_value ORDER BY ts DESC LIMIT ?",
+            (STATUS_OK, limit)).fetchall()
+        return [(query_type, value, json.loads(body), ts) for query_type, value, body, ts in rows]
+
+    def misses_since(self, since: float) -> List[Tuple[str, str, float]]:
+        """Fonte do NegativeCache: consultas 'não encontrado' desde since"""
+        return self.reader().execute(
+            "SELECT query_type, query_value, created_at FROM queries "
+            "WHERE status = ? AND created_at >= ? ORDER BY created_at",
+            (STATUS_NOT_FOUND, since)).fetchall()
+
+    def queries_by_type(self, query_types: Iterable[str], since: float = 0,
+                        status: str = STATUS_OK) -> List[Tuple[str, str, float]]:
+        """(tipo, valor, timestamp) das consultas dos tipos informados desde since"""
+        query_types = list(query_types)
+        placeholders = ', '.join('?' for _ in query_types)
+        return self.reader().execute(
+            "SELECT query_type, query_value, max(created_at) FROM queries "
+            f"WHERE query_type IN ({placeholders}) AND status = ? AND created_at >= ? "
+            "GROUP BY query_type, query_value",
+            (*query_types, status, since)).fetchall()
+
+    def history(self, query_type: Optional[str] = None, value: Optional[str] = None,
+                api_key: Optional[str] = None, since: Optional[float] = None,
+                limit: int = 100) -> List[dict]:
+        """Consulta de auditoria/replay pelos campos indexados"""
+        clauses, params = [], []
+        if query_type:
+            clauses.append("q.query_type = ?")
+            params.append(query_type)
+        if value:
+            clauses.append("q.query_value = ?")
+            params.append(value)
+        if api_key:
+            clauses.append("q.api_key_hash = ?")
+            params.append(hash_api_key(api_key))
+        if since is not None:
+            clauses.append("q.created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.reader().execute(
+            "SELECT q.id, q.query_type, q.query_value, q.status, q.latency_ms, q.created_at, r.body "
+            f"FROM queries q LEFT JOIN replies r ON r.id = q.reply_id {where} "
+            "ORDER BY q.created_at DESC LIMIT ?",
+            (*params, limit)).fetchall()
+        return [
+            {
+                "id": row[0],
+                "type": row[1],
+                "query": row[2],
+                "status": row[3],
+                "latency_ms": row[4],
+                "timestamp": row[5],
+                "result": json.loads(row[6]) if row[6] is not None else None
+            }
+            for row in rows
+        ]
+
+    # Jobs em lote (retomada após restart)
+
+    def create_bulk_job(self, job_id: str, items: Iterable[Tuple[str, str]]):
+        now = time.time()
+        rows = [(job_id, i, query_type, value, now) for i, (query_type, value) in enumerate(items)]
+        self._queue.put_nowait(('bulk_create', rows))
+
+    def mark_bulk_item(self, job_id: str, position: int, status: str):
+        self._queue.put_nowait(('bulk_mark', (status, time.time(), job_id, position)))
+
+    def pending_bulk_items(self, job_id: str) -> List[Tuple[int, str, str]]:
+        """Itens ainda não processados: (posição, tipo, valor)"""
+        return self.reader().execute(
+            "SELECT position, query_type, query_value FROM bulk_items "
+            "WHERE job_id = ? AND status = 'pending' ORDER BY position",
+            (job_id,)).fetchall()
@@ -0,0 +1,213 @@
+"""
+IPC por Unix socket entre os workers HTTP e o processo dono da sessão Telegram
+Quadros com 4 bytes de tamanho (big-endian) + JSON; várias chamadas simultâneas
+por conexão, casadas pelo campo "id"
+"""
+
+import os
+import json
+import struct
+import asyncio
+import logging
+import itertools
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Papel do processo: 'all' (processo único, padrão), 'owner' (Telegram + IPC)
+# ou 'worker' (HTTP sem sessão, encaminha ao owner)
+BRIDGE_ROLE = os.getenv('BRIDGE_ROLE', 'all')
+BRIDGE_IPC_SOCKET = os.getenv(
+    'BRIDGE_IPC_SOCKET',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'bridge.sock')
+)
+IPC_MAX_FRAME = 16 * 1024 * 1024
+IPC_CALL_TIMEOUT = float(os.getenv('IPC_CALL_TIMEOUT', '90'))
+
+_HEADER = struct.Struct('>I')
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class IPCError(Exception):
+    """Erro levantado no owner e repassado ao worker"""
+
+    def __init__(self, type: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.type = type
+        self.message = message
+        self.retry_after = retry_after
+
+
+def _encode(payload: dict) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    if len(body) > IPC_MAX_FRAME:
+        raise ValueError(f"Quadro IPC de {len(body)} bytes excede o limite")
+    return _HEADER.pack(len(body)) + body
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> dict:
+    header = await reader.readexactly(_HEADER.size)
+    (length,) = _HEADER.unpack(header)
+    if length > IPC_MAX_FRAME:
+        raise ValueError(f"Quadro IPC de {length} bytes excede o limite")
+    return json.loads(await reader.readexactly(length))
+
+
+class IPCServer:
+    """Lado do owner: expõe operações (op -> coroutine) no Unix socket"""
+
+    def __init__(self, handlers: Dict[str, Handler], path: str = BRIDGE_IPC_SOCKET, drain=None):
+        self.handlers = handlers
+        self.path = path
+        # DrainState opcional: chamadas em andamento contam para a drenagem do owner
+        self.drain = drain
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers = set()
+        self.connections = 0
+        self.calls = 0
+
+    async def start(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if os.path.exists(self.path):
+            # Socket de uma execução anterior
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.path)
+        os.chmod(self.path, 0o600)
+        logger.info(f"🔌 IPC do owner escutando em {self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # close() não encerra conexões já aceitas
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    request = await _read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                task = asyncio.create_task(self._dispatch(request, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ValueError as e:
+            logger.error(f"Quadro IPC inválido, encerrando conexão: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.connections -= 1
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, request: dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        call_id = request.get('id')
+        handler = self.handlers.get(request.get('op'))
+        self.calls += 1
+        try:
+            if handler is None:
+                raise IPCError('UnknownOperation', f"Operação desconhecida: {request.get('op')}")
+            if self.drain is not None and self.drain.draining:
+                raise IPCError('Draining', "Owner em drenagem", retry_after=2)
+            if self.drain is not None:
+                with self.drain.track():
+                    result = await handler(**request.get('args', {}))
+            else:
+                result = await handler(**request.get('args', {}))
+            response = {'id': call_id, 'ok': True, 'result': result}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            response = {'id': call_id, 'ok': False, 'error': {
+                'type': getattr(e, 'type', None) or type(e).__name__,
+                'message': str(e),
+                'retry_after': getattr(e, 'retry_after', None)
+            }}
+        try:
+            frame = _encode(response)
+        except ValueError as e:
+            frame = _encode({'id': call_id, 'ok': False, 'error': {'type': 'ValueError', 'message': str(e)}})
+        async with write_lock:
+            writer.write(frame)
+            await writer.drain()
+
+    def stats(self) -> dict:
+        return {"socket": self.path, "connections": self.connections, "calls": self.calls}
+
+
+class IPCClient:
+    """Lado do worker: uma conexão persistente e multiplexada com o owner"""
+
+    def __init__(self, path: str = BRIDGE_IPC_SOCKET, timeout: float = IPC_CALL_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _ensure_connected(self):
+        async with self._connect_lock:
+            if self.connected:
+                return
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+            self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        try:
+            while True:
+                response = await _read_frame(self._reader)
+                future = self._pending.pop(response.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logger.warning(f"Conexão IPC com o owner perdida: {type(e).__name__}")
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+            # Chamadas em voo falham; a próxima chamada reconecta
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Conexão IPC com o owner perdida"))
+            self._pending.clear()
+
+    async def call(self, op: str, timeout: Optional[float] = None, **args) -> Any:
+        """Executa a operação no owner e devolve o resultado (ou levanta IPCError)"""
+        await self._ensure_connected()
+        call_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+        try:
+            self._writer.write(_encode({'id': call_id, 'op': op, 'args': args}))
+            await self._writer.drain()
+            response = await asyncio.wait_for(future, timeout or self.timeout)
+        finally:
+            self._pending.pop(call_id, None)
+        if not response.get('ok'):
+            error = response.get('error') or {}
+            raise IPCError(error.get('type', 'Error'), error.get('message', ''), error.get('retry_after'))
+        return response.get('result')
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
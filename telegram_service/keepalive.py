@@ -0,0 +1,165 @@
+"""
+Keepalive da sessão do Telegram com intervalo adaptativo
+Detecta conexão MTProto morta em períodos ociosos e reconecta em background,
+para que a reconexão nunca aconteça durante a consulta de um usuário
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+from telethon import TelegramClient, functions
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_MIN_INTERVAL = float(os.getenv('KEEPALIVE_MIN_INTERVAL', '15'))
+KEEPALIVE_MAX_INTERVAL = float(os.getenv('KEEPALIVE_MAX_INTERVAL', '120'))
+KEEPALIVE_PING_TIMEOUT = float(os.getenv('KEEPALIVE_PING_TIMEOUT', '5'))
+KEEPALIVE_SLOW_PING_MS = 1500
+RECONNECT_MAX_BACKOFF = 60
+MANAGER_URL = os.getenv('MANAGER_URL', 'http://localhost:9000')
+
+
+class SessionKeepalive:
+    """Pinga o Telegram quando ocioso e mantém telegram_connected fiel ao transporte"""
+
+    def __init__(self, client: TelegramClient,
+                 min_interval: float = KEEPALIVE_MIN_INTERVAL,
+                 max_interval: float = KEEPALIVE_MAX_INTERVAL,
+                 ping_timeout: float = KEEPALIVE_PING_TIMEOUT,
+                 manager_url: Optional[str] = MANAGER_URL):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.ping_timeout = ping_timeout
+        self.manager_url = manager_url
+        self.interval = min_interval
+        self.last_activity = time.monotonic()
+        self.last_ping_ms: Optional[float] = None
+        self.last_ok_at: Optional[float] = None
+        self.reconnects = 0
+        self._healthy = False
+        self._task: Optional[asyncio.Task] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._reported: Optional[bool] = None
+
+    @property
+    def telegram_connected(self) -> bool:
+        """Estado real: transporte conectado e último ping bem-sucedido"""
+        return self._healthy and self.client.is_connected()
+
+    def mark_activity(self):
+        """Chamado a cada request/resposta do bot; adia o próximo ping"""
+        self.last_activity = time.monotonic()
+
+    async def ping(self) -> bool:
+        if not self.client.is_connected():
+            return False
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                self.client(functions.PingRequest(ping_id=random.randrange(-2**63, 2**63))),
+                timeout=self.ping_timeout
+            )
+        except Exception as e:
+            # Timeout, transporte e qualquer RPCError (FloodWait etc.) contam como falha
+            logger.warning(f"Ping do Telegram falhou: {type(e).__name__}")
+            return False
+        self.last_ping_ms = round((time.perf_counter() - start) * 1000, 1)
+        self.last_ok_at = time.time()
+        return True
+
+    async def _check(self):
+        ok = await self.ping()
+        if ok:
+            self._healthy = True
+            # Conexão estável: espaça os pings; ping lento volta ao mínimo
+            if self.last_ping_ms > KEEPALIVE_SLOW_PING_MS:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 1.5, self.max_interval)
+        else:
+            self._healthy = False
+            self.interval = self.min_interval
+            self._start_reconnect()
+        await self._report()
+
+    def _start_reconnect(self):
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        backoff = 1
+        while True:
+            try:
+                # Enquanto is_connected() for True, o auto-reconnect do Telethon
+                # cuida do transporte; só reconecta aqui se ele desistiu
+                if not self.client.is_connected():
+                    logger.info("🔄 Reconectando sessão do Telegram em background...")
+                    await self.client.connect()
+                if await self.ping():
+                    self.reconnects += 1
+                    self._healthy = True
+                    self.interval = self.min_interval
+                    logger.info(f"✅ Sessão do Telegram reconectada ({self.last_ping_ms} ms)")
+                    await self._report()
+                    return
+            except Exception as e:
+                logger.error(f"Erro ao reconectar ao Telegram: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_MAX_BACKOFF)
+
+    async def _guarded_check(self):
+        try:
+            await self._check()
+        except Exception as e:
+            # Um erro inesperado não pode encerrar o keepalive do processo
+            logger.error(f"Erro no keepalive do Telegram: {e}")
+            self._healthy = False
+            self.interval = self.min_interval
+
+    async def _loop(self):
+        await self._guarded_check()
+        while True:
+            await asyncio.sleep(self.min_interval)
+            idle = time.monotonic() - self.last_activity
+            transport_lost = self._healthy and not self.client.is_connected()
+            if transport_lost or idle >= self.interval:
+                await self._guarded_check()
+                self.mark_activity()
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+        return self._task
+
+    def stop(self):
+        for task in (self._task, self._reconnect_task):
+            if task:
+                task.cancel()
+        self._task = self._reconnect_task = None
+
+    def status(self) -> dict:
+        return {
+            "telegram_connected": self.telegram_connected,
+            "last_ping_ms": self.last_ping_ms,
+            "last_ok_at": self.last_ok_at,
+            "ping_interval": round(self.interval, 1),
+            "reconnects": self.reconnects
+        }
+
+    async def _report(self):
+        """Envia o estado ao manager (POST /telegram/status) quando ele muda"""
+        connected = self.telegram_connected
+        if not self.manager_url or connected == self._reported:
+            return
+        try:
+            async with httpx.AsyncClient(timeout=3) as http:
+                await http.post(f"{self.manager_url}/telegram/status", json=self.status())
+            self._reported = connected
+        except Exception as e:
+            logger.debug(f"Manager indisponível para status do Telegram: {e}")
@@ -0,0 +1,188 @@
+"""
+Sketches de latência por tipo de comando e prazos de espera adaptativos
+Histograma log-linear (estilo HDR) com janela rotativa; o prazo de cada
+comando é derivado de um quantil configurável mais margem
+"""
+
+import os
+import math
+import time
+import logging
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends
+
+from drain import require_api_key
+
+logger = logging.getLogger(__name__)
+
+LATENCY_MIN_MS = 1.0
+LATENCY_MAX_MS = 600_000.0
+LATENCY_PRECISION = 0.02          # erro relativo máximo de cada bucket
+LATENCY_WINDOW_SECONDS = float(os.getenv('LATENCY_WINDOW_SECONDS', '3600'))
+LATENCY_MIN_SAMPLES = int(os.getenv('LATENCY_MIN_SAMPLES', '20'))
+
+DEADLINE_QUANTILE = float(os.getenv('LATENCY_DEADLINE_QUANTILE', '0.99'))
+DEADLINE_MARGIN_RATIO = float(os.getenv('LATENCY_DEADLINE_MARGIN', '0.25'))
+DEADLINE_MARGIN_MS = float(os.getenv('LATENCY_DEADLINE_MARGIN_MS', '1000'))
+DEADLINE_DEFAULT_MS = 30_000.0    # mesmo valor fixo usado antes pelo /query
+DEADLINE_MIN_MS = float(os.getenv('LATENCY_DEADLINE_MIN_MS', '3000'))
+DEADLINE_MAX_MS = float(os.getenv('LATENCY_DEADLINE_MAX_MS', '60000'))
+
+_LOG_BASE = math.log1p(LATENCY_PRECISION)
+_NUM_BUCKETS = int(math.ceil(math.log(LATENCY_MAX_MS / LATENCY_MIN_MS) / _LOG_BASE)) + 1
+
+
+class LatencyHistogram:
+    """Histograma com buckets geométricos: memória fixa, erro relativo <= LATENCY_PRECISION"""
+
+    __slots__ = ('counts', 'total', 'max_ms')
+
+    def __init__(self):
+        self.counts: List[int] = [0] * _NUM_BUCKETS
+        self.total = 0
+        self.max_ms = 0.0
+
+    @staticmethod
+    def _bucket(value_ms: float) -> int:
+        value_ms = min(max(value_ms, LATENCY_MIN_MS), LATENCY_MAX_MS)
+        return int(math.log(value_ms / LATENCY_MIN_MS) / _LOG_BASE)
+
+    @staticmethod
+    def _bucket_value(index: int) -> float:
+        # Limite superior do bucket: estimativa conservadora para prazos
+        return LATENCY_MIN_MS * math.exp((index + 1) * _LOG_BASE)
+
+    def record(self, value_ms: float):
+        self.counts[self._bucket(value_ms)] += 1
+        self.total += 1
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def merge(self, other: 'LatencyHistogram'):
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total += other.total
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.total == 0:
+            return None
+        rank = max(1, int(math.ceil(q * self.total)))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._bucket_value(i), self.max_ms)
+        return self.max_ms
+
+
+class _WindowedHistogram:
+    """Janela atual + anterior; consultas olham as duas (entre 1 e 2 janelas de dados)"""
+
+    __slots__ = ('current', 'previous', 'rotated_at')
+
+    def __init__(self):
+        self.current = LatencyHistogram()
+        self.previous = LatencyHistogram()
+        self.rotated_at = time.monotonic()
+
+    def _rotate(self, window: float):
+        now = time.monotonic()
+        if now - self.rotated_at >= window:
+            self.previous = self.current if now - self.rotated_at < 2 * window else LatencyHistogram()
+            self.current = LatencyHistogram()
+            self.rotated_at = now
+
+    def snapshot(self, window: float) -> LatencyHistogram:
+        self._rotate(window)
+        merged = LatencyHistogram()
+        merged.merge(self.previous)
+        merged.merge(self.current)
+        return merged
+
+
+class LatencyTracker:
+    """Latências observadas por tipo de comando e prazos derivados delas"""
+
+    def __init__(self, window: float = LATENCY_WINDOW_SECONDS,
+                 quantile: float = DEADLINE_QUANTILE,
+                 margin_ratio: float = DEADLINE_MARGIN_RATIO,
+                 margin_ms: float = DEADLINE_MARGIN_MS,
+                 min_samples: int = LATENCY_MIN_SAMPLES):
+        self.window = window
+        self.quantile_target = quantile
+        self.margin_ratio = margin_ratio
+        self.margin_ms = margin_ms
+        self.min_samples = min_samples
+        self._histograms: Dict[str, _WindowedHistogram] = {}
+        self.timeouts: Dict[str, int] = {}
+
+    def record(self, query_type: str, elapsed_ms: float):
+        hist = self._histograms.setdefault(query_type, _WindowedHistogram())
+        hist._rotate(self.window)
+        hist.current.record(elapsed_ms)
+
+    def record_timeout(self, query_type: str, waited_ms: Optional[float] = None):
+        """Espera esgotada: entra no histograma com o tempo esperado (o prazo
+        aplicado se não informado), já que a resposta levaria ao menos isso
+
+        Só com as respostas concluídas o quantil fica enviesado para baixo e
+        o prazo encolhe justamente quando o bot fica lento.
+        """
+        self.timeouts[query_type] = self.timeouts.get(query_type, 0) + 1
+        self.record(query_type, max(waited_ms or 0.0, self.deadline_ms(query_type)))
+
+    def quantile(self, query_type: str, q: float) -> Optional[float]:
+        hist = self._histograms.get(query_type)
+        if hist is None:
+            return None
+        snapshot = hist.snapshot(self.window)
+        if snapshot.total < self.min_samples:
+            return None
+        return snapshot.quantile(q)
+
+    def deadline_ms(self, query_type: str) -> float:
+        """Prazo de espera: quantil * (1 + margem) + margem fixa, limitado a [mín, máx]"""
+        observed = self.quantile(query_type, self.quantile_target)
+        if observed is None:
+            return DEADLINE_DEFAULT_MS
+        deadline = observed * (1 + self.margin_ratio) + self.margin_ms
+        return min(max(deadline, DEADLINE_MIN_MS), DEADLINE_MAX_MS)
+
+    def deadline(self, query_type: str) -> float:
+        """Prazo em segundos (para asyncio.wait_for)"""
+        return self.deadline_ms(query_type) / 1000
+
+    def stats(self) -> dict:
+        result = {}
+        for query_type, hist in self._histograms.items():
+            snapshot = hist.snapshot(self.window)
+            result[query_type] = {
+                "samples": snapshot.total,
+                "p50_ms": snapshot.quantile(0.50),
+                "p90_ms": snapshot.quantile(0.90),
+                "p95_ms": snapshot.quantile(0.95),
+                "p99_ms": snapshot.quantile(0.99),
+                "max_ms": snapshot.max_ms or None,
+                "timeouts": self.timeouts.get(query_type, 0),
+                "deadline_ms": round(self.deadline_ms(query_type), 1)
+            }
+        return {
+            "quantile": self.quantile_target,
+            "margin_ratio": self.margin_ratio,
+            "margin_ms": self.margin_ms,
+            "min_samples": self.min_samples,
+            "window_seconds": self.window,
+            "types": result
+        }
+
+
+latency_tracker = LatencyTracker()
+router = APIRouter(dependencies=[Depends(require_api_key)])
+
+
+@router.get("/latency")
+async def get_latency_stats():
+    """Latências observadas e prazos aprendidos por tipo de comando"""
+    return latency_tracker.stats()
@@ -0,0 +1,166 @@
+"""
+Normalização de nomes e índice de trigramas para consultas nome/mae
+"Joao da Silva", "JOÃO DA SILVA" e "joao silva" viram a mesma chave, e
+nomes parecidos são encontrados por similaridade entre trigramas
+"""
+
+import re
+import time
+import logging
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+NAME_QUERY_TYPES = ('nome', 'mae')
+NAME_MATCH_MIN_SCORE = 0.85
+NAME_MATCH_LIMIT = 5
+
+# Partículas ignoradas na comparação
+NAME_PARTICLES = frozenset({'da', 'das', 'de', 'do', 'dos', 'e', 'd'})
+
+_NON_LETTERS = re.compile(r'[^a-z]+')
+
+
+def normalize_name(name: str) -> str:
+    """Remove acentos, caixa, partículas e espaços extras"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    ascii_only = ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    words = _NON_LETTERS.sub(' ', ascii_only).split()
+    return ' '.join(w for w in words if w not in NAME_PARTICLES)
+
+
+def name_trigrams(normalized: str) -> Set[str]:
+    """Trigramas por palavra com padding (mesma ideia do pg_trgm)"""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameEntry:
+    __slots__ = ('normalized', 'value', 'trigrams', 'seen_at')
+
+    def __init__(self, normalized: str, value: str, trigrams: Set[str], seen_at: float):
+        self.normalized = normalized
+        self.value = value
+        self.trigrams = trigrams
+        self.seen_at = seen_at
+
+
+class TrigramIndex:
+    """Índice invertido trigrama -> entradas, com ranking por similaridade de Jaccard"""
+
+    def __init__(self):
+        self._entries: List[NameEntry] = []
+        self._by_name: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+
+    def add(self, value: str, seen_at: Optional[float] = None) -> Optional[int]:
+        normalized = normalize_name(value)
+        if not normalized:
+            return None
+        seen_at = seen_at if seen_at is not None else time.time()
+        entry_id = self._by_name.get(normalized)
+        if entry_id is not None:
+            entry = self._entries[entry_id]
+            # Mantém o valor consultado mais recente para a mesma chave
+            if seen_at >= entry.seen_at:
+                entry.value, entry.seen_at = value, seen_at
+            return entry_id
+
+        grams = name_trigrams(normalized)
+        entry_id = len(self._entries)
+        self._entries.append(NameEntry(normalized, value, grams, seen_at))
+        self._by_name[normalized] = entry_id
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(entry_id)
+        return entry_id
+
+    def exact(self, name: str) -> Optional[NameEntry]:
+        entry_id = self._by_name.get(normalize_name(name))
+        return self._entries[entry_id] if entry_id is not None else None
+
+    def search(self, name: str, limit: int = NAME_MATCH_LIMIT,
+               min_score: float = NAME_MATCH_MIN_SCORE) -> List[Tuple[NameEntry, float]]:
+        """Entradas mais similares, ordenadas por score (1.0 = mesma chave)"""
+        normalized = normalize_name(name)
+        exact_id = self._by_name.get(normalized)
+        if exact_id is not None and limit == 1:
+            return [(self._entries[exact_id], 1.0)]
+
+        grams = name_trigrams(normalized)
+        if not grams:
+            return []
+        # Com Jaccard >= min_score o candidato compartilha ao menos
+        # min_shared trigramas da consulta, logo aparece em pelo menos um dos
+        # (len - min_shared + 1) trigramas mais raros (prefix filtering)
+        min_shared = max(1, int(min_score * len(grams)))
+        by_rarity = sorted(grams, key=lambda g: len(self._postings.get(g, ())))
+        candidates: Set[int] = set()
+        for gram in by_rarity[:len(grams) - min_shared + 1]:
+            candidates.update(self._postings.get(gram, ()))
+
+        # Jaccard >= min_score também limita o tamanho do candidato
+        min_len, max_len = min_score * len(grams), len(grams) / min_score
+        results = []
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if not min_len <= len(entry.trigrams) <= max_len:
+                continue
+            count = len(grams & entry.trigrams)
+            score = count / (len(grams) + len(entry.trigrams) - count)
+            if score >= min_score:
+                results.append((entry, score))
+        results.sort(key=lambda item: (-item[1], -item[0].seen_at))
+        return results[:limit]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class NameIndex:
+    """Índices de trigramas separados por tipo (nome, mae)"""
+
+    def __init__(self):
+        self._indexes: Dict[str, TrigramIndex] = {t: TrigramIndex() for t in NAME_QUERY_TYPES}
+
+    def add(self, query_type: str, value: str, seen_at: Optional[float] = None):
+        index = self._indexes.get(query_type)
+        if index is not None:
+            index.add(value, seen_at)
+
+    def best_match(self, query_type: str, value: str,
+                   min_score: float = NAME_MATCH_MIN_SCORE) -> Optional[Tuple[str, float]]:
+        """Valor já consultado que melhor corresponde ao nome: (valor original, score)"""
+        index = self._indexes.get(query_type)
+        if index is None:
+            return None
+        matches = index.search(value, limit=1, min_score=min_score)
+        if not matches:
+            return None
+        entry, score = matches[0]
+        return entry.value, score
+
+    def search(self, query_type: str, value: str, limit: int = NAME_MATCH_LIMIT,
+               min_score: float = NAME_MATCH_MIN_SCORE) -> List[dict]:
+        index = self._indexes.get(query_type)
+        if index is None:
+            return []
+        return [
+            {"query": entry.value, "normalized": entry.normalized, "score": round(score, 3), "seen_at": entry.seen_at}
+            for entry, score in index.search(value, limit, min_score)
+        ]
+
+    def load_from_store(self, store, since: float = 0) -> int:
+        """Carrega nomes já consultados com sucesso do HistoryStore"""
+        total = 0
+        for query_type, value, ts in store.queries_by_type(NAME_QUERY_TYPES, since=since):
+            self.add(query_type, value, ts)
+            total += 1
+        logger.info(f"Índice de nomes carregado com {total} consultas do histórico")
+        return total
+
+    def stats(self) -> dict:
+        return {query_type: len(index) for query_type, index in self._indexes.items()}
@@ -0,0 +1,342 @@
+"""
+Cache negativo para consultas sem resultado ("nada encontrado")
+Filtro de Bloom por tipo de consulta com janelas de expiração por geração
+"""
+
+import os
+import re
+import json
+import math
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Janela (segundos) em que um "não encontrado" continua válido, por tipo
+DEFAULT_NEGATIVE_TTL: Dict[str, int] = {
+    'cpf': 24 * 3600,
+    'cnpj': 24 * 3600,
+    'placa': 12 * 3600,
+    'telefone': 12 * 3600,
+    'email': 24 * 3600,
+    'cep': 7 * 24 * 3600,
+    'nome': 6 * 3600,
+    'mae': 6 * 3600
+}
+
+NEGATIVE_CACHE_GENERATIONS = 4
+NEGATIVE_CACHE_CAPACITY = 50_000
+NEGATIVE_CACHE_ERROR_RATE = 0.001
+NEGATIVE_CACHE_REBUILD_INTERVAL = 15 * 60
+NEGATIVE_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'negative_misses.jsonl')
+
+_NEGATIVE_PATTERNS = re.compile(
+    r'n[ãa]o\s+(foi\s+)?encontrad|nenhum\s+(resultado|registro|dado)|sem\s+(resultado|registro)s?'
+    r'|not\s+found|no\s+results?',
+    re.IGNORECASE
+)
+# Mensagem de "nada encontrado" do bot é curta; relatórios longos nunca são
+NEGATIVE_REPLY_MAX_LEN = 200
+
+# Registro do histórico: (tipo, valor normalizado, timestamp)
+MissRecord = Tuple[str, str, float]
+
+
+def is_negative_reply(text: Optional[str]) -> bool:
+    """Detecta respostas do bot do tipo 'nada encontrado'
+
+    Só a primeira linha conta, e a frase não pode vir depois de um rótulo
+    ("Óbito: Sem registro" é um campo de um relatório positivo).
+    """
+    if not text:
+        return False
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+    if not lines or len(lines[0]) > NEGATIVE_REPLY_MAX_LEN:
+        return False
+    match = _NEGATIVE_PATTERNS.search(lines[0])
+    if match is None or ':' in lines[0][:match.start()]:
+        return False
+    # Linhas seguintes com campos "Rótulo: valor" indicam um relatório
+    return not any(':' in line for line in lines[1:])
+
+
+def load_negative_ttls() -> Dict[str, int]:
+    """Janelas por tipo; NEGATIVE_CACHE_TTL (JSON) sobrescreve os padrões"""
+    ttls = dict(DEFAULT_NEGATIVE_TTL)
+    raw = os.getenv('NEGATIVE_CACHE_TTL')
+    if raw:
+        try:
+            ttls.update({k: int(v) for k, v in json.loads(raw).items()})
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error(f"NEGATIVE_CACHE_TTL inválido, usando padrões: {e}")
+    return ttls
+
+
+class BloomFilter:
+    """Filtro de Bloom compacto (bytearray + double hashing)"""
+
+    def __init__(self, capacity: int, error_rate: float = NEGATIVE_CACHE_ERROR_RATE):
+        self.capacity = max(1, capacity)
+        self.num_bits = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: bytes):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: bytes):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.bits)
+
+
+class _Generation:
+    __slots__ = ('opened_at', 'last_add', 'bloom')
+
+    def __init__(self, opened_at: float, capacity: int, error_rate: float):
+        self.opened_at = opened_at
+        self.last_add = opened_at
+        self.bloom = BloomFilter(capacity, error_rate)
+
+
+class MissLog:
+    """Log append-only (JSONL) das consultas sem resultado, para reconstrução após restart
+
+    Usado quando o cache não recebe fonte/sink de histórico; com o
+    HistoryStore, passe history_source=store.misses_since e
+    history_sink=store.record_miss.
+    """
+
+    def __init__(self, path: str = NEGATIVE_LOG_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Append (executor) e compactação (thread) não podem se intercalar:
+        # um append entre a leitura e o os.replace se perderia
+        self._lock = threading.Lock()
+
+    def append(self, query_type: str, value: str, ts: float):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([query_type, value, ts], ensure_ascii=False) + '\n')
+
+    def read_since(self, since: float) -> List[MissRecord]:
+        records = []
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    query_type, value, ts = json.loads(line)
+                except ValueError:
+                    continue
+                if ts >= since:
+                    records.append((query_type, value, ts))
+        return records
+
+    def compact(self, since: float):
+        """Reescreve o log mantendo apenas registros ainda dentro da janela"""
+        with self._lock:
+            records = self.read_since(since)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(list(record), ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.path)
+
+
+class NegativeCache:
+    """Cache de 'não encontrado' por (tipo, valor normalizado)
+
+    Cada tipo mantém gerações de filtros de Bloom; uma geração é descartada
+    quando sua entrada mais recente ultrapassa a janela do tipo, de modo que
+    uma chave expira entre ttl e ttl * (1 + 1/gerações) depois de inserida.
+    """
+
+    def __init__(self,
+                 ttls: Optional[Dict[str, int]] = None,
+                 history_source: Optional[Callable[[float], Iterable[MissRecord]]] = None,
+                 history_sink: Optional[Callable[[str, str, float], None]] = None,
+                 generations: int = NEGATIVE_CACHE_GENERATIONS,
+                 capacity: int = NEGATIVE_CACHE_CAPACITY,
+                 error_rate: float = NEGATIVE_CACHE_ERROR_RATE):
+        self.ttls = ttls if ttls is not None else load_negative_ttls()
+        self.miss_log: Optional[MissLog] = None
+        if history_source is None and history_sink is None:
+            self.miss_log = MissLog()
+            history_source, history_sink = self.miss_log.read_since, self.miss_log.append
+        self.history_source = history_source
+        self.history_sink = history_sink
+        self.generations = max(1, generations)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filters: Dict[str, List[_Generation]] = {}
+        # Protege _filters entre o event loop e a reconstrução numa thread.
+        # Durante a reconstrução, os adds vão também para _rebuild_adds e
+        # entram nos filtros novos antes da troca; _unpersisted guarda os que
+        # ainda não chegaram ao histórico (e não seriam lidos por ela)
+        self._lock = threading.Lock()
+        self._rebuild_adds: Optional[List[MissRecord]] = None
+        self._unpersisted: List[MissRecord] = []
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(query_type: str, value: str) -> bytes:
+        return f"{query_type}\x1f{value}".encode('utf-8')
+
+    def _prune(self, query_type: str, now: float) -> List[_Generation]:
+        ttl = self.ttls.get(query_type, 0)
+        with self._lock:
+            gens = [g for g in self._filters.get(query_type, []) if now - g.last_add < ttl]
+            self._filters[query_type] = gens
+        return gens
+
+    def _insert(self, query_type: str, value: str, ts: float,
+                filters: Optional[Dict[str, List[_Generation]]] = None):
+        ttl = self.ttls.get(query_type, 0)
+        if ttl <= 0:
+            return
+        filters = self._filters if filters is None else filters
+        gens = filters.setdefault(query_type, [])
+        span = ttl / self.generations
+        current = gens[-1] if gens else None
+        if current is None or ts - current.opened_at >= span or current.bloom.count >= self.capacity:
+            current = _Generation(ts, self.capacity, self.error_rate)
+            gens.append(current)
+        current.bloom.add(self._key(query_type, value))
+        current.last_add = max(current.last_add, ts)
+
+    def add(self, query_type: str, value: str, ts: Optional[float] = None):
+        """Registra consulta sem resultado (valor já normalizado)"""
+        now = time.time()
+        ts = ts if ts is not None else now
+        record = (query_type, value, ts)
+        with self._lock:
+            if now - ts < self.ttls.get(query_type, 0):
+                self._insert(query_type, value, ts)
+            if self._rebuild_adds is not None:
+                self._rebuild_adds.append(record)
+        if self.history_sink:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._persist(record)
+            else:
+                # Append no arquivo/SQLite é bloqueante; fora do event loop
+                with self._lock:
+                    self._unpersisted.append(record)
+                loop.run_in_executor(None, self._persist, record, True)
+
+    def _persist(self, record: MissRecord, queued: bool = False):
+        try:
+            self.history_sink(*record)
+        except Exception as e:
+            logger.error(f"Erro ao persistir miss {record[0]}: {e}")
+        finally:
+            if queued:
+                with self._lock:
+                    self._unpersisted.remove(record)
+
+    def contains(self, query_type: str, value: str) -> bool:
+        """True se a consulta é um 'não encontrado' conhecido e ainda válido"""
+        gens = self._prune(query_type, time.time())
+        key = self._key(query_type, value)
+        found = any(key in g.bloom for g in reversed(gens))
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def rebuild(self, records: Optional[Iterable[MissRecord]] = None):
+        """Reconstrói os filtros a partir do histórico persistido
+
+        Monta filtros novos e troca de uma vez, então pode rodar numa thread
+        enquanto o event loop segue consultando os filtros atuais. Adds feitos
+        durante a montagem (e os ainda não persistidos) entram antes da troca.
+        """
+        now = time.time()
+        if records is None and self.history_source is None:
+            return
+        with self._lock:
+            self._rebuild_adds = list(self._unpersisted)
+        try:
+            if records is None:
+                records = self.history_source(now - max(self.ttls.values(), default=0))
+            filters: Dict[str, List[_Generation]] = {}
+            total = 0
+            for query_type, value, ts in sorted(records, key=lambda r: r[2]):
+                if now - ts < self.ttls.get(query_type, 0):
+                    self._insert(query_type, value, ts, filters)
+                    total += 1
+            with self._lock:
+                for query_type, value, ts in sorted(self._rebuild_adds, key=lambda r: r[2]):
+                    if now - ts < self.ttls.get(query_type, 0):
+                        self._insert(query_type, value, ts, filters)
+                self._filters = {
+                    query_type: [g for g in gens if now - g.last_add < self.ttls.get(query_type, 0)]
+                    for query_type, gens in filters.items()
+                }
+        finally:
+            with self._lock:
+                self._rebuild_adds = None
+        logger.info(f"Cache negativo reconstruído com {total} chaves ({self.size_bytes} bytes)")
+
+    async def _rebuild_loop(self, interval: float):
+        while True:
+            try:
+                # Leitura do histórico e montagem dos filtros são bloqueantes;
+                # rodam fora do event loop
+                since = time.time() - max(self.ttls.values(), default=0)
+                if self.miss_log:
+                    await asyncio.to_thread(self.miss_log.compact, since)
+                await asyncio.to_thread(self.rebuild)
+            except Exception as e:
+                logger.error(f"Erro ao reconstruir cache negativo: {e}")
+            await asyncio.sleep(interval)
+
+    def start_rebuild_task(self, interval: float = NEGATIVE_CACHE_REBUILD_INTERVAL) -> asyncio.Task:
+        """Reconstrói agora (em background) e agenda reconstruções periódicas"""
+        if self._rebuild_task is None or self._rebuild_task.done():
+            self._rebuild_task = asyncio.create_task(self._rebuild_loop(interval))
+        return self._rebuild_task
+
+    def stop_rebuild_task(self):
+        if self._rebuild_task:
+            self._rebuild_task.cancel()
+            self._rebuild_task = None
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(g.bloom.size_bytes for gens in self._filters.values() for g in gens)
+
+    def stats(self) -> dict:
+        return {
+            "types": {
+                query_type: {
+                    "generations": len(gens),
+                    "keys": sum(g.bloom.count for g in gens),
+                    "ttl_seconds": self.ttls.get(query_type)
+                }
+                for query_type, gens in self._filters.items()
+            },
+            "size_bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,262 @@
+"""
+Coleta automática de respostas paginadas do bot
+Detecta botões inline de paginação, busca as páginas em paralelo (respeitando
+um intervalo mínimo entre cliques e FloodWait) e entrega as páginas em ordem
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi.responses import StreamingResponse
+from telethon import TelegramClient, functions
+from telethon.errors import BotResponseTimeoutError, FloodWaitError
+from telethon.tl import types
+
+logger = logging.getLogger(__name__)
+
+PAGINATION_MAX_PAGES = int(os.getenv('PAGINATION_MAX_PAGES', '20'))
+PAGINATION_CONCURRENCY = int(os.getenv('PAGINATION_CONCURRENCY', '3'))
+PAGINATION_CLICK_INTERVAL = float(os.getenv('PAGINATION_CLICK_INTERVAL', '0.35'))
+PAGINATION_PAGE_TIMEOUT = float(os.getenv('PAGINATION_PAGE_TIMEOUT', '15'))
+PAGINATION_MAX_FLOOD_WAIT = 30
+
+PAGINATED_QUERY_TYPES = ('nome', 'mae', 'telefone')
+
+_NEXT_BUTTON = re.compile(r'pr[oó]xim|next|avan[cç]|seguinte|^\s*(?:»|›|>>?|➡️?|▶️?|⏩)\s*$', re.IGNORECASE)
+# Linha/botão contendo só o indicador: "2/7", "Página 2 de 7", "📄 Page 2 of 7"
+_PAGE_INDICATOR = re.compile(
+    r'^\W*(?:p[aá]g(?:ina)?\.?|page)?\s*(\d{1,3})\s*(?:/|de|of)\s*(\d{1,3})\W*$', re.IGNORECASE)
+
+
+class Page:
+    __slots__ = ('number', 'text', 'message_id')
+
+    def __init__(self, number: int, text: str, message_id: int):
+        self.number = number
+        self.text = text
+        self.message_id = message_id
+
+    def to_dict(self) -> dict:
+        return {"page": self.number, "text": self.text, "message_id": self.message_id}
+
+
+class PaginationInfo:
+    """Estado de paginação extraído de uma mensagem do bot
+
+    data_template: callback data com o número da página trocado por {page},
+    quando o bot codifica a página no botão; permite pedir páginas em paralelo.
+    """
+
+    __slots__ = ('message_id', 'current', 'total', 'next_data', 'data_template')
+
+    def __init__(self, message_id: int, current: int, total: Optional[int],
+                 next_data: Optional[bytes], data_template: Optional[bytes]):
+        self.message_id = message_id
+        self.current = current
+        self.total = total
+        self.next_data = next_data
+        self.data_template = data_template
+
+    def data_for(self, page: int) -> Optional[bytes]:
+        if self.data_template is None:
+            return None
+        return self.data_template.replace(b'{page}', str(page).encode())
+
+
+def _buttons(message) -> List[types.KeyboardButtonCallback]:
+    raw = getattr(message, 'raw', None)
+    markup = getattr(raw, 'reply_markup', None)
+    if not isinstance(markup, types.ReplyInlineMarkup):
+        return []
+    return [b for row in markup.rows for b in row.buttons if isinstance(b, types.KeyboardButtonCallback)]
+
+
+def page_indicator(message) -> Optional[tuple]:
+    """(página atual, total) lido dos botões ou do texto da mensagem"""
+    candidates = [b.text for b in _buttons(message)] + (message.text or '').splitlines()
+    for text in candidates:
+        match = _PAGE_INDICATOR.match(text.strip())
+        if match and 0 < int(match.group(1)) <= int(match.group(2)):
+            return int(match.group(1)), int(match.group(2))
+    return None
+
+
+def _template(data: bytes, page: int) -> Optional[bytes]:
+    """Troca o número da página (única ocorrência) por {page} no callback data"""
+    digits = str(page).encode()
+    matches = [m for m in re.finditer(rb'\d+', data) if m.group() == digits]
+    if len(matches) != 1:
+        return None
+    m = matches[0]
+    return data[:m.start()] + b'{page}' + data[m.end():]
+
+
+def detect_pagination(message) -> Optional[PaginationInfo]:
+    """PaginationInfo se a mensagem tiver botão de próxima página; None caso contrário"""
+    next_button = next((b for b in _buttons(message) if _NEXT_BUTTON.search(b.text)), None)
+    if next_button is None:
+        return None
+    indicator = page_indicator(message)
+    current, total = indicator if indicator else (1, None)
+    if total is not None and current >= total:
+        return None
+    template = _template(next_button.data, current + 1) if total else None
+    return PaginationInfo(message.id, current, total, next_button.data, template)
+
+
+class _ClickLimiter:
+    """Intervalo mínimo entre cliques e pausa global em FloodWait"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            delay = self._next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_at = time.monotonic() + self.interval
+
+    def penalize(self, seconds: float):
+        self._next_at = max(self._next_at, time.monotonic() + seconds)
+
+
+class PaginatedCollector:
+    """Busca as demais páginas de uma resposta paginada via cliques nos botões
+
+    As páginas chegam como edições da mensagem original ou como mensagens
+    novas citando-a; cada uma é associada à página pelo indicador "N/total".
+    Sem indicador/template, as páginas são seguidas uma a uma.
+    """
+
+    def __init__(self, client: TelegramClient, dispatcher,
+                 max_pages: int = PAGINATION_MAX_PAGES,
+                 concurrency: int = PAGINATION_CONCURRENCY,
+                 click_interval: float = PAGINATION_CLICK_INTERVAL,
+                 page_timeout: float = PAGINATION_PAGE_TIMEOUT):
+        self.client = client
+        self.dispatcher = dispatcher
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.page_timeout = page_timeout
+        self._limiter = _ClickLimiter(click_interval)
+        # message_id original -> {página: future}
+        self._waiters: Dict[int, Dict[int, asyncio.Future]] = {}
+        dispatcher.subscribe(self._on_message)
+
+    def _on_message(self, message):
+        origin = message.id if message.id in self._waiters else message.reply_to_msg_id
+        waiters = self._waiters.get(origin)
+        if not waiters:
+            return
+        indicator = page_indicator(message)
+        if indicator is not None:
+            future = waiters.get(indicator[0])
+        else:
+            # Sem indicador: só há um clique em andamento (modo sequencial)
+            future = next((f for f in waiters.values() if not f.done()), None)
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    async def _click(self, peer, message_id: int, data: bytes):
+        for _ in range(2):
+            await self._limiter.acquire()
+            try:
+                await self.client(functions.messages.GetBotCallbackAnswerRequest(
+                    peer=peer, msg_id=message_id, data=data))
+                return
+            except FloodWaitError as e:
+                if e.seconds > PAGINATION_MAX_FLOOD_WAIT:
+                    raise
+                logger.warning(f"FloodWait de {e.seconds}s na paginação")
+                self._limiter.penalize(e.seconds)
+            except BotResponseTimeoutError:
+                # O bot nem sempre responde ao callback; a página chega pela edição
+                return
+
+    async def _fetch(self, peer, info: PaginationInfo, number: int, data: bytes):
+        """Clica no botão da página e devolve a BotMessage recebida (ou None)"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(info.message_id, {})[number] = future
+        try:
+            await self._click(peer, info.message_id, data)
+            return await asyncio.wait_for(future, self.page_timeout)
+        except (asyncio.TimeoutError, FloodWaitError) as e:
+            logger.warning(f"Página {number} da mensagem {info.message_id} não recebida: {type(e).__name__}")
+            return None
+        finally:
+            waiters = self._waiters.get(info.message_id, {})
+            waiters.pop(number, None)
+            if not waiters:
+                self._waiters.pop(info.message_id, None)
+
+    async def iter_pages(self, first, peer=None) -> AsyncIterator[Page]:
+        """Gera as páginas em ordem, começando pela mensagem recebida
+
+        first: BotMessage da primeira página (com raw/botões)
+        """
+        peer = peer or self.dispatcher.input_peer
+        info = detect_pagination(first)
+        current = info.current if info else 1
+        yield Page(current, first.text, first.id)
+        if info is None:
+            return
+
+        last = min(info.total or self.max_pages, current + self.max_pages - 1)
+        if info.data_template is not None:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def fetch(number: int):
+                async with semaphore:
+                    return await self._fetch(peer, info, number, info.data_for(number))
+
+            tasks = {n: asyncio.create_task(fetch(n)) for n in range(current + 1, last + 1)}
+            try:
+                # Busca em paralelo, entrega na ordem das páginas
+                for number, task in tasks.items():
+                    message = await task
+                    if message is None:
+                        break
+                    yield Page(number, message.text, message.id)
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+            return
+
+        # Só botão "próxima" sem número de página no callback: segue a cadeia
+        number = current
+        while info is not None and number < last:
+            number += 1
+            message = await self._fetch(peer, info, number, info.next_data)
+            if message is None:
+                return
+            yield Page(number, message.text, message.id)
+            info = detect_pagination(message)
+
+    async def collect(self, first, peer=None) -> dict:
+        """Todas as páginas (até max_pages) mescladas em um único resultado"""
+        pages = [page async for page in self.iter_pages(first, peer)]
+        info = detect_pagination(first)
+        total = info.total if info else 1
+        return {
+            "text": '\n\n'.join(p.text for p in pages if p.text),
+            "pages": [p.to_dict() for p in pages],
+            "page_count": len(pages),
+            "total_pages": total,
+            "truncated": bool(total and len(pages) < total) or (total is None and len(pages) >= self.max_pages)
+        }
+
+
+def stream_pages(pages: AsyncIterator[Page]) -> StreamingResponse:
+    """Resposta NDJSON com uma linha por página, enviada assim que a página chega"""
+    async def body():
+        async for page in pages:
+            yield json.dumps(page.to_dict(), ensure_ascii=False) + '\n'
+    return StreamingResponse(body(), media_type='application/x-ndjson')
@@ -0,0 +1,321 @@
+"""
+Montagem das respostas do bot por requisição correlacionada
+Acompanha mensagens novas e editadas ("consultando..." -> resultado, respostas
+em várias partes) e resolve assim que a regra de conclusão do comando é
+satisfeita, em vez de esperar um tempo fixo
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PLACEHOLDER_PATTERN = (
+    r'aguarde|consultando|buscando|pesquisando|processando|carregando|'
+    r'searching|loading|please wait|⏳|⌛'
+)
+REPLY_DEFAULT_TIMEOUT = 30.0
+# Por quanto tempo uma requisição cancelada/expirada continua absorvendo a
+# resposta atrasada do bot antes de ser esquecida
+REPLY_TOMBSTONE_TTL = float(os.getenv('REPLY_TOMBSTONE_TTL', '60'))
+
+
+class CompletionRule:
+    """Quando considerar a resposta de um comando completa
+
+    settle: silêncio (s) após a última mensagem/edição com conteúdo final
+    max_messages: resolve imediatamente ao atingir N mensagens com conteúdo
+    final_pattern: resolve imediatamente se o conteúdo casar com o padrão
+    placeholder_pattern: mensagens que casam são tratadas como provisórias
+    """
+
+    def __init__(self, settle: float = 1.5, max_messages: Optional[int] = None,
+                 final_pattern: Optional[str] = None,
+                 placeholder_pattern: str = DEFAULT_PLACEHOLDER_PATTERN):
+        self.settle = settle
+        self.max_messages = max_messages
+        self.final_pattern = final_pattern
+        self.placeholder_pattern = placeholder_pattern
+        self._final = re.compile(final_pattern, re.IGNORECASE) if final_pattern else None
+        self._placeholder = re.compile(placeholder_pattern, re.IGNORECASE) if placeholder_pattern else None
+
+    def is_placeholder(self, text: str) -> bool:
+        # Placeholder é mensagem curta de espera; textos longos com a palavra
+        # "consultando" no meio são conteúdo
+        return bool(self._placeholder and len(text) < 200 and self._placeholder.search(text))
+
+    def is_final(self, text: str) -> bool:
+        return bool(self._final and self._final.search(text))
+
+    def to_dict(self) -> dict:
+        return {
+            "settle": self.settle,
+            "max_messages": self.max_messages,
+            "final_pattern": self.final_pattern,
+            "placeholder_pattern": self.placeholder_pattern
+        }
+
+
+DEFAULT_COMPLETION_RULES: Dict[str, CompletionRule] = {
+    'cpf': CompletionRule(settle=1.5),
+    'cnpj': CompletionRule(settle=1.5),
+    'placa': CompletionRule(settle=1.5),
+    'cep': CompletionRule(settle=0.8, max_messages=1),
+    'email': CompletionRule(settle=1.5),
+    'telefone': CompletionRule(settle=2.0),
+    'nome': CompletionRule(settle=3.0),
+    'mae': CompletionRule(settle=3.0)
+}
+
+
+def load_completion_rules() -> Dict[str, CompletionRule]:
+    """Regras por tipo; REPLY_COMPLETION_RULES (JSON) sobrescreve os padrões"""
+    rules = {k: CompletionRule(**v.to_dict()) for k, v in DEFAULT_COMPLETION_RULES.items()}
+    raw = os.getenv('REPLY_COMPLETION_RULES')
+    if raw:
+        try:
+            for query_type, overrides in json.loads(raw).items():
+                base = rules.get(query_type, CompletionRule()).to_dict()
+                base.update(overrides)
+                rules[query_type] = CompletionRule(**base)
+        except (ValueError, TypeError, AttributeError, re.error) as e:
+            logger.error(f"REPLY_COMPLETION_RULES inválido, usando padrões: {e}")
+    return rules
+
+
+class AssembledReply:
+    __slots__ = ('text', 'messages', 'edits', 'elapsed_ms', 'complete')
+
+    def __init__(self, messages: list, edits: int, elapsed_ms: float, complete: bool):
+        self.messages = messages
+        self.text = '\n\n'.join(m.text for m in messages if m.text)
+        self.edits = edits
+        self.elapsed_ms = elapsed_ms
+        self.complete = complete
+
+    def to_dict(self) -> dict:
+        return {
+            "text": self.text,
+            "message_ids": [m.id for m in self.messages],
+            "edits": self.edits,
+            "elapsed_ms": self.elapsed_ms,
+            "complete": self.complete
+        }
+
+
+class PendingReply:
+    """Estado de uma requisição aguardando resposta do bot"""
+
+    def __init__(self, request_msg_id: int, query_type: str, rule: CompletionRule):
+        self.request_msg_id = request_msg_id
+        self.query_type = query_type
+        self.rule = rule
+        self.messages: 'OrderedDict[int, object]' = OrderedDict()
+        self.edits = 0
+        self.created_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._settle_handle: Optional[asyncio.TimerHandle] = None
+        # Lápide: ninguém mais aguarda, mas a resposta atrasada ainda é
+        # absorvida (e descartada) até expires_at
+        self.abandoned = False
+        self.expires_at: Optional[float] = None
+
+    def content(self) -> list:
+        return [m for m in sorted(self.messages.values(), key=lambda m: m.id)
+                if m.text and not self.rule.is_placeholder(m.text)]
+
+    def build(self, complete: bool) -> AssembledReply:
+        elapsed = round((time.monotonic() - self.created_at) * 1000, 1)
+        return AssembledReply(self.content(), self.edits, elapsed, complete)
+
+
+class ReplyAssembler:
+    """Correlaciona mensagens do bot (BotUpdateDispatcher) com requisições pendentes
+
+    A correlação usa reply_to_msg_id quando o bot responde citando o comando
+    ou uma mensagem já atribuída; sem citação, a mensagem vai para a
+    requisição pendente mais antiga.
+    Edições seguem a requisição dona da mensagem original.
+
+    Requisições canceladas ou expiradas sem resposta completa viram lápides
+    (REPLY_TOMBSTONE_TTL): continuam na fila de correlação para que a resposta
+    atrasada do bot seja absorvida e descartada, em vez de ir para a próxima
+    requisição de outro usuário. Comandos enviados ao bot por outra sessão da
+    conta (attach/on_outgoing) entram direto como lápides: as respostas deles
+    não são atribuídas às requisições desta instância.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, CompletionRule]] = None, latency=None):
+        self.rules = rules if rules is not None else load_completion_rules()
+        # LatencyTracker opcional: registra latências e define o prazo padrão
+        self.latency = latency
+        self._pending: 'OrderedDict[int, PendingReply]' = OrderedDict()
+        self._owner: Dict[int, PendingReply] = {}
+
+    def attach(self, dispatcher):
+        dispatcher.subscribe(self.on_message)
+        dispatcher.subscribe_outgoing(self.on_outgoing)
+
+    def register(self, request_msg_id: int, query_type: str) -> PendingReply:
+        """Registrar logo após enviar o comando (antes de aguardar)"""
+        self._expire_tombstones()
+        pending = PendingReply(request_msg_id, query_type, self.rules.get(query_type, CompletionRule()))
+        foreign = self._pending.pop(request_msg_id, None)
+        self._pending[request_msg_id] = pending
+        if foreign is not None:
+            # O update do próprio comando chegou antes do registro: assume o
+            # que a lápide já tinha recebido
+            if foreign._settle_handle:
+                foreign._settle_handle.cancel()
+            pending.messages = foreign.messages
+            for message_id in pending.messages:
+                self._owner[message_id] = pending
+            self._evaluate(pending)
+        return pending
+
+    def on_outgoing(self, request_msg_id: int):
+        """Comando enviado ao bot por outra sessão: vira lápide"""
+        if request_msg_id in self._pending:
+            return
+        self._expire_tombstones()
+        pending = PendingReply(request_msg_id, 'externo', CompletionRule())
+        self._pending[request_msg_id] = pending
+        self._abandon(pending)
+
+    def _expire_tombstones(self):
+        now = time.monotonic()
+        expired = [p for p in self._pending.values() if p.abandoned and p.expires_at <= now]
+        for pending in expired:
+            self._discard(pending)
+
+    def _correlate(self, message) -> Optional[PendingReply]:
+        owner = self._owner.get(message.id)
+        if owner is not None:
+            return owner
+        if message.edited:
+            # Edição de mensagem já entregue (ex.: troca de página): não é
+            # resposta nova para outra requisição
+            return None
+        if message.reply_to_msg_id is not None:
+            if message.reply_to_msg_id in self._pending:
+                return self._pending[message.reply_to_msg_id]
+            # Cita mensagem do bot (ex.: página nova respondendo à anterior):
+            # segue a requisição dona; citação desconhecida é descartada
+            return self._owner.get(message.reply_to_msg_id)
+        # Sem citação: requisição mais antiga enviada antes desta mensagem
+        # (lápides incluídas - o bot responde em ordem, então a resposta
+        # atrasada de um comando cancelado vem antes da dos seguintes)
+        candidates = [p for p in self._pending.values() if p.request_msg_id < message.id]
+        return min(candidates, key=lambda p: p.request_msg_id) if candidates else None
+
+    def on_message(self, message):
+        self._expire_tombstones()
+        pending = self._correlate(message)
+        if pending is None:
+            return
+        if pending.abandoned:
+            self._absorb(pending, message)
+            return
+        if pending.future.done():
+            return
+        if message.id in pending.messages:
+            pending.edits += 1
+        pending.messages[message.id] = message
+        self._owner[message.id] = pending
+        self._evaluate(pending)
+
+    def _absorb(self, pending: PendingReply, message):
+        """Resposta atrasada de uma lápide: descartada; a lápide sai da fila
+        quando o bot termina de responder (mesma regra de silêncio)"""
+        logger.debug(f"Resposta atrasada de {pending.query_type} ({pending.request_msg_id}) descartada")
+        pending.messages[message.id] = message
+        self._owner[message.id] = pending
+        if pending._settle_handle:
+            pending._settle_handle.cancel()
+        loop = asyncio.get_running_loop()
+        pending._settle_handle = loop.call_later(pending.rule.settle, self._discard, pending)
+
+    def _evaluate(self, pending: PendingReply):
+        if pending._settle_handle:
+            pending._settle_handle.cancel()
+            pending._settle_handle = None
+        content = pending.content()
+        if not content:
+            return
+        rule = pending.rule
+        if rule.is_final(content[-1].text) or (rule.max_messages and len(content) >= rule.max_messages):
+            self._resolve(pending, True)
+        else:
+            loop = asyncio.get_running_loop()
+            pending._settle_handle = loop.call_later(rule.settle, self._resolve, pending, True)
+
+    def _resolve(self, pending: PendingReply, complete: bool):
+        if not pending.future.done():
+            reply = pending.build(complete)
+            pending.future.set_result(reply)
+            if self.latency is not None:
+                if complete:
+                    self.latency.record(pending.query_type, reply.elapsed_ms)
+                else:
+                    self.latency.record_timeout(pending.query_type, reply.elapsed_ms)
+        if complete:
+            self._discard(pending)
+        else:
+            # Resposta parcial: o restante ainda pode chegar
+            self._abandon(pending)
+
+    def _abandon(self, pending: PendingReply):
+        """Transforma a requisição em lápide (ninguém mais aguarda)"""
+        if pending._settle_handle:
+            pending._settle_handle.cancel()
+            pending._settle_handle = None
+        if pending.request_msg_id not in self._pending:
+            return
+        pending.abandoned = True
+        pending.expires_at = time.monotonic() + REPLY_TOMBSTONE_TTL
+
+    def _discard(self, pending: PendingReply):
+        if pending._settle_handle:
+            pending._settle_handle.cancel()
+            pending._settle_handle = None
+        self._pending.pop(pending.request_msg_id, None)
+        for message_id in pending.messages:
+            if self._owner.get(message_id) is pending:
+                del self._owner[message_id]
+
+    async def wait(self, pending: PendingReply, timeout: Optional[float] = None) -> AssembledReply:
+        """Aguarda a resposta completa; no timeout devolve o conteúdo parcial
+        (complete=False) ou levanta asyncio.TimeoutError se nada chegou
+
+        Sem timeout explícito usa o prazo aprendido para o tipo de comando.
+        """
+        if timeout is None:
+            timeout = self.latency.deadline(pending.query_type) if self.latency else REPLY_DEFAULT_TIMEOUT
+        try:
+            return await asyncio.wait_for(asyncio.shield(pending.future), timeout)
+        except asyncio.TimeoutError:
+            if pending.content():
+                logger.warning(f"Resposta de {pending.query_type} incompleta após {timeout}s")
+                self._resolve(pending, False)
+                return pending.future.result()
+            if self.latency is not None:
+                self.latency.record_timeout(pending.query_type, timeout * 1000)
+            self._abandon(pending)
+            raise
+        except asyncio.CancelledError:
+            self._abandon(pending)
+            raise
+
+    @property
+    def pending_count(self) -> int:
+        return sum(1 for p in self._pending.values() if not p.abandoned)
+
+    @property
+    def tombstone_count(self) -> int:
+        return sum(1 for p in self._pending.values() if p.abandoned)
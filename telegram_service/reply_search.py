@@ -0,0 +1,143 @@
+"""
+Busca full-text (SQLite FTS5) sobre as respostas do bot persistidas no histórico
+Indexação incremental via triggers na tabela replies do HistoryStore
+"""
+
+import re
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from drain import require_api_key
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEFAULT_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+# Tabela FTS5 com conteúdo externo: o texto fica só em replies, o índice
+# guarda apenas os tokens. O corpo é JSON, então a view troca os escapes
+# (\n, \t, \") por espaço para não colar palavras vizinhas num único token.
+# remove_diacritics 2 torna a busca insensível a acentos
+_FTS_TEXT = "replace(replace(replace({col}, '\\n', ' '), '\\t', ' '), '\\\"', ' ')"
+
+_FTS_SCHEMA = f"""
+CREATE VIEW IF NOT EXISTS replies_text AS
+    SELECT id, {_FTS_TEXT.format(col='body')} AS body FROM replies;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS replies_fts USING fts5(
+    body,
+    content='replies_text',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS replies_fts_ai AFTER INSERT ON replies BEGIN
+    INSERT INTO replies_fts (rowid, body) VALUES (new.id, {_FTS_TEXT.format(col='new.body')});
+END;
+
+CREATE TRIGGER IF NOT EXISTS replies_fts_ad AFTER DELETE ON replies BEGIN
+    INSERT INTO replies_fts (replies_fts, rowid, body) VALUES ('delete', old.id, {_FTS_TEXT.format(col='old.body')});
+END;
+"""
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(text: str, prefix: bool = True) -> Optional[str]:
+    """Converte texto livre em expressão MATCH segura (tokens entre aspas, AND implícito)"""
+    tokens = _TOKEN.findall(text or '')
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class ReplySearch:
+    """Motor de busca sobre o histórico de respostas (HistoryStore)"""
+
+    def __init__(self, store):
+        self.store = store
+        self._ensure_index()
+
+    def _ensure_index(self):
+        conn = self.store.reader()
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'replies_fts'").fetchone()
+        with conn:
+            conn.executescript(_FTS_SCHEMA)
+            if not exists:
+                # Primeira criação: indexa as respostas já gravadas
+                conn.execute("INSERT INTO replies_fts (replies_fts) VALUES ('rebuild')")
+                logger.info("Índice FTS5 das respostas criado a partir do histórico")
+
+    def search(self, text: str, query_type: Optional[str] = None,
+               page: int = 1, page_size: int = SEARCH_DEFAULT_PAGE_SIZE) -> dict:
+        """Busca ranqueada por bm25 com paginação (bloqueante; use via to_thread)"""
+        match = build_match_query(text)
+        page = max(1, page)
+        page_size = min(max(1, page_size), SEARCH_MAX_PAGE_SIZE)
+        if match is None:
+            return {"query": text, "total": 0, "page": page, "page_size": page_size, "results": []}
+
+        type_filter = ""
+        params: List = [match]
+        if query_type:
+            type_filter = "AND EXISTS (SELECT 1 FROM queries q WHERE q.reply_id = r.id AND q.query_type = ?)"
+            params.append(query_type)
+
+        conn = self.store.reader()
+        total = conn.execute(
+            "SELECT count(*) FROM replies_fts JOIN replies r ON r.id = replies_fts.rowid "
+            f"WHERE replies_fts MATCH ? {type_filter}", params).fetchone()[0]
+        rows = conn.execute(
+            "SELECT r.id, snippet(replies_fts, 0, '[', ']', '…', 16), bm25(replies_fts), r.created_at, "
+            "(SELECT q.query_type || ':' || q.query_value FROM queries q "
+            " WHERE q.reply_id = r.id ORDER BY q.created_at DESC LIMIT 1) "
+            "FROM replies_fts JOIN replies r ON r.id = replies_fts.rowid "
+            f"WHERE replies_fts MATCH ? {type_filter} "
+            "ORDER BY bm25(replies_fts) LIMIT ? OFFSET ?",
+            (*params, page_size, (page - 1) * page_size)).fetchall()
+
+        results = []
+        for reply_id, snippet, rank, created_at, source in rows:
+            source_type, _, source_value = (source or '').partition(':')
+            results.append({
+                "reply_id": reply_id,
+                "snippet": snippet,
+                "score": round(-rank, 4),
+                "timestamp": created_at,
+                "type": source_type or None,
+                "query": source_value or None
+            })
+        return {"query": text, "total": total, "page": page, "page_size": page_size, "results": results}
+
+    def get_reply(self, reply_id: int) -> Optional[str]:
+        row = self.store.reader().execute("SELECT body FROM replies WHERE id = ?", (reply_id,)).fetchone()
+        return row[0] if row else None
+
+
+router = APIRouter(dependencies=[Depends(require_api_key)])
+_search: Optional[ReplySearch] = None
+
+
+def init_search(store) -> ReplySearch:
+    """Cria o índice sobre o HistoryStore do serviço; chamar no startup do app"""
+    global _search
+    _search = ReplySearch(store)
+    return _search
+
+
+@router.get("/search")
+async def search_replies(q: str = Query(..., min_length=2),
+                         type: Optional[str] = None,
+                         page: int = Query(1, ge=1),
+                         page_size: int = Query(SEARCH_DEFAULT_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE)):
+    """Busca local nas respostas já recebidas, sem ir ao Telegram"""
+    if _search is None:
+        raise HTTPException(status_code=503, detail="Índice de busca não inicializado")
+    return await asyncio.to_thread(_search.search, q, type, page, page_size)
@@ -0,0 +1,303 @@
+"""
+Cache de resultados com stale-while-revalidate
+Serve o último resultado conhecido (marcado como stale) quando o Telegram
+está desconectado, em FloodWait ou reiniciando, e agenda a atualização
+para quando houver capacidade novamente
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+try:
+    from telethon.errors import FloodWaitError
+except ImportError:  # pragma: no cover - telethon sempre presente no serviço
+    FloodWaitError = None
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_MAX_ENTRIES = 10_000
+REFRESH_POLL_INTERVAL = 2.0
+REFRESH_CONCURRENCY = 2
+
+
+class CachePolicy:
+    """Política por tipo de consulta
+
+    fresh_ttl: idade (s) em que o resultado é servido sem ir ao Telegram
+    stale_ttl: idade máxima (s) aceitável para servir como stale
+    serve_stale: se o tipo aceita resposta stale quando o Telegram falha
+    """
+
+    __slots__ = ('fresh_ttl', 'stale_ttl', 'serve_stale')
+
+    def __init__(self, fresh_ttl: float, stale_ttl: float, serve_stale: bool = True):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = max(stale_ttl, fresh_ttl)
+        self.serve_stale = serve_stale
+
+    def to_dict(self) -> dict:
+        return {"fresh_ttl": self.fresh_ttl, "stale_ttl": self.stale_ttl, "serve_stale": self.serve_stale}
+
+
+DEFAULT_CACHE_POLICY: Dict[str, CachePolicy] = {
+    'cpf': CachePolicy(6 * 3600, 7 * 24 * 3600),
+    'cnpj': CachePolicy(6 * 3600, 7 * 24 * 3600),
+    'placa': CachePolicy(3600, 3 * 24 * 3600),
+    'telefone': CachePolicy(3600, 3 * 24 * 3600),
+    'email': CachePolicy(6 * 3600, 7 * 24 * 3600),
+    'cep': CachePolicy(7 * 24 * 3600, 30 * 24 * 3600),
+    'nome': CachePolicy(3600, 2 * 24 * 3600),
+    'mae': CachePolicy(3600, 2 * 24 * 3600)
+}
+
+
+def load_cache_policies() -> Dict[str, CachePolicy]:
+    """Políticas por tipo; CACHE_POLICY (JSON) sobrescreve os padrões
+
+    Exemplo: CACHE_POLICY='{"nome": {"fresh_ttl": 600, "serve_stale": false}}'
+    """
+    policies = {k: CachePolicy(**v.to_dict()) for k, v in DEFAULT_CACHE_POLICY.items()}
+    raw = os.getenv('CACHE_POLICY')
+    if raw:
+        try:
+            for query_type, overrides in json.loads(raw).items():
+                base = policies.get(query_type, CachePolicy(0, 0, False)).to_dict()
+                base.update(overrides)
+                policies[query_type] = CachePolicy(**base)
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error(f"CACHE_POLICY inválido, usando padrões: {e}")
+    return policies
+
+
+class TelegramUnavailable(Exception):
+    """Telegram sem capacidade no momento (desconectado, FloodWait, reiniciando)"""
+
+    def __init__(self, reason: str, retry_after: Optional[float] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _unavailable_reason(error: BaseException) -> Optional[str]:
+    """Classifica erros que justificam servir resultado stale"""
+    if isinstance(error, TelegramUnavailable):
+        return error.reason
+    if FloodWaitError is not None and isinstance(error, FloodWaitError):
+        return 'flood_wait'
+    if isinstance(error, asyncio.TimeoutError):
+        return 'timeout'
+    if isinstance(error, ConnectionError):
+        return 'disconnected'
+    return None
+
+
+class CacheEntry:
+    __slots__ = ('result', 'stored_at')
+
+    def __init__(self, result: Any, stored_at: float):
+        self.result = result
+        self.stored_at = stored_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class ResultCache:
+    """Cache LRU em memória de resultados por (tipo, valor normalizado)
+
+    Com cold_store (HistoryStore), misses em memória consultam o último
+    resultado persistido dentro da janela stale do tipo. Com shared
+    (SharedResultCache), os workers do mesmo host compartilham os resultados.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 policies: Optional[Dict[str, CachePolicy]] = None,
+                 cold_store=None, shared=None):
+        self.max_entries = max_entries
+        self.policies = policies if policies is not None else load_cache_policies()
+        self.cold_store = cold_store
+        self.shared = shared
+        self._entries: 'OrderedDict[Tuple[str, str], CacheEntry]' = OrderedDict()
+
+    def policy(self, query_type: str) -> CachePolicy:
+        return self.policies.get(query_type) or CachePolicy(0, 0, False)
+
+    def get(self, query_type: str, value: str) -> Optional[CacheEntry]:
+        """Retorna entrada ainda servível (fresca ou stale), ou None
+
+        Com shared, o acerto é servido direto do mmap, sem cópia no LRU do
+        processo; o LRU só guarda o que não coube num slot compartilhado.
+        """
+        key = (query_type, value)
+        if self.shared is not None:
+            found = self.shared.get(query_type, value)
+            if found is not None:
+                entry = CacheEntry(*found)
+                return entry if entry.age <= self.policy(query_type).stale_ttl else None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.age > self.policy(query_type).stale_ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def aget(self, query_type: str, value: str) -> Optional[CacheEntry]:
+        """Como get(), recorrendo ao tier frio (SQLite) fora do event loop"""
+        entry = self.get(query_type, value)
+        if entry is not None or self.cold_store is None:
+            return entry
+        policy = self.policy(query_type)
+        if policy.stale_ttl <= 0:
+            return None
+        try:
+            found = await asyncio.to_thread(self.cold_store.latest_result, query_type, value, policy.stale_ttl)
+        except Exception as e:
+            logger.error(f"Erro ao ler tier frio do cache: {e}")
+            return None
+        if found is None:
+            return None
+        result, stored_at = found
+        self.set(query_type, value, result, stored_at)
+        return CacheEntry(result, stored_at)
+
+    def is_fresh(self, query_type: str, entry: CacheEntry) -> bool:
+        return entry.age <= self.policy(query_type).fresh_ttl
+
+    def _store(self, key: Tuple[str, str], entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, query_type: str, value: str, result: Any, stored_at: Optional[float] = None):
+        entry = CacheEntry(result, stored_at if stored_at is not None else time.time())
+        if self.shared is not None and self.shared.set(query_type, value, result, entry.stored_at):
+            # Compartilhado: uma cópia antiga no LRU local não pode sobreviver
+            self._entries.pop((query_type, value), None)
+            return
+        if self.shared is not None:
+            # Não coube no slot: a versão anterior compartilhada ficou obsoleta
+            self.shared.invalidate(query_type, value)
+        self._store((query_type, value), entry)
+
+    def invalidate(self, query_type: str, value: str):
+        self._entries.pop((query_type, value), None)
+        if self.shared is not None:
+            self.shared.invalidate(query_type, value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RefreshQueue:
+    """Fila de atualizações em background, processada quando há capacidade"""
+
+    def __init__(self, cache: ResultCache,
+                 fetch: Callable[[str, str], Awaitable[Any]],
+                 capacity_available: Callable[[], bool],
+                 concurrency: int = REFRESH_CONCURRENCY,
+                 poll_interval: float = REFRESH_POLL_INTERVAL):
+        self.cache = cache
+        self.fetch = fetch
+        self.capacity_available = capacity_available
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._queue: 'asyncio.Queue[Tuple[str, str]]' = asyncio.Queue()
+        self._pending: Set[Tuple[str, str]] = set()
+        self._workers: list = []
+
+    def enqueue(self, query_type: str, value: str) -> bool:
+        """Agenda atualização; chaves já pendentes não são duplicadas"""
+        key = (query_type, value)
+        if key in self._pending:
+            return False
+        self._pending.add(key)
+        self._queue.put_nowait(key)
+        return True
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            try:
+                while not self.capacity_available():
+                    await asyncio.sleep(self.poll_interval)
+                result = await self.fetch(*key)
+                self.cache.set(key[0], key[1], result)
+                logger.info(f"Cache atualizado em background: {key[0]}")
+            except Exception as e:
+                reason = _unavailable_reason(e)
+                if reason:
+                    # Sem capacidade de novo: devolve para o fim da fila
+                    logger.warning(f"Refresh adiado ({reason}) para {key[0]}")
+                    await asyncio.sleep(getattr(e, 'retry_after', None) or getattr(e, 'seconds', None) or self.poll_interval)
+                    self._queue.put_nowait(key)
+                    continue
+                logger.error(f"Erro no refresh de {key[0]}: {e}")
+            finally:
+                self._queue.task_done()
+            self._pending.discard(key)
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+def _annotate(result: Any, cached: bool, stale: bool, age: float, reason: Optional[str] = None) -> dict:
+    meta = {"hit": cached, "stale": stale, "age_seconds": round(age, 1)}
+    if reason:
+        meta["stale_reason"] = reason
+    if isinstance(result, dict):
+        return {**result, "cache": meta}
+    return {"result": result, "cache": meta}
+
+
+async def serve_with_fallback(cache: ResultCache, refresh: RefreshQueue,
+                              query_type: str, value: str,
+                              fetch: Callable[[], Awaitable[Any]],
+                              telegram_available: Callable[[], bool]) -> dict:
+    """Resolve uma consulta aplicando a política stale-while-revalidate do tipo
+
+    1. Resultado fresco em cache: serve direto
+    2. Telegram indisponível e há resultado stale: serve stale e agenda refresh
+    3. Caso contrário consulta o Telegram; se falhar por indisponibilidade,
+       cai para o resultado stale quando a política permite
+    """
+    entry = await cache.aget(query_type, value)
+    policy = cache.policy(query_type)
+
+    if entry and cache.is_fresh(query_type, entry):
+        return _annotate(entry.result, True, False, entry.age)
+
+    if entry and policy.serve_stale and not telegram_available():
+        refresh.enqueue(query_type, value)
+        return _annotate(entry.result, True, True, entry.age, 'disconnected')
+
+    try:
+        result = await fetch()
+    except Exception as e:
+        reason = _unavailable_reason(e)
+        if reason and entry and policy.serve_stale:
+            logger.warning(f"Servindo resultado stale de {query_type} ({reason}, idade {entry.age:.0f}s)")
+            refresh.enqueue(query_type, value)
+            return _annotate(entry.result, True, True, entry.age, reason)
+        raise
+
+    cache.set(query_type, value, result)
+    return _annotate(result, False, False, 0.0)
@@ -0,0 +1,227 @@
+"""
+Cache de resultados compartilhado entre processos via arquivo mapeado em memória
+Slots de tamanho fixo com endereçamento aberto; leituras sem lock (seqlock por
+slot) e escritas serializadas com flock; valores codificados com marshal
+"""
+
+import os
+import mmap
+import time
+import struct
+import marshal
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: sem flock, o cache só é seguro dentro de um processo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data')
+SHM_CACHE_PATH = os.getenv('SHM_CACHE_PATH', os.path.join(_DEFAULT_DIR, 'telegram_bridge_cache'))
+SHM_CACHE_SLOTS = int(os.getenv('SHM_CACHE_SLOTS', '16384'))
+SHM_CACHE_SLOT_SIZE = int(os.getenv('SHM_CACHE_SLOT_SIZE', '4096'))
+SHM_CACHE_MAX_PROBE = 16
+SHM_READ_RETRIES = 8
+
+_MAGIC = b'SHMC'
+_VERSION = 1
+# magic, versão do layout, versão do marshal, slots, tamanho do slot
+_FILE_HEADER = struct.Struct('<4sHHII')
+_FILE_HEADER_SIZE = 64
+# seq (seqlock), hash da chave, stored_at, tamanho da chave, tamanho do valor, estado
+_SLOT_HEADER = struct.Struct('<IQdHIB')
+_SLOT_HEADER_SIZE = 32
+_SEQ = struct.Struct('<I')
+
+_EMPTY, _USED, _DELETED = 0, 1, 2
+
+
+def _key_bytes(query_type: str, value: str) -> Tuple[bytes, int]:
+    key = f"{query_type}\x00{value}".encode('utf-8')
+    return key, int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+class SharedResultCache:
+    """Tabela hash em arquivo mmap compartilhada por todos os workers do host
+
+    Cada slot guarda uma entrada inteira (chave + valor); um valor que não cabe
+    no slot simplesmente não é compartilhado.
+    """
+
+    def __init__(self, path: str = SHM_CACHE_PATH, slots: int = SHM_CACHE_SLOTS,
+                 slot_size: int = SHM_CACHE_SLOT_SIZE):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.max_payload = slot_size - _SLOT_HEADER_SIZE
+        self.size = _FILE_HEADER_SIZE + slots * slot_size
+        self._thread_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.read_retries = 0
+        self.oversized = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._write_lock():
+            if not self._layout_matches():
+                # Arquivo novo ou de outra configuração/versão do Python
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self.size)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, _FILE_HEADER.pack(_MAGIC, _VERSION, marshal.version, slots, slot_size))
+        self._mm = mmap.mmap(self._fd, self.size)
+        self._view = memoryview(self._mm)
+
+    def _layout_matches(self) -> bool:
+        if os.fstat(self._fd).st_size != self.size:
+            return False
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        header = os.read(self._fd, _FILE_HEADER.size)
+        return header == _FILE_HEADER.pack(_MAGIC, _VERSION, marshal.version, self.slots, self.slot_size)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._thread_lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _offset(self, index: int) -> int:
+        return _FILE_HEADER_SIZE + index * self.slot_size
+
+    def _probe(self, key_hash: int):
+        home = key_hash % self.slots
+        for i in range(min(SHM_CACHE_MAX_PROBE, self.slots)):
+            yield (home + i) % self.slots
+
+    def _read_slot(self, offset: int, key: bytes, key_hash: int):
+        """(estado, resultado, stored_at, chave confere) lidos de forma consistente via seqlock"""
+        view = self._view
+        for _ in range(SHM_READ_RETRIES):
+            seq, slot_hash, stored_at, key_len, value_len, state = _SLOT_HEADER.unpack_from(view, offset)
+            if seq & 1:
+                # Escrita em andamento neste slot
+                self.read_retries += 1
+                continue
+            result = None
+            if state == _USED and slot_hash == key_hash and key_len == len(key):
+                start = offset + _SLOT_HEADER_SIZE
+                if view[start:start + key_len] == key:
+                    try:
+                        result = marshal.loads(view[start + key_len:start + key_len + value_len])
+                    except (ValueError, EOFError, TypeError):
+                        result = None
+                    if _SEQ.unpack_from(view, offset)[0] != seq:
+                        self.read_retries += 1
+                        continue
+                    return state, result, stored_at, True
+            if _SEQ.unpack_from(view, offset)[0] != seq:
+                self.read_retries += 1
+                continue
+            return state, None, stored_at, False
+        return None, None, 0.0, False
+
+    def get(self, query_type: str, value: str) -> Optional[Tuple[Any, float]]:
+        """(resultado, stored_at) ou None; não bloqueia nem adquire lock"""
+        key, key_hash = _key_bytes(query_type, value)
+        for index in self._probe(key_hash):
+            state, result, stored_at, matched = self._read_slot(self._offset(index), key, key_hash)
+            if matched:
+                self.hits += 1
+                return result, stored_at
+            if state == _EMPTY:
+                break
+        self.misses += 1
+        return None
+
+    def _write_slot(self, offset: int, key_hash: int, stored_at: float, key: bytes,
+                    payload: bytes, state: int):
+        view = self._view
+        seq = _SEQ.unpack_from(view, offset)[0]
+        # Seq ímpar: leitores descartam o que lerem até a escrita terminar
+        _SEQ.pack_into(view, offset, seq + 1)
+        start = offset + _SLOT_HEADER_SIZE
+        view[start:start + len(key) + len(payload)] = key + payload
+        _SLOT_HEADER.pack_into(view, offset, seq + 1, key_hash, stored_at, len(key), len(payload), state)
+        _SEQ.pack_into(view, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def set(self, query_type: str, value: str, result: Any, stored_at: Optional[float] = None) -> bool:
+        key, key_hash = _key_bytes(query_type, value)
+        try:
+            payload = marshal.dumps(result)
+        except ValueError:
+            return False
+        if len(key) + len(payload) > self.max_payload:
+            self.oversized += 1
+            return False
+        stored_at = stored_at if stored_at is not None else time.time()
+
+        with self._write_lock():
+            target = None
+            oldest = None
+            for index in self._probe(key_hash):
+                offset = self._offset(index)
+                _, slot_hash, slot_stored_at, key_len, _, state = _SLOT_HEADER.unpack_from(self._view, offset)
+                start = offset + _SLOT_HEADER_SIZE
+                if state == _USED and slot_hash == key_hash and self._view[start:start + key_len] == key:
+                    target = offset
+                    break
+                if state != _USED:
+                    if target is None:
+                        target = offset
+                    if state == _EMPTY:
+                        break
+                elif oldest is None or slot_stored_at < oldest[1]:
+                    oldest = (offset, slot_stored_at)
+            if target is None:
+                # Janela de sondagem cheia: substitui a entrada mais antiga
+                target = oldest[0]
+            self._write_slot(target, key_hash, stored_at, key, payload, _USED)
+        return True
+
+    def invalidate(self, query_type: str, value: str):
+        key, key_hash = _key_bytes(query_type, value)
+        with self._write_lock():
+            for index in self._probe(key_hash):
+                offset = self._offset(index)
+                _, slot_hash, _, key_len, _, state = _SLOT_HEADER.unpack_from(self._view, offset)
+                if state == _EMPTY:
+                    return
+                start = offset + _SLOT_HEADER_SIZE
+                if state == _USED and slot_hash == key_hash and self._view[start:start + key_len] == key:
+                    # Tombstone: mantém a cadeia de sondagem das outras chaves
+                    self._write_slot(offset, 0, 0.0, b'', b'', _DELETED)
+                    return
+
+    def stats(self) -> dict:
+        used = sum(1 for i in range(self.slots)
+                   if self._view[self._offset(i) + _SLOT_HEADER.size - 1] == _USED)
+        return {
+            "path": self.path,
+            "slots": self.slots,
+            "slot_size": self.slot_size,
+            "used": used,
+            "hits": self.hits,
+            "misses": self.misses,
+            "read_retries": self.read_retries,
+            "oversized": self.oversized,
+            "cross_process": fcntl is not None
+        }
+
+    def close(self):
+        self._view.release()
+        self._mm.close()
+        os.close(self._fd)
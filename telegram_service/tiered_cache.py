@@ -0,0 +1,376 @@
+"""
+Cache de resultados em dois níveis: L1 em processo + L2 compartilhado entre nós
+O L2 fica atrás de uma interface de backend (Redis, memória ou arquivo);
+escritas e invalidações são propagadas aos L1 dos outros nós via pub/sub
+"""
+
+import os
+import abc
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from result_cache import CacheEntry, ResultCache
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'none')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'bridge:result:')
+CACHE_INVALIDATION_CHANNEL = 'bridge:invalidate'
+CACHE_FILE_DIR = os.getenv(
+    'CACHE_FILE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'l2cache')
+)
+MGET_CHUNK = 500
+
+InvalidationCallback = Callable[[str], None]
+
+
+def _encode(result: Any, stored_at: float) -> bytes:
+    return json.dumps({"r": result, "t": stored_at}, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def _decode(data: Optional[bytes]) -> Optional[CacheEntry]:
+    if data is None:
+        return None
+    try:
+        payload = json.loads(data)
+        return CacheEntry(payload['r'], payload['t'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class CacheBackend(abc.ABC):
+    """Interface do L2: bytes por chave com TTL e canal de invalidação"""
+
+    name = 'base'
+
+    @abc.abstractmethod
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, data: bytes, ttl: float):
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abc.abstractmethod
+    async def publish(self, message: str):
+        ...
+
+    @abc.abstractmethod
+    async def subscribe(self, callback: Callable[[str], None]):
+        """Entrega cada mensagem publicada (inclusive as deste nó) ao callback"""
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """L2 em memória para testes; instâncias que compartilham o backend simulam nós"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, float]] = {}
+        self._subscribers: List[Callable[[str], None]] = []
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        values = []
+        for key in keys:
+            item = self._data.get(key)
+            if item is not None and item[1] <= now:
+                del self._data[key]
+                item = None
+            values.append(item[0] if item else None)
+        return values
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        self._data[key] = (data, time.time() + ttl)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def publish(self, message: str):
+        for callback in list(self._subscribers):
+            callback(message)
+
+    async def subscribe(self, callback: Callable[[str], None]):
+        self._subscribers.append(callback)
+
+
+class FileBackend(MemoryBackend):
+    """L2 em arquivos (um por chave) para testes e nós no mesmo host
+
+    A invalidação só alcança instâncias do mesmo processo.
+    """
+
+    name = 'file'
+
+    def __init__(self, directory: str = CACHE_FILE_DIR):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at = float(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if expires_at <= time.time():
+            return None
+        return data
+
+    def _write(self, key: str, data: bytes, ttl: float):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(f"{time.time() + ttl}\n".encode())
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await asyncio.to_thread(lambda: [self._read(key) for key in keys])
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        await asyncio.to_thread(self._write, key, data, ttl)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._remove, key)
+
+
+class RedisBackend(CacheBackend):
+    """L2 no Redis (redis.asyncio): MGET em pipeline e invalidação por PUBLISH"""
+
+    name = 'redis'
+
+    def __init__(self, url: str = REDIS_URL, channel: str = CACHE_INVALIDATION_CHANNEL):
+        if aioredis is None:
+            raise RuntimeError("Pacote redis não instalado (pip install redis)")
+        self.url = url
+        self.channel = channel
+        self._redis = aioredis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if len(keys) == 1:
+            return [await self._redis.get(keys[0])]
+        # Lotes grandes: vários MGET numa única ida e volta
+        pipe = self._redis.pipeline(transaction=False)
+        for i in range(0, len(keys), MGET_CHUNK):
+            pipe.mget(keys[i:i + MGET_CHUNK])
+        chunks = await pipe.execute()
+        return [value for chunk in chunks for value in chunk]
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        await self._redis.set(key, data, ex=max(1, int(ttl)))
+
+    async def delete(self, key: str):
+        await self._redis.delete(key)
+
+    async def publish(self, message: str):
+        await self._redis.publish(self.channel, message)
+
+    async def subscribe(self, callback: Callable[[str], None]):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.channel)
+
+        async def listen():
+            backoff = 1
+            while True:
+                try:
+                    async for message in pubsub.listen():
+                        data = message.get('data')
+                        callback(data.decode('utf-8') if isinstance(data, bytes) else str(data))
+                        backoff = 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Pub/sub do Redis interrompido, reassinando: {e}")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30)
+                    try:
+                        await pubsub.subscribe(self.channel)
+                    except Exception:
+                        pass
+
+        self._listener = asyncio.create_task(listen())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        await self._redis.close()
+
+
+def create_backend(name: str = CACHE_BACKEND) -> Optional[CacheBackend]:
+    """Backend do L2 conforme CACHE_BACKEND (none, memory, file, redis)"""
+    if name == 'redis':
+        return RedisBackend()
+    if name == 'file':
+        return FileBackend()
+    if name == 'memory':
+        return MemoryBackend()
+    return None
+
+
+class TieredResultCache:
+    """L1 (ResultCache) na frente de um L2 compartilhado
+
+    Mesma interface usada por serve_with_fallback/RefreshQueue; set() e
+    invalidate() atualizam o L1 na hora e o L2 em background, sem bloquear
+    a consulta. Falhas do L2 nunca derrubam a consulta.
+    """
+
+    def __init__(self, l1: ResultCache, backend: CacheBackend, key_prefix: str = CACHE_KEY_PREFIX):
+        self.l1 = l1
+        self.backend = backend
+        self.key_prefix = key_prefix
+        self.node_id = uuid.uuid4().hex[:12]
+        self._tasks = set()
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.invalidations_received = 0
+
+    def _key(self, query_type: str, value: str) -> str:
+        return f"{self.key_prefix}{query_type}:{value}"
+
+    async def start(self):
+        """Assina o canal de invalidação; chamar no startup do app"""
+        await self.backend.subscribe(self._on_invalidation)
+
+    def _on_invalidation(self, message: str):
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            return
+        if payload.get('node') == self.node_id:
+            return
+        self.invalidations_received += 1
+        self.l1.invalidate(payload['type'], payload['value'])
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # Interface do ResultCache
+
+    def policy(self, query_type: str):
+        return self.l1.policy(query_type)
+
+    def is_fresh(self, query_type: str, entry: CacheEntry) -> bool:
+        return self.l1.is_fresh(query_type, entry)
+
+    def get(self, query_type: str, value: str) -> Optional[CacheEntry]:
+        return self.l1.get(query_type, value)
+
+    async def aget(self, query_type: str, value: str) -> Optional[CacheEntry]:
+        entry = await self.l1.aget(query_type, value)
+        if entry is not None:
+            return entry
+        found = await self.aget_many([(query_type, value)])
+        return found.get((query_type, value))
+
+    async def aget_many(self, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], CacheEntry]:
+        """Várias chaves de uma vez (jobs em lote): L1 primeiro, o resto num único MGET"""
+        found: Dict[Tuple[str, str], CacheEntry] = {}
+        missing = []
+        for key in keys:
+            entry = self.l1.get(*key)
+            if entry is not None:
+                found[key] = entry
+            else:
+                missing.append(key)
+        if not missing:
+            return found
+        try:
+            values = await self.backend.get_many([self._key(*key) for key in missing])
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"L2 indisponível ({self.backend.name}): {e}")
+            return found
+        for key, data in zip(missing, values):
+            entry = _decode(data)
+            if entry is None or entry.age > self.policy(key[0]).stale_ttl:
+                self.l2_misses += 1
+                continue
+            self.l2_hits += 1
+            self.l1.set(key[0], key[1], entry.result, entry.stored_at)
+            found[key] = entry
+        return found
+
+    def set(self, query_type: str, value: str, result: Any, stored_at: Optional[float] = None):
+        stored_at = stored_at if stored_at is not None else time.time()
+        self.l1.set(query_type, value, result, stored_at)
+        ttl = self.policy(query_type).stale_ttl
+        if ttl > 0:
+            self._spawn(self._write(query_type, value, _encode(result, stored_at), ttl))
+
+    def invalidate(self, query_type: str, value: str):
+        self.l1.invalidate(query_type, value)
+        self._spawn(self._delete(query_type, value))
+
+    async def _write(self, query_type: str, value: str, data: bytes, ttl: float):
+        try:
+            await self.backend.set(self._key(query_type, value), data, ttl)
+            # Outros nós descartam a versão antiga do L1 e releem do L2
+            await self._publish(query_type, value)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"Falha ao gravar no L2 ({self.backend.name}): {e}")
+
+    async def _delete(self, query_type: str, value: str):
+        try:
+            await self.backend.delete(self._key(query_type, value))
+            await self._publish(query_type, value)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"Falha ao invalidar no L2 ({self.backend.name}): {e}")
+
+    async def _publish(self, query_type: str, value: str):
+        await self.backend.publish(json.dumps({"node": self.node_id, "type": query_type, "value": value}))
+
+    async def close(self):
+        for task in list(self._tasks):
+            await asyncio.gather(task, return_exceptions=True)
+        await self.backend.close()
+
+    def __len__(self) -> int:
+        return len(self.l1)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "node_id": self.node_id,
+            "l1_entries": len(self.l1),
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "l2_errors": self.l2_errors,
+            "invalidations_received": self.invalidations_received
+        }
@@ -0,0 +1,191 @@
+"""
+Dispatcher único de updates do Telegram restrito ao chat do bot (CHAT_ID)
+Resolve o peer do bot uma vez e descarta todo o resto no handler Raw,
+antes de o Telethon montar objetos de evento
+"""
+
+import os
+import re
+import inspect
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, List, Optional, Union
+
+from telethon import TelegramClient, events, utils
+from telethon.tl import types
+
+logger = logging.getLogger(__name__)
+
+# Apenas updates de mensagem nova/editada chegam ao handler; typing, status,
+# leituras etc. são descartados pelo isinstance do events.Raw
+_RELEVANT_UPDATES = (
+    types.UpdateNewMessage,
+    types.UpdateEditMessage,
+    types.UpdateNewChannelMessage,
+    types.UpdateEditChannelMessage,
+    types.UpdateShortMessage,
+    types.UpdateShortChatMessage,
+)
+_EDIT_UPDATES = (types.UpdateEditMessage, types.UpdateEditChannelMessage)
+
+
+class BotMessage:
+    """Mensagem do bot já filtrada, no formato consumido pelo correlacionador"""
+
+    __slots__ = ('id', 'text', 'edited', 'reply_to_msg_id', 'date', 'raw')
+
+    def __init__(self, id: int, text: str, edited: bool, reply_to_msg_id: Optional[int],
+                 date: Optional[datetime], raw: Any = None):
+        self.id = id
+        self.text = text
+        self.edited = edited
+        self.reply_to_msg_id = reply_to_msg_id
+        self.date = date
+        # tl Message original (botões, mídia); None para updates "short"
+        self.raw = raw
+
+
+MessageCallback = Callable[[BotMessage], Union[None, Awaitable[None]]]
+OutgoingCallback = Callable[[int], None]
+
+
+_NUMERIC_CHAT = re.compile(r'-?[0-9]+')
+
+
+def parse_chat(chat: Optional[Union[str, int]]) -> Optional[Union[str, int]]:
+    """ID numérico em texto ('-1001234567890') vira int; username/link ficam como str
+
+    O Telethon trata uma string só de dígitos como telefone, e a resolução falha.
+    """
+    if isinstance(chat, str):
+        chat = chat.strip()
+        if _NUMERIC_CHAT.fullmatch(chat):
+            return int(chat)
+    return chat
+
+
+def default_chat() -> Optional[Union[str, int]]:
+    """Chat do bot configurado em CHAT_ID"""
+    return parse_chat(os.getenv('CHAT_ID'))
+
+
+def _reply_to(reply_to) -> Optional[int]:
+    return getattr(reply_to, 'reply_to_msg_id', None) if reply_to else None
+
+
+class BotUpdateDispatcher:
+    """Registra um único handler Raw e entrega só mensagens recebidas do chat do bot
+
+    Comandos enviados ao bot por outra sessão da conta (a outra cor do
+    blue/green, o celular) chegam como updates "out"; só o id deles é
+    repassado aos subscribers de saída. Os enviados por esta sessão não
+    geram update.
+    """
+
+    def __init__(self, client: TelegramClient, chat: Optional[Union[str, int]] = None):
+        self.client = client
+        self.chat = parse_chat(chat) if chat is not None else default_chat()
+        self.input_peer = None
+        self.peer_id: Optional[int] = None
+        self._bare_id: Optional[int] = None
+        self._subscribers: List[MessageCallback] = []
+        self._outgoing_subscribers: List[OutgoingCallback] = []
+        self._registered = False
+        self.accepted = 0
+        self.dropped = 0
+        self.outgoing = 0
+
+    async def start(self, input_peer=None):
+        """Resolve o peer (uma única vez) e registra o filtro no cliente
+
+        input_peer pode vir de um cache persistido, evitando a resolução na rede.
+        """
+        if self.input_peer is None:
+            self.input_peer = input_peer or await self.client.get_input_entity(self.chat)
+            self.peer_id = utils.get_peer_id(self.input_peer)
+            self._bare_id = utils.resolve_id(self.peer_id)[0]
+            logger.info(f"Peer do bot resolvido: {self.peer_id}")
+        if not self._registered:
+            self.client.add_event_handler(self._on_update, events.Raw(types=_RELEVANT_UPDATES))
+            self._registered = True
+
+    def stop(self):
+        if self._registered:
+            self.client.remove_event_handler(self._on_update)
+            self._registered = False
+
+    def subscribe(self, callback: MessageCallback):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: MessageCallback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def subscribe_outgoing(self, callback: OutgoingCallback):
+        self._outgoing_subscribers.append(callback)
+
+    def _extract(self, update) -> Optional[BotMessage]:
+        """Converte o update em BotMessage se for do chat do bot; None caso contrário"""
+        if isinstance(update, types.UpdateShortMessage):
+            # Chat privado: user_id é o outro lado da conversa
+            if update.out or update.user_id != self._bare_id:
+                return None
+            return BotMessage(update.id, update.message, False, _reply_to(update.reply_to), update.date)
+
+        if isinstance(update, types.UpdateShortChatMessage):
+            if update.out or update.chat_id != self._bare_id:
+                return None
+            return BotMessage(update.id, update.message, False, _reply_to(update.reply_to), update.date)
+
+        message = update.message
+        if not isinstance(message, types.Message) or message.out:
+            return None
+        if utils.get_peer_id(message.peer_id) != self.peer_id:
+            return None
+        return BotMessage(message.id, message.message or '', isinstance(update, _EDIT_UPDATES),
+                          _reply_to(message.reply_to), message.date, message)
+
+    def _outgoing_id(self, update) -> Optional[int]:
+        """Id de mensagem nova enviada ao chat do bot (por outra sessão); None caso contrário"""
+        if isinstance(update, types.UpdateShortMessage):
+            return update.id if update.out and update.user_id == self._bare_id else None
+        if isinstance(update, types.UpdateShortChatMessage):
+            return update.id if update.out and update.chat_id == self._bare_id else None
+        if isinstance(update, _EDIT_UPDATES):
+            return None
+        message = update.message
+        if not isinstance(message, types.Message) or not message.out:
+            return None
+        return message.id if utils.get_peer_id(message.peer_id) == self.peer_id else None
+
+    async def _on_update(self, update):
+        message = self._extract(update)
+        if message is None:
+            outgoing_id = self._outgoing_id(update)
+            if outgoing_id is None:
+                self.dropped += 1
+                return
+            self.outgoing += 1
+            for callback in self._outgoing_subscribers:
+                try:
+                    callback(outgoing_id)
+                except Exception as e:
+                    logger.error(f"Erro no subscriber de comandos enviados: {e}")
+            return
+        self.accepted += 1
+        for callback in self._subscribers:
+            try:
+                result = callback(message)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Erro no subscriber de mensagens do bot: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "peer_id": self.peer_id,
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "outgoing": self.outgoing,
+            "subscribers": len(self._subscribers)
+        }
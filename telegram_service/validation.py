@@ -0,0 +1,236 @@
+"""
+Validação e normalização das consultas antes do envio ao bot
+Rejeita entradas malformadas localmente, sem gastar round-trip no Telegram
+"""
+
+import re
+import logging
+from typing import Dict, Iterable, List, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - caminho bulk cai para Python puro
+    np = None
+
+from name_index import normalize_name
+
+logger = logging.getLogger(__name__)
+
+# Mesmo mapeamento do commandMap da API Node.js (api/index.js)
+COMMAND_MAP: Dict[str, str] = {
+    'cpf': '/cpf',
+    'telefone': '/telefone',
+    'placa': '/placa',
+    'nome': '/nome',
+    'email': '/email',
+    'cep': '/cep',
+    'cnpj': '/cnpj',
+    'mae': '/mae'
+}
+
+# Só dígitos ASCII: \D e str.isdigit() aceitam dígitos Unicode (ex.: árabe-índicos)
+_NON_DIGITS = re.compile(r'[^0-9]')
+_WHITESPACE = re.compile(r'\s+')
+_PLACA_ANTIGA = re.compile(r'^[A-Z]{3}[0-9]{4}$')
+_PLACA_MERCOSUL = re.compile(r'^[A-Z]{3}[0-9][A-Z][0-9]{2}$')
+_EMAIL = re.compile(r'^[a-z0-9._%+\-]+@[a-z0-9.\-]+\.[a-z]{2,}$')
+_NOME = re.compile(r"^[^\W\d_]+(?:[ '.\-][^\W\d_]+)*\.?$")
+
+_CPF_PESOS_1 = (10, 9, 8, 7, 6, 5, 4, 3, 2)
+_CPF_PESOS_2 = (11, 10, 9, 8, 7, 6, 5, 4, 3, 2)
+_CNPJ_PESOS_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_CNPJ_PESOS_2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+NOME_MIN_LEN = 5
+NOME_MAX_LEN = 120
+
+
+class ValidationError(ValueError):
+    """Consulta rejeitada antes de chegar ao Telegram"""
+
+    def __init__(self, query_type: str, reason: str):
+        super().__init__(f"{query_type}: {reason}")
+        self.query_type = query_type
+        self.reason = reason
+
+
+def _is_digits(value: str) -> bool:
+    return value.isascii() and value.isdigit()
+
+
+def _digito(soma: int) -> int:
+    resto = soma % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def is_valid_cpf(cpf: str) -> bool:
+    """Verifica dígitos verificadores de um CPF já normalizado (11 dígitos)"""
+    if len(cpf) != 11 or not _is_digits(cpf) or cpf == cpf[0] * 11:
+        return False
+    digitos = [int(c) for c in cpf]
+    dv1 = _digito(sum(d * p for d, p in zip(digitos, _CPF_PESOS_1)))
+    dv2 = _digito(sum(d * p for d, p in zip(digitos, _CPF_PESOS_2)))
+    return digitos[9] == dv1 and digitos[10] == dv2
+
+
+def is_valid_cnpj(cnpj: str) -> bool:
+    """Verifica dígitos verificadores de um CNPJ já normalizado (14 dígitos)"""
+    if len(cnpj) != 14 or not _is_digits(cnpj) or cnpj == cnpj[0] * 14:
+        return False
+    digitos = [int(c) for c in cnpj]
+    dv1 = _digito(sum(d * p for d, p in zip(digitos, _CNPJ_PESOS_1)))
+    dv2 = _digito(sum(d * p for d, p in zip(digitos, _CNPJ_PESOS_2)))
+    return digitos[12] == dv1 and digitos[13] == dv2
+
+
+def _normalize_cpf(value: str) -> str:
+    cpf = _NON_DIGITS.sub('', value)
+    if len(cpf) != 11:
+        raise ValidationError('cpf', 'CPF deve ter 11 dígitos')
+    if not is_valid_cpf(cpf):
+        raise ValidationError('cpf', 'dígitos verificadores inválidos')
+    return cpf
+
+
+def _normalize_cnpj(value: str) -> str:
+    cnpj = _NON_DIGITS.sub('', value)
+    if len(cnpj) != 14:
+        raise ValidationError('cnpj', 'CNPJ deve ter 14 dígitos')
+    if not is_valid_cnpj(cnpj):
+        raise ValidationError('cnpj', 'dígitos verificadores inválidos')
+    return cnpj
+
+
+def _normalize_placa(value: str) -> str:
+    placa = re.sub(r'[\s\-]', '', value).upper()
+    if not (_PLACA_ANTIGA.match(placa) or _PLACA_MERCOSUL.match(placa)):
+        raise ValidationError('placa', 'formato esperado ABC1234 ou ABC1D23')
+    return placa
+
+
+def _normalize_cep(value: str) -> str:
+    cep = _NON_DIGITS.sub('', value)
+    if len(cep) != 8 or cep == '00000000':
+        raise ValidationError('cep', 'CEP deve ter 8 dígitos')
+    return cep
+
+
+def _normalize_telefone(value: str) -> str:
+    telefone = _NON_DIGITS.sub('', value)
+    # Remove código do país (+55) quando presente
+    if len(telefone) in (12, 13) and telefone.startswith('55'):
+        telefone = telefone[2:]
+    if len(telefone) not in (10, 11):
+        raise ValidationError('telefone', 'telefone deve ter DDD + 8 ou 9 dígitos')
+    if telefone[0] == '0' or telefone[1] == '0':
+        raise ValidationError('telefone', 'DDD inválido')
+    if len(telefone) == 11 and telefone[2] != '9':
+        raise ValidationError('telefone', 'celular com 9 dígitos deve começar com 9')
+    return telefone
+
+
+def _normalize_email(value: str) -> str:
+    email = value.strip().lower()
+    if len(email) > 254 or not _EMAIL.match(email):
+        raise ValidationError('email', 'email inválido')
+    return email
+
+
+def _normalize_nome(query_type: str, value: str) -> str:
+    nome = _WHITESPACE.sub(' ', value).strip()
+    if len(nome) < NOME_MIN_LEN or len(nome) > NOME_MAX_LEN:
+        raise ValidationError(query_type, f'nome deve ter entre {NOME_MIN_LEN} e {NOME_MAX_LEN} caracteres')
+    if not _NOME.match(nome):
+        raise ValidationError(query_type, 'nome contém caracteres inválidos')
+    return nome
+
+
+_NORMALIZERS = {
+    'cpf': _normalize_cpf,
+    'cnpj': _normalize_cnpj,
+    'placa': _normalize_placa,
+    'cep': _normalize_cep,
+    'telefone': _normalize_telefone,
+    'email': _normalize_email,
+    'nome': lambda value: _normalize_nome('nome', value),
+    'mae': lambda value: _normalize_nome('mae', value),
+}
+
+
+def validate_query(query_type: str, query: str) -> str:
+    """Valida e normaliza uma consulta; levanta ValidationError se inválida"""
+    query_type = (query_type or '').strip().lower()
+    if query_type not in COMMAND_MAP:
+        raise ValidationError(query_type, f"tipo não suportado (suportados: {', '.join(COMMAND_MAP)})")
+    if not isinstance(query, str) or not query.strip():
+        raise ValidationError(query_type, 'consulta vazia')
+    return _NORMALIZERS[query_type](query)
+
+
+def cache_key(query_type: str, query: str) -> str:
+    """Chave de cache de uma consulta já validada
+
+    Para nome/mae ignora acentos, caixa e partículas, de modo que variações
+    de digitação do mesmo nome compartilhem o resultado
+    """
+    if query_type in ('nome', 'mae'):
+        return normalize_name(query)
+    return query
+
+
+def parse_command(command: str) -> Tuple[str, str]:
+    """Converte '/cpf 123...' em ('cpf', '123...') validado"""
+    partes = (command or '').strip().split(None, 1)
+    if len(partes) != 2:
+        raise ValidationError('command', "formato esperado '/<tipo> <consulta>'")
+    query_type = partes[0].lstrip('/').lower()
+    return query_type, validate_query(query_type, partes[1])
+
+
+def build_command(query_type: str, query: str) -> str:
+    """Monta o comando do bot a partir de uma consulta já validada"""
+    return f"{COMMAND_MAP[query_type]} {query}"
+
+
+# Validação em lote (bulk/batch jobs)
+
+def _to_digit_matrix(values: Iterable[str], width: int):
+    """Normaliza e converte valores para matriz (n, width) de dígitos"""
+    normalizados = [v if _is_digits(v) else _NON_DIGITS.sub('', v) for v in values]
+    tamanhos = np.fromiter(map(len, normalizados), dtype=np.int32, count=len(normalizados))
+    # Strings curtas ficam com padding NUL e as longas são truncadas; ambas
+    # são descartadas pela máscara de tamanho logo abaixo
+    bruto = np.array(normalizados, dtype=f'S{width}').view(np.uint8).reshape(-1, width)
+    digitos = bruto.astype(np.int32) - 48
+    ok = (tamanhos == width) & ((digitos >= 0) & (digitos <= 9)).all(axis=1)
+    return digitos, ok
+
+
+def _vector_dv(digitos, pesos) -> 'np.ndarray':
+    resto = (digitos @ np.asarray(pesos, dtype=np.int32)) % 11
+    return np.where(resto < 2, 0, 11 - resto)
+
+
+def _bulk_validate(values, width: int, pesos_1, pesos_2, scalar) -> Union['np.ndarray', List[bool]]:
+    values = list(values)
+    if np is None:
+        return [scalar(_NON_DIGITS.sub('', v)) for v in values]
+    if not values:
+        return np.zeros(0, dtype=bool)
+
+    digitos, ok = _to_digit_matrix(values, width)
+    n = len(pesos_1)
+    dv1 = _vector_dv(digitos[:, :n], pesos_1)
+    dv2 = _vector_dv(digitos[:, :n + 1], pesos_2)
+    repetidos = (digitos == digitos[:, :1]).all(axis=1)
+    return ok & ~repetidos & (digitos[:, n] == dv1) & (digitos[:, n + 1] == dv2)
+
+
+def bulk_validate_cpf(values: Iterable[str]) -> Union['np.ndarray', List[bool]]:
+    """Valida CPFs em lote; retorna máscara booleana (ndarray se NumPy disponível)"""
+    return _bulk_validate(values, 11, _CPF_PESOS_1, _CPF_PESOS_2, is_valid_cpf)
+
+
+def bulk_validate_cnpj(values: Iterable[str]) -> Union['np.ndarray', List[bool]]:
+    """Valida CNPJs em lote; retorna máscara booleana (ndarray se NumPy disponível)"""
+    return _bulk_validate(values, 14, _CNPJ_PESOS_1, _CNPJ_PESOS_2, is_valid_cnpj)
@@ -0,0 +1,180 @@
+"""
+Warm start da sessão do Telegram
+Sessão e cache de entidades persistidos localmente, peer do bot resolvido e
+conexão com o DC aberta antes de o /health reportar pronto; tempos de cada
+fase ficam disponíveis para o manager
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional, Union
+
+from telethon import TelegramClient, utils
+from telethon.tl import types
+
+from update_filter import default_chat, parse_chat
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SESSION_NAME = os.getenv('SESSION_NAME', os.path.join(DATA_DIR, 'telegram_bridge'))
+ENTITY_CACHE_PATH = os.getenv('ENTITY_CACHE_PATH', os.path.join(DATA_DIR, 'entity_cache.json'))
+CACHE_PREWARM_ENABLED = os.getenv('CACHE_PREWARM', 'true').lower() == 'true'
+CACHE_PREWARM_LIMIT = int(os.getenv('CACHE_PREWARM_LIMIT', '5000'))
+
+
+def create_client(session: Optional[str] = None) -> TelegramClient:
+    """Cliente com sessão SQLite persistida em data/ (ou SESSION_NAME)"""
+    session = session or SESSION_NAME
+    os.makedirs(os.path.dirname(os.path.abspath(session)), exist_ok=True)
+    return TelegramClient(
+        session,
+        int(os.getenv('API_ID', '0')),
+        os.getenv('API_HASH', ''),
+        connection_retries=3,
+        retry_delay=1,
+        auto_reconnect=True,
+        catch_up=False,
+        lang_code='pt'
+    )
+
+
+class EntityCache:
+    """Cache persistido de peers resolvidos (id + access_hash) para resolução offline"""
+
+    def __init__(self, path: str = ENTITY_CACHE_PATH):
+        self.path = path
+        self._entries: Dict[str, dict] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Cache de entidades ignorado ({e})")
+
+    def get(self, key: Union[str, int]):
+        entry = self._entries.get(str(key))
+        if not entry:
+            return None
+        if entry['type'] == 'user':
+            return types.InputPeerUser(entry['id'], entry['access_hash'])
+        if entry['type'] == 'channel':
+            return types.InputPeerChannel(entry['id'], entry['access_hash'])
+        return types.InputPeerChat(entry['id'])
+
+    def put(self, key: Union[str, int], input_peer):
+        if isinstance(input_peer, types.InputPeerUser):
+            entry = {'type': 'user', 'id': input_peer.user_id, 'access_hash': input_peer.access_hash}
+        elif isinstance(input_peer, types.InputPeerChannel):
+            entry = {'type': 'channel', 'id': input_peer.channel_id, 'access_hash': input_peer.access_hash}
+        elif isinstance(input_peer, types.InputPeerChat):
+            entry = {'type': 'chat', 'id': input_peer.chat_id}
+        else:
+            return
+        self._entries[str(key)] = entry
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def forget(self, key: Union[str, int]):
+        self._entries.pop(str(key), None)
+
+
+class StartupTimer:
+    """Tempos das fases de inicialização e estado de prontidão"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.phases: Dict[str, float] = {}
+        self.state = 'starting'
+        self.ready_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def mark_ready(self):
+        self.state = 'ready'
+        self.ready_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == 'ready'
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "phases_ms": dict(self.phases),
+            "time_to_ready_ms": round((self.ready_at - self.started_at) * 1000, 1) if self.ready_at else None,
+            "error": self.error
+        }
+
+
+readiness = StartupTimer()
+
+
+def health_fields() -> dict:
+    """Campos para o payload do /health do serviço (lidos pelo manager)"""
+    return {"ready": readiness.ready, "startup": readiness.to_dict()}
+
+
+async def warm_start(client: TelegramClient, dispatcher, chat: Optional[Union[str, int]] = None,
+                     cache=None, store=None, entity_cache: Optional[EntityCache] = None) -> StartupTimer:
+    """Executa o pipeline de warm start e marca o serviço como pronto
+
+    dispatcher: BotUpdateDispatcher; cache/store: ResultCache e HistoryStore
+    opcionais para pré-aquecer o cache com os resultados mais recentes.
+    """
+    chat = parse_chat(chat) if chat is not None else default_chat()
+    entity_cache = entity_cache or EntityCache()
+    try:
+        with readiness.phase('connect'):
+            await client.connect()
+
+        if not await client.is_user_authorized():
+            readiness.state = 'auth_required'
+            logger.warning("Sessão do Telegram não autorizada; warm start interrompido")
+            return readiness
+
+        # Primeira chamada autenticada: conclui o handshake com o DC e guarda
+        # o próprio id (usado pelo dispatcher de updates)
+        with readiness.phase('dc_warmup'):
+            await client.get_me(input_peer=True)
+
+        with readiness.phase('resolve_peer'):
+            input_peer = entity_cache.get(chat)
+            if input_peer is None:
+                input_peer = await client.get_input_entity(chat)
+                entity_cache.put(chat, input_peer)
+                logger.info(f"Peer {chat} resolvido na rede e salvo no cache ({utils.get_peer_id(input_peer)})")
+
+        with readiness.phase('dispatcher'):
+            await dispatcher.start(input_peer)
+
+        if cache is not None and store is not None and CACHE_PREWARM_ENABLED:
+            with readiness.phase('cache_prewarm'):
+                rows = await asyncio.to_thread(store.recent_results, CACHE_PREWARM_LIMIT)
+                # Mais antigos primeiro, para os recentes ficarem no topo do LRU
+                for query_type, value, result, stored_at in reversed(rows):
+                    cache.set(query_type, value, result, stored_at)
+                logger.info(f"Cache pré-aquecido com {len(rows)} resultados do histórico")
+
+        readiness.mark_ready()
+        logger.info(f"✅ Warm start concluído: {readiness.to_dict()['phases_ms']}")
+    except Exception as e:
+        readiness.state = 'failed'
+        readiness.error = str(e)
+        logger.error(f"Erro no warm start: {e}")
+    return readiness
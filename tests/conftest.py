@@ -0,0 +1,12 @@
+"""
+Testes unitários da lógica pura (sem Telegram, rede ou processos reais)
+Os módulos do serviço Python são importados como no uvicorn (cwd telegram_service)
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'telegram_service')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
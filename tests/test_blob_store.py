@@ -0,0 +1,28 @@
+import pytest
+
+from blob_store import content_disposition, parse_range
+
+
+def test_content_disposition_nome_ascii():
+    assert content_disposition('relatorio.pdf') == \
+        "attachment; filename=\"relatorio.pdf\"; filename*=UTF-8''relatorio.pdf"
+
+
+def test_content_disposition_nome_unicode_codificavel_em_latin1():
+    header = content_disposition('relatório "final" 📄.pdf')
+    header.encode('latin-1')
+    assert 'filename="relatorio final .pdf"' in header
+    assert "filename*=UTF-8''relat%C3%B3rio%20%22final%22%20%F0%9F%93%84.pdf" in header
+
+
+def test_content_disposition_sem_caracteres_ascii():
+    assert 'filename="arquivo"' in content_disposition('报告')
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range('bytes=0-9', 100) == (0, 9)
+    assert parse_range('bytes=90-', 100) == (90, 99)
+    assert parse_range('bytes=-10', 100) == (90, 99)
+    with pytest.raises(ValueError):
+        parse_range('bytes=200-300', 100)
@@ -0,0 +1,147 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import bot_router
+from bot_router import BotHealth, BotRouter, RouteConfig, load_routes
+from reply_assembler import AssembledReply, CompletionRule
+from update_filter import BotMessage
+
+
+def test_rotas_padrao_usam_chat_id_numerico(monkeypatch):
+    monkeypatch.setenv('CHAT_ID', '-1001234567890')
+    monkeypatch.delenv('BOT_ROUTES', raising=False)
+    routes = load_routes()
+    assert routes['cpf'].bots == [-1001234567890]
+
+
+def test_bot_routes_sobrescreve(monkeypatch):
+    monkeypatch.setenv('CHAT_ID', '@padrao')
+    monkeypatch.setenv('BOT_ROUTES', json.dumps({
+        'cpf': {'bots': ['@botA', -100987], 'hedge': True},
+        'nome': ['@botB']
+    }))
+    routes = load_routes()
+    assert routes['cpf'].bots == ['@botA', -100987]
+    assert routes['cpf'].hedge
+    assert routes['nome'].bots == ['@botB']
+    assert routes['placa'].bots == ['@padrao']
+
+
+def _router(bots, hedge=False, latency=None):
+    return BotRouter(None, routes={'cpf': RouteConfig(bots, hedge)}, latency=latency)
+
+
+def _reply(text):
+    return AssembledReply([SimpleNamespace(id=1, text=text)], 0, 10.0, True)
+
+
+def test_cooldown_apos_falhas_seguidas():
+    health = BotHealth()
+    health.record_success(500)
+    for _ in range(bot_router.BOT_FAILURE_THRESHOLD):
+        health.record_failure()
+    assert health.in_cooldown and health.score < 0
+    assert BotHealth().score > health.score
+
+
+def test_failover_para_o_proximo_bot():
+    router = _router(['@a', '@b'])
+
+    async def send(endpoint, query_type, command):
+        if endpoint.chat == '@a':
+            raise asyncio.TimeoutError()
+        return _reply(f"{endpoint.chat} {command}")
+    router._send = send
+    reply, chat = asyncio.run(router.query('cpf', '12345678909'))
+    assert chat == '@b' and reply.text == '@b /cpf 12345678909'
+    assert router.failovers == 1
+    assert router.endpoints['@a'].health.consecutive_failures == 1
+
+
+def test_todos_falham_levanta_ultimo_erro():
+    router = _router(['@a', '@b'])
+
+    async def send(endpoint, query_type, command):
+        raise ConnectionError(endpoint.chat)
+    router._send = send
+    with pytest.raises(ConnectionError, match='@b'):
+        asyncio.run(router.query('cpf', '1'))
+
+
+def test_hedge_aciona_segundo_bot_e_cancela_o_perdedor():
+    latency = SimpleNamespace(quantile=lambda query_type, q: 20.0)
+    router = _router(['@lento', '@rapido'], hedge=True, latency=latency)
+    cancelled = []
+
+    async def send(endpoint, query_type, command):
+        try:
+            await asyncio.sleep(1 if endpoint.chat == '@lento' else 0)
+        except asyncio.CancelledError:
+            cancelled.append(endpoint.chat)
+            raise
+        return _reply(endpoint.chat)
+    router._send = send
+
+    async def run():
+        result = await router.query('cpf', '1')
+        await asyncio.sleep(0)
+        return result
+    reply, chat = asyncio.run(run())
+    assert chat == '@rapido' and router.hedges == 1
+    assert cancelled == ['@lento']
+
+
+def test_resposta_atrasada_do_perdedor_nao_vai_para_o_proximo_usuario():
+    latency = SimpleNamespace(quantile=lambda query_type, q: 20.0, deadline=lambda query_type: 5.0,
+                              record=lambda *a: None, record_timeout=lambda *a: None)
+    router = _router(['@lento', '@rapido'], hedge=True, latency=latency)
+    for endpoint in router.endpoints.values():
+        endpoint.assembler.rules = {'cpf': CompletionRule(settle=0.05)}
+    sent = []
+
+    class FakeClient:
+        async def send_message(self, peer, command):
+            message_id = len(sent) * 10 + 10
+            sent.append(message_id)
+            return SimpleNamespace(id=message_id)
+    router.client = FakeClient()
+    lento = router.endpoints['@lento'].assembler
+    rapido = router.endpoints['@rapido'].assembler
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        # Usuário 1: @lento (10) não responde a tempo, @rapido (20) vence o hedge
+        loop.call_later(0.04, rapido.on_message, BotMessage(21, 'rapido: usuario 1', False, 20, None))
+        first, _ = await router.query('cpf', '1')
+        # Usuário 2 vai para @lento (30); a resposta sem citação do comando 10
+        # chega depois, e só então a do usuário 2
+        router.routes['cpf'].hedge = False
+        loop.call_later(0.01, lento.on_message, BotMessage(31, 'lento: usuario 1', False, None, None))
+        loop.call_later(0.2, lento.on_message, BotMessage(32, 'lento: usuario 2', False, None, None))
+        second, chat = await router.query('cpf', '2')
+        return first, second, chat
+
+    first, second, chat = asyncio.run(run())
+    assert first.text == 'rapido: usuario 1'
+    assert chat == '@lento' and second.text == 'lento: usuario 2'
+
+
+def test_tipo_sem_rota():
+    with pytest.raises(ValueError):
+        asyncio.run(_router(['@a']).query('placa', 'ABC1234'))
+
+
+def test_status_dos_bots_exige_api_key(monkeypatch):
+    monkeypatch.setenv('API_KEY', 'segredo')
+    monkeypatch.setattr(bot_router, '_bot_router', _router(['@a']))
+    app = FastAPI()
+    app.include_router(bot_router.router)
+    client = TestClient(app)
+    assert client.get('/bots').status_code == 401
+    response = client.get('/bots', headers={'x-api-key': 'segredo'})
+    assert response.status_code == 200 and '@a' in response.json()['bots']
@@ -0,0 +1,37 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import drain
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('API_KEY', 'segredo')
+    monkeypatch.setattr(drain, 'drain_state', drain.DrainState())
+    app = FastAPI()
+    app.include_router(drain.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize('method,path', [
+    ('post', '/admin/drain'),
+    ('delete', '/admin/drain'),
+    ('get', '/admin/inflight'),
+])
+def test_rotas_admin_exigem_api_key(client, method, path):
+    assert getattr(client, method)(path).status_code == 401
+    assert getattr(client, method)(path, headers={'x-api-key': 'errada'}).status_code == 401
+    assert getattr(client, method)(path, headers={'x-api-key': 'segredo'}).status_code == 200
+
+
+def test_sem_api_key_configurada_recusa_tudo(client, monkeypatch):
+    monkeypatch.delenv('API_KEY')
+    assert client.post('/admin/drain', headers={'x-api-key': ''}).status_code == 401
+    assert not drain.drain_state.draining
+
+
+def test_drenagem_com_api_key(client):
+    headers = {'x-api-key': 'segredo'}
+    assert client.post('/admin/drain', headers=headers).json()['draining'] is True
+    assert client.delete('/admin/drain', headers=headers).json()['draining'] is False
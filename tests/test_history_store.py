@@ -0,0 +1,38 @@
+import pytest
+
+from history_store import STATUS_NOT_FOUND, HistoryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), flush_interval=0.05)
+    yield store
+    store.close()
+
+
+def test_registro_ruim_nao_descarta_o_lote(store):
+    store.record('cpf', '1', {'nome': 'A'})
+    # Chaves de tipos diferentes: json.dumps(sort_keys=True) levanta TypeError
+    store.record('cpf', '2', {1: 'x', 'b': 2})
+    store.record('cpf', '3', {'nome': 'C'})
+    assert store.flush(timeout=5)
+    assert store.latest_result('cpf', '1')[0] == {'nome': 'A'}
+    assert store.latest_result('cpf', '3')[0] == {'nome': 'C'}
+    assert store.latest_result('cpf', '2') is None
+    assert store._writer.is_alive()
+
+
+def test_respostas_deduplicadas(store):
+    store.record('cpf', '1', {'nome': 'A'})
+    store.record('cpf', '2', {'nome': 'A'})
+    assert store.flush(timeout=5)
+    assert store.reader().execute('SELECT count(*) FROM replies').fetchone()[0] == 1
+
+
+def test_misses_since(store):
+    store.record_miss('cpf', '9', 100.0)
+    store.record_miss('cpf', '8', 50.0)
+    assert store.flush(timeout=5)
+    assert store.misses_since(60) == [('cpf', '9', 100.0)]
+    assert store.reader().execute(
+        'SELECT count(*) FROM queries WHERE status = ?', (STATUS_NOT_FOUND,)).fetchone()[0] == 2
@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import pytest
+
+from drain import DrainState
+from ipc import IPCClient, IPCError, IPCServer
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason='Unix socket')
+
+
+def _run(tmp_path, handlers, scenario, drain=None):
+    path = str(tmp_path / 'bridge.sock')
+
+    async def run():
+        server = IPCServer(handlers, path=path, drain=drain)
+        await server.start()
+        client = IPCClient(path, timeout=2)
+        try:
+            return await scenario(client, server)
+        finally:
+            await client.close()
+            await server.stop()
+    return asyncio.run(run())
+
+
+def test_chamadas_simultaneas_casadas_pelo_id(tmp_path):
+    async def echo(value, delay):
+        await asyncio.sleep(delay)
+        return value
+
+    async def scenario(client, server):
+        # A mais lenta é enviada primeiro e responde por último
+        return await asyncio.gather(client.call('echo', value='lenta', delay=0.1),
+                                    client.call('echo', value='rápida', delay=0))
+    assert _run(tmp_path, {'echo': echo}, scenario) == ['lenta', 'rápida']
+
+
+def test_erro_do_owner_chega_ao_worker(tmp_path):
+    async def fail():
+        raise ConnectionError('Telegram desconectado')
+
+    async def scenario(client, server):
+        with pytest.raises(IPCError) as info:
+            await client.call('fail')
+        assert info.value.type == 'ConnectionError'
+        with pytest.raises(IPCError) as info:
+            await client.call('inexistente')
+        return info.value.type
+    assert _run(tmp_path, {'fail': fail}, scenario) == 'UnknownOperation'
+
+
+def test_owner_em_drenagem_recusa_com_retry_after(tmp_path):
+    drain = DrainState()
+
+    async def ping():
+        return 'pong'
+
+    async def scenario(client, server):
+        assert await client.call('ping') == 'pong'
+        drain.start_drain()
+        with pytest.raises(IPCError) as info:
+            await client.call('ping')
+        return info.value
+    error = _run(tmp_path, {'ping': ping}, scenario, drain=drain)
+    assert error.type == 'Draining' and error.retry_after == 2
+    assert drain.served == 1
+
+
+def test_cliente_reconecta_depois_do_restart_do_owner(tmp_path):
+    async def ping():
+        return 'pong'
+
+    async def scenario(client, server):
+        assert await client.call('ping') == 'pong'
+        await server.stop()
+        await asyncio.sleep(0.05)
+        with pytest.raises((ConnectionError, OSError)):
+            await client.call('ping')
+        await server.start()
+        return await client.call('ping')
+    assert _run(tmp_path, {'ping': ping}, scenario) == 'pong'
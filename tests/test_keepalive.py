@@ -0,0 +1,85 @@
+import asyncio
+
+from telethon.errors import FloodWaitError
+
+from keepalive import SessionKeepalive
+
+
+class FakeClient:
+    def __init__(self, error=None, connected=True):
+        self.error = error
+        self.connected = connected
+        self.connects = 0
+        self.disconnects = 0
+
+    def is_connected(self):
+        return self.connected
+
+    async def __call__(self, request):
+        if self.error is not None:
+            raise self.error
+        return request
+
+    async def connect(self):
+        self.connects += 1
+        self.connected = True
+
+    async def disconnect(self):
+        self.disconnects += 1
+        self.connected = False
+
+
+def _keepalive(client):
+    return SessionKeepalive(client, min_interval=0.01, max_interval=0.1, ping_timeout=1, manager_url=None)
+
+
+def test_ping_rpc_error_conta_como_falha():
+    client = FakeClient(FloodWaitError(request=None, capture=30))
+    assert asyncio.run(_keepalive(client).ping()) is False
+
+
+def test_ping_ok_espaca_intervalo():
+    keepalive = _keepalive(FakeClient())
+
+    async def run():
+        await keepalive._check()
+        keepalive.stop()
+
+    asyncio.run(run())
+    assert keepalive.telegram_connected
+    assert keepalive.interval > keepalive.min_interval
+
+
+def test_reconnect_nao_derruba_transporte_conectado():
+    client = FakeClient()
+    keepalive = _keepalive(client)
+    asyncio.run(keepalive._reconnect())
+    assert client.disconnects == 0 and client.connects == 0
+    assert keepalive.reconnects == 1
+
+
+def test_reconnect_conecta_se_telethon_desistiu():
+    client = FakeClient(connected=False)
+    keepalive = _keepalive(client)
+    asyncio.run(keepalive._reconnect())
+    assert client.connects == 1
+
+
+def test_loop_sobrevive_a_erro_inesperado():
+    keepalive = _keepalive(FakeClient())
+    calls = []
+
+    async def broken_check():
+        calls.append(1)
+        raise RuntimeError('boom')
+
+    keepalive._check = broken_check
+
+    async def run():
+        task = keepalive.start()
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        keepalive.stop()
+
+    asyncio.run(run())
+    assert len(calls) >= 2
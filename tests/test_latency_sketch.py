@@ -0,0 +1,100 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import latency_sketch
+from latency_sketch import LATENCY_PRECISION, LatencyHistogram, LatencyTracker
+
+
+def test_quantis_com_erro_relativo_limitado():
+    hist = LatencyHistogram()
+    for value in range(1, 10001):
+        hist.record(float(value))
+    for q in (0.5, 0.9, 0.99):
+        exato = q * 10000
+        assert exato <= hist.quantile(q) <= exato * (1 + LATENCY_PRECISION) ** 2
+    assert hist.quantile(1.0) == 10000
+
+
+def test_quantil_nunca_passa_do_maximo_observado():
+    hist = LatencyHistogram()
+    hist.record(1234.0)
+    assert hist.quantile(0.99) == 1234.0
+    assert LatencyHistogram().quantile(0.5) is None
+
+
+def test_valores_fora_da_faixa_vao_para_as_pontas():
+    hist = LatencyHistogram()
+    hist.record(0.0)
+    hist.record(10_000_000.0)
+    assert hist.counts[0] == 1
+    assert hist.counts[LatencyHistogram._bucket(latency_sketch.LATENCY_MAX_MS)] == 1
+
+
+def test_prazo_padrao_sem_amostras_suficientes():
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(4):
+        tracker.record('cpf', 2000)
+    assert tracker.deadline_ms('cpf') == latency_sketch.DEADLINE_DEFAULT_MS
+
+
+def test_prazo_aprendido_com_margem_e_limites():
+    tracker = LatencyTracker(quantile=0.99, margin_ratio=0.25, margin_ms=1000, min_samples=5)
+    for _ in range(100):
+        tracker.record('cep', 8000)
+    assert tracker.deadline_ms('cep') == pytest.approx(8000 * 1.25 + 1000)
+    assert tracker.deadline('cep') == pytest.approx(11.0)
+    for _ in range(100):
+        tracker.record('nome', 100)
+    assert tracker.deadline_ms('nome') == latency_sketch.DEADLINE_MIN_MS
+    for _ in range(100):
+        tracker.record('mae', 120_000)
+    assert tracker.deadline_ms('mae') == latency_sketch.DEADLINE_MAX_MS
+
+
+def test_janela_rotativa_descarta_dados_antigos(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(latency_sketch.time, 'monotonic', lambda: now[0])
+    tracker = LatencyTracker(window=60, min_samples=1)
+    tracker.record('cpf', 5000)
+    now[0] += 90
+    tracker.record('cpf', 1000)
+    # Janela anterior ainda conta
+    assert tracker.quantile('cpf', 1.0) == 5000
+    now[0] += 150
+    assert tracker.quantile('cpf', 1.0) is None
+
+
+def test_stats_e_timeouts():
+    tracker = LatencyTracker(min_samples=1)
+    tracker.record('placa', 1500)
+    tracker.record_timeout('placa')
+    stats = tracker.stats()['types']['placa']
+    # O timeout conta como amostra no prazo aplicado
+    assert stats['samples'] == 2 and stats['timeouts'] == 1
+    assert stats['max_ms'] == latency_sketch.DEADLINE_MIN_MS
+
+
+def test_timeouts_seguidos_nao_encolhem_o_prazo():
+    tracker = LatencyTracker(quantile=0.99, margin_ratio=0.25, margin_ms=1000, min_samples=5)
+    for _ in range(100):
+        tracker.record('cpf', 2000)
+    deadlines = [tracker.deadline_ms('cpf')]
+    # O bot ficou lento para parte das consultas: só as rápidas concluem
+    for _ in range(20):
+        for _ in range(10):
+            tracker.record('cpf', 2000)
+        for _ in range(3):
+            tracker.record_timeout('cpf', deadlines[-1])
+        deadlines.append(tracker.deadline_ms('cpf'))
+    assert deadlines == sorted(deadlines)
+    assert deadlines[-1] == latency_sketch.DEADLINE_MAX_MS
+
+
+def test_rota_de_latencia_exige_api_key(monkeypatch):
+    monkeypatch.setenv('API_KEY', 'segredo')
+    app = FastAPI()
+    app.include_router(latency_sketch.router)
+    client = TestClient(app)
+    assert client.get('/latency').status_code == 401
+    assert client.get('/latency', headers={'x-api-key': 'segredo'}).status_code == 200
@@ -0,0 +1,268 @@
+import asyncio
+import copy
+import importlib
+import socket
+import sys
+
+import pytest
+
+import process_control
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # O manager cria manager.log no diretório atual ao ser importado
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module('server')
+    monkeypatch.setattr(module, 'services_state', copy.copy(module.services_state))
+    module.services_state['python'] = dict(module.services_state['python'], replicas={})
+    monkeypatch.setattr(module, 'python_active', dict(module.python_active))
+    monkeypatch.setattr(module, 'MANAGER_STATE_FILE', str(tmp_path / 'state.json'))
+    monkeypatch.setattr(module, 'SESSION_BASE', str(tmp_path / 'telegram_bridge'))
+    monkeypatch.setattr(module, 'PYTHON_DEPLOY_MODE', 'bluegreen')
+    monkeypatch.setattr(module, 'PYTHON_DRAIN_SECONDS', 0)
+    return module
+
+
+def _sleeper(name):
+    return process_control.spawn(name, [sys.executable, '-c', 'import time; time.sleep(30)'])
+
+
+def _listening_socket():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen()
+    return sock
+
+
+def _running(server, process):
+    state = server.services_state['python']
+    state.update(process=process, pid=process.pid, status='running', generation=1)
+    server.listen_sockets[server.PYTHON_SERVICE_PORT] = _listening_socket()
+
+
+def _cleanup(server, *processes):
+    for process in processes:
+        if process.poll() is None:
+            process_control.kill_group(process.pid, None, process.create_time)
+            process.wait()
+    for port in list(server.listen_sockets):
+        server.release_listen_socket(port)
+
+
+def test_cor_sem_sessao_cai_para_parar_e_iniciar(server, monkeypatch):
+    calls = []
+
+    async def stop(service_name, replica=0):
+        calls.append(('stop', service_name))
+
+    async def start(service_name, replica=0, extra_env=None):
+        calls.append(('start', service_name))
+        return True
+    monkeypatch.setattr(server, 'stop_instance', stop)
+    monkeypatch.setattr(server, 'start_instance', start)
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, 'sleep', lambda seconds: real_sleep(0))
+    old = _sleeper('old')
+    _running(server, old)
+    try:
+        assert asyncio.run(server.restart_python_service())
+    finally:
+        _cleanup(server, old)
+    assert calls == [('stop', 'python'), ('start', 'python')]
+
+
+def test_falha_no_warm_start_encerra_a_nova_cor_e_libera_a_porta(server, monkeypatch, tmp_path):
+    (tmp_path / 'telegram_bridge_green.session').touch()
+    old = _sleeper('old')
+    _running(server, old)
+    spawned = []
+
+    async def acquire(port, host='0.0.0.0'):
+        server.listen_sockets[port] = _listening_socket()
+        return server.listen_sockets[port]
+
+    def spawn(port, extra_env=None, sock=None):
+        spawned.append(_sleeper('new'))
+        return spawned[-1]
+
+    async def not_ready(port, process):
+        return None
+    monkeypatch.setattr(server, 'acquire_listen_socket', acquire)
+    monkeypatch.setattr(server, 'spawn_python_process', spawn)
+    monkeypatch.setattr(server, 'wait_python_ready', not_ready)
+    try:
+        assert asyncio.run(server.restart_python_service()) is False
+        assert not process_control.group_alive(spawned[0].pid, None, spawned[0].create_time)
+        assert server.PYTHON_STANDBY_PORT not in server.listen_sockets
+        assert server.python_active['color'] == 'blue'
+        assert old.poll() is None
+    finally:
+        _cleanup(server, old, *spawned)
+
+
+def test_troca_o_upstream_e_depois_drena_a_cor_antiga(server, monkeypatch, tmp_path):
+    (tmp_path / 'telegram_bridge_green.session').touch()
+    old = _sleeper('old')
+    _running(server, old)
+    spawned = []
+    events = []
+
+    async def acquire(port, host='0.0.0.0'):
+        server.listen_sockets[port] = _listening_socket()
+        return server.listen_sockets[port]
+
+    def spawn(port, extra_env=None, sock=None):
+        events.append(('spawn', extra_env))
+        spawned.append(_sleeper('new'))
+        return spawned[-1]
+
+    async def ready(port, process):
+        return {'ready': True}
+
+    async def drain(port, timeout):
+        events.append(('drain', port))
+        return 0
+
+    async def upstream():
+        events.append(('upstream', server.python_active['color']))
+        return True
+    monkeypatch.setattr(server, 'acquire_listen_socket', acquire)
+    monkeypatch.setattr(server, 'spawn_python_process', spawn)
+    monkeypatch.setattr(server, 'wait_python_ready', ready)
+    monkeypatch.setattr(server, 'drain_service', drain)
+    monkeypatch.setattr(server, 'set_node_upstream', upstream)
+
+    async def run():
+        assert await server.restart_python_service()
+        await asyncio.gather(*server.background_tasks)
+    try:
+        asyncio.run(run())
+        assert events == [
+            ('spawn', {'SESSION_NAME': str(tmp_path / 'telegram_bridge_green')}),
+            ('upstream', 'green'),
+            ('drain', server.PYTHON_SERVICE_PORT),
+        ]
+        assert server.python_active == {'color': 'green', 'port': server.PYTHON_STANDBY_PORT}
+        assert old.poll() is not None
+        assert server.PYTHON_SERVICE_PORT not in server.listen_sockets
+        assert server.services_state['python']['generation'] == 2
+    finally:
+        _cleanup(server, old, *spawned)
+
+
+def test_modo_split_pelo_fluxo_generico_inicia_e_para_o_owner(server, monkeypatch):
+    monkeypatch.setattr(server, 'PYTHON_SERVICE_MODE', 'split')
+    events = []
+    spawned = []
+
+    async def acquire(port, host='0.0.0.0'):
+        server.listen_sockets[port] = _listening_socket()
+        return server.listen_sockets[port]
+
+    async def not_running(port, timeout=5):
+        return False
+
+    def spawn(port, host='0.0.0.0', role='all', workers=None, extra_env=None, sock=None):
+        events.append(('spawn', role, port))
+        spawned.append(_sleeper(role))
+        return spawned[-1]
+
+    async def ready(port, process):
+        return {'ready': True, 'startup': {'role': 'owner' if port == server.PYTHON_OWNER_PORT else 'worker'}}
+
+    async def drain(port, timeout=None):
+        events.append(('drain', port))
+        return 0
+    monkeypatch.setattr(server, 'acquire_listen_socket', acquire)
+    monkeypatch.setattr(server, 'check_service_health', not_running)
+    monkeypatch.setattr(server, 'spawn_python_process', spawn)
+    monkeypatch.setattr(server, 'wait_python_ready', ready)
+    monkeypatch.setattr(server, 'wait_instance_ready', lambda spec, port, process: ready(port, process))
+    monkeypatch.setattr(server, 'drain_service', drain)
+
+    async def run():
+        assert await server.start_instance('python')
+        state = dict(server.services_state['python'])
+        assert await server.stop_instance('python')
+        return state
+    try:
+        state = asyncio.run(run())
+        assert events == [
+            ('spawn', 'owner', server.PYTHON_OWNER_PORT),
+            ('spawn', 'worker', server.PYTHON_SERVICE_PORT),
+            ('drain', server.PYTHON_OWNER_PORT),
+        ]
+        assert state['mode'] == 'split' and state['owner_pid'] == spawned[0].pid
+        assert state['startup_timings']['service'] == {'role': 'owner'}
+        assert all(process.poll() is not None for process in spawned)
+        assert server.services_state['python']['owner_process'] is None
+        assert server.services_state['python']['status'] == 'stopped'
+    finally:
+        _cleanup(server, *spawned)
+
+
+def test_readota_processo_so_com_o_mesmo_create_time(server):
+    process = _sleeper('adotado')
+    try:
+        adopted = server.adopt_process(process.pid, process.create_time, 'python-8001')
+        assert adopted is not None and adopted.poll() is None
+        assert adopted.create_time == process.create_time
+        assert server.adopt_process(process.pid, process.create_time - 50) is None
+        assert server.adopt_process(process.pid, None) is None
+        adopted.kill()
+        process.wait()
+        assert adopted.poll() == -1
+    finally:
+        _cleanup(server, process)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_socket_de_escuta_reaproveitado_e_herdavel(server, monkeypatch):
+    monkeypatch.setattr(server, 'SOCKET_HANDOFF', True)
+    port = _free_port()
+
+    async def run():
+        first = await server.acquire_listen_socket(port, '127.0.0.1')
+        return first, await server.acquire_listen_socket(port, '127.0.0.1')
+    first, second = asyncio.run(run())
+    try:
+        assert first is second and first.get_inheritable()
+        # Conexões esperam no backlog mesmo sem processo filho
+        socket.create_connection(('127.0.0.1', port), timeout=1).close()
+    finally:
+        server.release_listen_socket(port)
+    assert port not in server.listen_sockets
+    with pytest.raises(OSError):
+        socket.create_connection(('127.0.0.1', port), timeout=1)
+
+
+def test_sem_handoff_nao_abre_socket(server, monkeypatch):
+    monkeypatch.setattr(server, 'SOCKET_HANDOFF', False)
+    assert asyncio.run(server.acquire_listen_socket(_free_port())) is None
+
+
+def test_reciclagem_pulada_enquanto_outra_operacao_segura_o_lock(server, monkeypatch):
+    calls = []
+
+    async def restart():
+        calls.append('restart')
+        return True
+    monkeypatch.setattr(server, 'restart_python_service', restart)
+    monkeypatch.setattr(server, 'service_lock', asyncio.Lock())
+    process = _sleeper('reciclado')
+    _running(server, process)
+
+    async def run():
+        async with server.service_lock:
+            await server.check_python_recycle()
+    try:
+        asyncio.run(run())
+    finally:
+        _cleanup(server, process)
+    assert calls == []
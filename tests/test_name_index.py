@@ -0,0 +1,64 @@
+import random
+
+
+from name_index import NameIndex, TrigramIndex, name_trigrams, normalize_name
+
+
+def test_normalize_name_ignora_acentos_caixa_e_particulas():
+    assert normalize_name('JOÃO  da Silva') == 'joao silva'
+    assert normalize_name("Maria d'Ávila dos Santos") == 'maria avila santos'
+    assert normalize_name('  ') == ''
+    assert normalize_name(None) == ''
+
+
+def test_trigramas_com_padding():
+    assert name_trigrams('ana') == {'  a', ' an', 'ana', 'na '}
+
+
+def test_variacoes_do_mesmo_nome_compartilham_entrada():
+    index = TrigramIndex()
+    first = index.add('José da Silva', seen_at=1)
+    assert index.add('JOSE SILVA', seen_at=2) == first
+    assert len(index) == 1
+    # Mantém o valor consultado mais recente
+    assert index.exact('jose de silva').value == 'JOSE SILVA'
+    assert index.add('...') is None
+
+
+def test_busca_por_similaridade():
+    index = TrigramIndex()
+    index.add('Maria Aparecida Ferreira', seen_at=1)
+    index.add('Carlos Alberto Souza', seen_at=1)
+    results = index.search('Maria Aparecida Fereira', min_score=0.7)
+    assert [entry.value for entry, _ in results] == ['Maria Aparecida Ferreira']
+    assert 0.7 <= results[0][1] < 1.0
+    assert index.search('Carlos Alberto Souza', limit=1)[0][1] == 1.0
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def test_filtro_por_prefixo_equivale_a_forca_bruta():
+    rng = random.Random(7)
+    prenomes = ['ana', 'joao', 'maria', 'jose', 'paulo', 'luiza', 'pedro', 'carla']
+    sobrenomes = ['silva', 'souza', 'santos', 'oliveira', 'pereira', 'lima', 'costa']
+    index = TrigramIndex()
+    nomes = set()
+    for _ in range(300):
+        nome = ' '.join([rng.choice(prenomes)] + rng.sample(sobrenomes, rng.randint(1, 3)))
+        nomes.add(nome)
+        index.add(nome, seen_at=0)
+    for consulta in ['maria silva santos', 'jose oliveira', 'ana lima costa pereira']:
+        grams = name_trigrams(consulta)
+        esperado = {n for n in nomes if _jaccard(grams, name_trigrams(n)) >= 0.6}
+        obtido = {entry.normalized for entry, _ in index.search(consulta, limit=1000, min_score=0.6)}
+        assert obtido == esperado
+
+
+def test_name_index_por_tipo():
+    names = NameIndex()
+    names.add('nome', 'João Silva')
+    assert names.best_match('nome', 'joao da silva') == ('João Silva', 1.0)
+    assert names.best_match('mae', 'joao da silva') is None
+    assert names.best_match('cpf', 'joao') is None
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+from negative_cache import BloomFilter, MissLog, NegativeCache, is_negative_reply
+
+
+def test_respostas_negativas():
+    assert is_negative_reply('❌ CPF não encontrado!')
+    assert is_negative_reply('Nenhum resultado encontrado para 52998224725')
+    assert is_negative_reply('\n  Sem registros.  \n')
+
+
+def test_relatorio_positivo_com_campo_negativo():
+    relatorio = '🔍 CONSULTA DE CPF\n\nNome: FULANO DE TAL\nÓbito: Sem registro\nEmail: não encontrado'
+    assert not is_negative_reply(relatorio)
+
+
+def test_campo_rotulado_na_primeira_linha():
+    assert not is_negative_reply('Email: não encontrado\nNome: FULANO')
+
+
+def test_texto_vazio():
+    assert not is_negative_reply(None)
+    assert not is_negative_reply('   ')
+
+
+def test_bloom_sem_falso_negativo():
+    bloom = BloomFilter(1000)
+    chaves = [f'cpf\x1f{i}'.encode() for i in range(1000)]
+    for chave in chaves:
+        bloom.add(chave)
+    assert all(chave in bloom for chave in chaves)
+
+
+def _cache(records=None, sink=None):
+    return NegativeCache(ttls={'cpf': 3600}, history_source=lambda since: list(records or []),
+                         history_sink=sink or (lambda *args: None))
+
+
+def test_add_e_expiracao():
+    persisted = []
+    cache = _cache(sink=lambda *args: persisted.append(args))
+    cache.add('cpf', '1')
+    cache.add('cpf', '2', ts=time.time() - 7200)
+    assert cache.contains('cpf', '1')
+    assert not cache.contains('cpf', '2')
+    assert [value for _, value, _ in persisted] == ['1', '2']
+
+
+def test_rebuild_a_partir_do_historico():
+    now = time.time()
+    cache = _cache(records=[('cpf', 'a', now - 10), ('cpf', 'b', now - 7200), ('cnpj', 'c', now)])
+    cache.rebuild()
+    assert cache.contains('cpf', 'a')
+    assert not cache.contains('cpf', 'b')
+    # Tipo sem janela configurada não entra no cache
+    assert not cache.contains('cnpj', 'c')
+
+
+def test_add_durante_o_rebuild_nao_se_perde():
+    now = time.time()
+    cache = None
+
+    def source(since):
+        # Consulta chega ao event loop enquanto a thread lê o histórico
+        cache.add('cpf', 'novo')
+        return [('cpf', 'antigo', now - 10)]
+    cache = NegativeCache(ttls={'cpf': 3600}, history_source=source, history_sink=lambda *args: None)
+    cache.rebuild()
+    assert cache.contains('cpf', 'antigo')
+    assert cache.contains('cpf', 'novo')
+
+
+def test_add_ainda_nao_persistido_sobrevive_ao_rebuild():
+    persisted = threading.Event()
+    release = threading.Event()
+
+    def sink(*args):
+        release.wait(5)
+        persisted.set()
+
+    async def run():
+        cache = NegativeCache(ttls={'cpf': 3600}, history_source=lambda since: [], history_sink=sink)
+        cache.add('cpf', '1')
+        await asyncio.to_thread(cache.rebuild)
+        found = cache.contains('cpf', '1')
+        release.set()
+        await asyncio.to_thread(persisted.wait, 5)
+        return found
+
+    assert asyncio.run(run())
+
+
+def test_compactacao_nao_perde_append_concorrente(tmp_path):
+    log = MissLog(str(tmp_path / 'misses.jsonl'))
+    now = time.time()
+    log.append('cpf', 'velho', now - 7200)
+    log.append('cpf', 'a', now)
+    read_since = log.read_since
+
+    def read_with_concurrent_append(since):
+        records = read_since(since)
+        # Miss persistido entre a leitura e o os.replace
+        writer = threading.Thread(target=log.append, args=('cpf', 'b', now))
+        writer.start()
+        writer.join(0.2)
+        read_with_concurrent_append.writer = writer
+        return records
+    log.read_since = read_with_concurrent_append
+    log.compact(now - 3600)
+    read_with_concurrent_append.writer.join()
+    assert [value for _, value, _ in read_since(0)] == ['a', 'b']
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from telethon.tl import types
+
+from pagination import detect_pagination, page_indicator
+
+
+def _message(text, buttons, message_id=10):
+    rows = [types.KeyboardButtonRow([types.KeyboardButtonCallback(label, data) for label, data in buttons])]
+    raw = SimpleNamespace(reply_markup=types.ReplyInlineMarkup(rows))
+    return SimpleNamespace(id=message_id, text=text, raw=raw)
+
+
+def test_indicador_no_botao_ou_no_texto():
+    assert page_indicator(_message('resultado', [('2/7', b'noop')])) == (2, 7)
+    assert page_indicator(_message('Nomes...\nPágina 3 de 5', [])) == (3, 5)
+    assert page_indicator(_message('CPF 123/456 encontrado', [])) is None
+    assert page_indicator(_message('9/7', [])) is None
+
+
+def test_pagina_codificada_no_botao_permite_busca_paralela():
+    info = detect_pagination(_message('1/4', [('Próxima ➡️', b'pg:q42:2')]))
+    assert (info.message_id, info.current, info.total) == (10, 1, 4)
+    assert info.data_for(3) == b'pg:q42:3'
+
+
+def test_numero_ambiguo_no_botao_nao_gera_template():
+    info = detect_pagination(_message('1/4', [('»', b'2:2')]))
+    assert info.next_data == b'2:2' and info.data_template is None
+    assert info.data_for(3) is None
+
+
+def test_sem_total_segue_so_pelo_botao_de_proxima():
+    info = detect_pagination(_message('lista', [('next', b'more')]))
+    assert info.current == 1 and info.total is None and info.data_template is None
+
+
+def test_ultima_pagina_ou_sem_botao_nao_pagina():
+    assert detect_pagination(_message('4/4', [('Próxima', b'pg:5')])) is None
+    assert detect_pagination(_message('1/4', [('Voltar', b'back')])) is None
+    assert detect_pagination(SimpleNamespace(id=1, text='1/4', raw=None)) is None
@@ -0,0 +1,78 @@
+import os
+import signal
+import subprocess
+import sys
+
+import psutil
+import pytest
+
+import process_control
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason='grupos de processos POSIX')
+
+
+def _sleeper(**kwargs):
+    return subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'], **kwargs)
+
+
+def test_spawn_registra_create_time_do_lider():
+    process = process_control.spawn('teste', [sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        assert process.create_time == psutil.Process(process.pid).create_time()
+        assert process_control.group_alive(process.pid, None, process.create_time)
+    finally:
+        process_control.kill_group(process.pid, None, process.create_time)
+        process.wait()
+
+
+def test_pid_reaproveitado_nao_recebe_sinal():
+    # Processo fora de um grupo próprio cai no fallback do psutil
+    process = _sleeper()
+    try:
+        outro_create_time = psutil.Process(process.pid).create_time() - 100
+        assert not process_control.signal_group(process.pid, signal.SIGKILL, outro_create_time)
+        assert not process_control.group_alive(process.pid, None, outro_create_time)
+        assert process.poll() is None
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_fallback_com_identidade_confirmada():
+    process = _sleeper()
+    create_time = psutil.Process(process.pid).create_time()
+    assert process_control.group_alive(process.pid, None, create_time)
+    assert process_control.signal_group(process.pid, signal.SIGKILL, create_time)
+    assert process.wait(timeout=5) == -signal.SIGKILL
+
+
+def test_parse_pressure():
+    content = ("some avg10=1.50 avg60=0.75 avg300=0.10 total=123456\n"
+               "full avg10=0.00 avg60=0.00 avg300=0.00 total=42\n")
+    assert process_control.parse_pressure(content) == {
+        'some': {'avg10': 1.5, 'avg60': 0.75, 'avg300': 0.1, 'total_us': 123456},
+        'full': {'avg10': 0.0, 'avg60': 0.0, 'avg300': 0.0, 'total_us': 42},
+    }
+
+
+def test_parse_pressure_vazio_e_campos_ausentes():
+    assert process_control.parse_pressure(None) is None
+    assert process_control.parse_pressure('') is None
+    assert process_control.parse_pressure('some avg10=2.00\n\n') == {
+        'some': {'avg10': 2.0, 'avg60': 0.0, 'avg300': 0.0, 'total_us': 0}
+    }
+
+
+def test_limites_por_nome_ou_servico(monkeypatch):
+    monkeypatch.setenv('SERVICE_CGROUP_LIMITS', '{"python": {"memory_max": "1G"}, "python-8101": {"cpu_weight": 50}}')
+    limits = process_control.load_cgroup_limits()
+    monkeypatch.setattr(process_control, 'CGROUP_LIMITS', limits)
+    assert process_control.limits_for('python-8001')['memory_max'] == '1G'
+    assert process_control.limits_for('python-8001')['cpu_weight'] == 200
+    assert process_control.limits_for('python-8101') == {'cpu_weight': 50}
+    assert process_control.limits_for('redis-6379') == {}
+
+
+def test_limites_invalidos_usam_padroes(monkeypatch):
+    monkeypatch.setenv('SERVICE_CGROUP_LIMITS', 'não é json')
+    assert process_control.load_cgroup_limits() == process_control.DEFAULT_CGROUP_LIMITS
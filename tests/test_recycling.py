@@ -0,0 +1,82 @@
+import pytest
+
+import recycling
+from recycling import MemoryTrend, RecycleMonitor
+
+
+def test_tendencia_precisa_de_tres_amostras():
+    trend = MemoryTrend()
+    trend.add(0, 100)
+    trend.add(10, 110)
+    assert trend.slope() is None
+    assert trend.fitted_latest() == 110
+
+
+def test_tendencia_ignora_pico_isolado():
+    trend = MemoryTrend()
+    for t, mb in [(0, 100), (10, 101), (20, 500), (30, 103), (40, 104)]:
+        trend.add(t, mb)
+    # Reta ajustada fica bem abaixo do pico de 500 MB
+    assert trend.fitted_latest() < 300
+
+
+def test_tendencia_linear():
+    trend = MemoryTrend()
+    for t in range(0, 100, 10):
+        trend.add(t, 200 + t * 0.5)
+    assert trend.slope() == pytest.approx(0.5)
+    assert trend.fitted_latest() == pytest.approx(245)
+
+
+@pytest.fixture
+def limites(monkeypatch):
+    monkeypatch.setattr(recycling, 'RECYCLE_WARMUP_SECONDS', 100)
+    monkeypatch.setattr(recycling, 'RECYCLE_MIN_UPTIME', 200)
+    monkeypatch.setattr(recycling, 'RECYCLE_RSS_GROWTH_MB', 50)
+    monkeypatch.setattr(recycling, 'RECYCLE_MAX_REQUESTS', 1000)
+    monkeypatch.setattr(recycling, 'RECYCLE_MAX_DEFER_SECONDS', 500)
+
+
+def test_gatilho_por_crescimento_de_memoria(limites):
+    monitor = RecycleMonitor(generation=1, started_at=0)
+    for t in range(0, 200, 10):
+        monitor.observe(t, 100, None, 0)
+    assert monitor.baseline_mb == pytest.approx(100)
+    assert monitor.reason is None
+    for t in range(200, 400, 10):
+        monitor.observe(t, 100 + (t - 190), None, 0)
+    assert monitor.reason is not None and 'RSS' in monitor.reason
+    assert monitor.due(400)
+
+
+def test_sem_gatilho_antes_do_uptime_minimo(limites):
+    monitor = RecycleMonitor(generation=1, started_at=0)
+    monitor.observe(150, None, 5000, 0)
+    assert monitor.reason is None
+    monitor.observe(250, None, 5000, 0)
+    assert 'requisições' in monitor.reason
+
+
+def test_adia_com_trafego_alto_ate_o_prazo(limites):
+    monitor = RecycleMonitor(generation=1, started_at=0)
+    monitor.observe(250, None, 1000, 5)
+    monitor.observe(260, None, 2000, 5)
+    assert monitor.rps == pytest.approx(100)
+    assert not monitor.due(260)
+    assert monitor.due(250 + 500)
+
+
+def test_postpone_apos_falha(limites):
+    monitor = RecycleMonitor(generation=1, started_at=0)
+    monitor.observe(250, None, 1000, 0)
+    assert monitor.due(250)
+    monitor.postpone(250, 60)
+    assert not monitor.due(300)
+    assert monitor.due(310)
+
+
+def test_contador_reiniciado_nao_gera_taxa_negativa(limites):
+    monitor = RecycleMonitor(generation=1, started_at=0)
+    monitor.observe(10, None, 500, 0)
+    monitor.observe(20, None, 10, 0)
+    assert monitor.rps is None
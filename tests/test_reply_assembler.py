@@ -0,0 +1,192 @@
+import asyncio
+
+from reply_assembler import CompletionRule, ReplyAssembler, load_completion_rules
+from update_filter import BotMessage
+
+
+def _msg(id, text, reply_to=None, edited=False):
+    return BotMessage(id, text, edited, reply_to, None)
+
+
+def _assembler():
+    return ReplyAssembler(rules={'cpf': CompletionRule(settle=0.05)})
+
+
+def test_resposta_citando_o_comando():
+    async def run():
+        assembler = _assembler()
+        a = assembler.register(10, 'cpf')
+        b = assembler.register(20, 'cpf')
+        assembler.on_message(_msg(21, 'resultado B', reply_to=20))
+        assembler.on_message(_msg(22, 'resultado A', reply_to=10))
+        return await assembler.wait(a, 1), await assembler.wait(b, 1)
+
+    reply_a, reply_b = asyncio.run(run())
+    assert reply_a.text == 'resultado A' and reply_a.complete
+    assert reply_b.text == 'resultado B'
+
+
+def test_pagina_citando_mensagem_do_bot_segue_a_dona():
+    async def run():
+        assembler = _assembler()
+        a = assembler.register(10, 'cpf')
+        b = assembler.register(20, 'cpf')
+        assembler.on_message(_msg(30, 'página 1 de B', reply_to=20))
+        # Página 2 cita a página 1, não o comando: não pode cair em A (mais antiga)
+        assembler.on_message(_msg(31, 'página 2 de B', reply_to=30))
+        assembler.on_message(_msg(32, 'resultado A', reply_to=10))
+        return await assembler.wait(a, 1), await assembler.wait(b, 1)
+
+    reply_a, reply_b = asyncio.run(run())
+    assert reply_a.text == 'resultado A'
+    assert reply_b.text == 'página 1 de B\n\npágina 2 de B'
+
+
+def test_citacao_desconhecida_descartada():
+    async def run():
+        assembler = _assembler()
+        a = assembler.register(10, 'cpf')
+        assembler.on_message(_msg(15, 'página de consulta antiga', reply_to=5))
+        assembler.on_message(_msg(16, 'resultado A'))
+        return await assembler.wait(a, 1)
+
+    assert asyncio.run(run()).text == 'resultado A'
+
+
+def test_placeholder_editado_vira_resultado():
+    async def run():
+        assembler = _assembler()
+        a = assembler.register(10, 'cpf')
+        assembler.on_message(_msg(11, '⏳ Consultando...'))
+        assembler.on_message(_msg(11, 'Nome: FULANO', edited=True))
+        return await assembler.wait(a, 1)
+
+    reply = asyncio.run(run())
+    assert reply.text == 'Nome: FULANO'
+    assert reply.edits == 1
+
+
+def test_timeout_devolve_parcial():
+    async def run():
+        assembler = ReplyAssembler(rules={'cpf': CompletionRule(settle=5)})
+        a = assembler.register(10, 'cpf')
+        assembler.on_message(_msg(11, 'parte 1'))
+        return await assembler.wait(a, 0.05)
+
+    reply = asyncio.run(run())
+    assert reply.text == 'parte 1' and not reply.complete
+
+
+def test_max_messages_e_final_pattern_resolvem_sem_esperar_o_settle():
+    async def run():
+        assembler = ReplyAssembler(rules={
+            'cep': CompletionRule(settle=10, max_messages=1),
+            'cpf': CompletionRule(settle=10, final_pattern=r'fim da consulta'),
+        })
+        cep = assembler.register(10, 'cep')
+        assembler.on_message(_msg(11, 'Rua A', reply_to=10))
+        cpf = assembler.register(20, 'cpf')
+        assembler.on_message(_msg(21, 'parte 1', reply_to=20))
+        assembler.on_message(_msg(22, 'parte 2\nFim da consulta', reply_to=20))
+        return await assembler.wait(cep, 1), await assembler.wait(cpf, 1), assembler.pending_count
+
+    cep, cpf, pending = asyncio.run(run())
+    assert cep.complete and cep.text == 'Rua A'
+    assert cpf.complete and cpf.text == 'parte 1\n\nparte 2\nFim da consulta'
+    assert pending == 0
+
+
+def test_sem_citacao_vai_para_a_requisicao_mais_antiga():
+    async def run():
+        assembler = _assembler()
+        a = assembler.register(10, 'cpf')
+        assembler.register(20, 'cpf')
+        assembler.on_message(_msg(15, 'resposta'))
+        return await assembler.wait(a, 1)
+
+    assert asyncio.run(run()).text == 'resposta'
+
+
+def test_resposta_atrasada_de_requisicao_expirada_nao_vaza():
+    async def run():
+        assembler = _assembler()
+        a = assembler.register(10, 'cpf')
+        try:
+            await assembler.wait(a, 0.01)
+        except asyncio.TimeoutError:
+            pass
+        b = assembler.register(20, 'cpf')
+        # Resposta sem citação do comando 10 chega depois do 20 ser enviado
+        assembler.on_message(_msg(21, 'resultado A'))
+        assembler.on_message(_msg(22, 'resultado A editado', edited=True))
+        await asyncio.sleep(0.1)
+        tombstones = assembler.tombstone_count
+        assembler.on_message(_msg(23, 'resultado B'))
+        return await assembler.wait(b, 1), tombstones
+
+    reply_b, tombstones = asyncio.run(run())
+    assert reply_b.text == 'resultado B'
+    assert tombstones == 0
+
+
+def test_lapide_expira(monkeypatch):
+    import reply_assembler
+    monkeypatch.setattr(reply_assembler, 'REPLY_TOMBSTONE_TTL', 0)
+
+    async def run():
+        assembler = _assembler()
+        task = asyncio.ensure_future(assembler.wait(assembler.register(10, 'cpf'), 1))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        b = assembler.register(20, 'cpf')
+        assembler.on_message(_msg(21, 'resultado B'))
+        return await assembler.wait(b, 1), assembler.tombstone_count, assembler.pending_count
+
+    reply_b, tombstones, pending = asyncio.run(run())
+    assert reply_b.text == 'resultado B'
+    assert (tombstones, pending) == (0, 0)
+
+
+def test_placeholder_longo_e_conteudo():
+    rule = CompletionRule()
+    assert rule.is_placeholder('⏳ Consultando...')
+    assert not rule.is_placeholder('Nome: Fulano\n' + 'consultando histórico ' * 20)
+
+
+def test_regras_sobrescritas_por_ambiente(monkeypatch):
+    monkeypatch.setenv('REPLY_COMPLETION_RULES', '{"cpf": {"settle": 0.5}, "novo": {"max_messages": 2}}')
+    rules = load_completion_rules()
+    assert rules['cpf'].settle == 0.5 and rules['novo'].max_messages == 2
+    monkeypatch.setenv('REPLY_COMPLETION_RULES', '{"cpf": {"final_pattern": "("}}')
+    assert load_completion_rules()['cpf'].final_pattern is None
+
+
+def test_resposta_a_comando_de_outra_sessao_nao_e_atribuida():
+    async def run():
+        assembler = _assembler()
+        a = assembler.register(10, 'cpf')
+        # A outra cor do blue/green envia o comando 11; o bot responde a ele
+        # (sem citação) antes de responder ao 10
+        assembler.on_outgoing(11)
+        assembler.on_message(_msg(12, 'resultado A'))
+        assembler.on_message(_msg(13, 'resultado A, parte 2'))
+        reply_a = await assembler.wait(a, 1)
+        assembler.on_message(_msg(14, 'resultado da outra sessão'))
+        return reply_a, assembler.pending_count, assembler.tombstone_count
+
+    reply_a, pending, tombstones = asyncio.run(run())
+    assert reply_a.text == 'resultado A\n\nresultado A, parte 2'
+    assert (pending, tombstones) == (0, 1)
+
+
+def test_registro_assume_a_lapide_do_proprio_comando():
+    async def run():
+        assembler = _assembler()
+        assembler.on_outgoing(10)
+        assembler.on_message(_msg(11, 'resultado', reply_to=10))
+        a = assembler.register(10, 'cpf')
+        return await assembler.wait(a, 1), assembler.tombstone_count
+
+    reply, tombstones = asyncio.run(run())
+    assert reply.text == 'resultado' and tombstones == 0
@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import reply_search
+from history_store import HistoryStore
+from reply_search import ReplySearch, build_match_query
+
+
+def _fts5_available():
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE t USING fts5(x)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), flush_interval=0.05)
+    yield store
+    store.close()
+
+
+def test_build_match_query_escapa_operadores():
+    assert build_match_query('joão "silva" OR') == '"joão" "silva" "OR"*'
+    assert build_match_query('rua-das flores', prefix=False) == '"rua" "das" "flores"'
+    assert build_match_query('  ...  ') is None
+
+
+@pytest.mark.skipif(not _fts5_available(), reason='SQLite sem FTS5')
+def test_busca_sem_acentos_com_prefixo_e_filtro_por_tipo(store):
+    store.record('cpf', '1', {'nome': 'José Conceição', 'cidade': 'São Paulo'})
+    store.record('placa', 'ABC1234', {'modelo': 'Fusca', 'cidade': 'Sao Paulo'})
+    assert store.flush(timeout=5)
+    search = ReplySearch(store)
+
+    result = search.search('conceicao')
+    assert result['total'] == 1
+    assert result['results'][0]['type'] == 'cpf'
+    assert '[' in result['results'][0]['snippet']
+
+    assert search.search('sao pau')['total'] == 2
+    only_placa = search.search('paulo', query_type='placa')
+    assert only_placa['total'] == 1 and only_placa['results'][0]['query'] == 'ABC1234'
+
+
+@pytest.mark.skipif(not _fts5_available(), reason='SQLite sem FTS5')
+def test_indice_criado_depois_inclui_respostas_antigas_e_novas(store):
+    store.record('cpf', '1', {'nome': 'Maria'})
+    assert store.flush(timeout=5)
+    search = ReplySearch(store)
+    store.record('cpf', '2', {'nome': 'Mariana'})
+    assert store.flush(timeout=5)
+    assert search.search('mari')['total'] == 2
+    pagina = search.search('mari', page=2, page_size=1)
+    assert pagina['total'] == 2 and len(pagina['results']) == 1
+    assert search.search('mari', page=3, page_size=1)['results'] == []
+
+
+@pytest.mark.skipif(not _fts5_available(), reason='SQLite sem FTS5')
+def test_rota_de_busca_exige_api_key(store, monkeypatch):
+    monkeypatch.setenv('API_KEY', 'segredo')
+    store.record('cpf', '1', {'nome': 'Maria'})
+    assert store.flush(timeout=5)
+    monkeypatch.setattr(reply_search, '_search', ReplySearch(store))
+    app = FastAPI()
+    app.include_router(reply_search.router)
+    client = TestClient(app)
+    assert client.get('/search', params={'q': 'maria'}).status_code == 401
+    assert client.get('/search', params={'q': 'maria'}, headers={'x-api-key': 'errada'}).status_code == 401
+    response = client.get('/search', params={'q': 'maria'}, headers={'x-api-key': 'segredo'})
+    assert response.status_code == 200 and response.json()['total'] == 1
@@ -0,0 +1,153 @@
+import asyncio
+import time
+
+import pytest
+
+from result_cache import CachePolicy, RefreshQueue, ResultCache, TelegramUnavailable, serve_with_fallback
+from shm_cache import SharedResultCache
+
+POLICIES = {'cpf': CachePolicy(60, 3600)}
+
+
+@pytest.fixture
+def shared(tmp_path):
+    cache = SharedResultCache(str(tmp_path / 'shm'), slots=64, slot_size=256)
+    yield cache
+    cache.close()
+
+
+def test_lru_local_expira_pelo_stale_ttl():
+    cache = ResultCache(policies=POLICIES)
+    cache.set('cpf', '1', {'nome': 'A'})
+    cache.set('cpf', '2', {'nome': 'B'}, stored_at=time.time() - 7200)
+    entry = cache.get('cpf', '1')
+    assert entry.result == {'nome': 'A'} and cache.is_fresh('cpf', entry)
+    assert cache.get('cpf', '2') is None
+
+
+def test_lru_respeita_max_entries():
+    cache = ResultCache(max_entries=2, policies=POLICIES)
+    for value in '123':
+        cache.set('cpf', value, value)
+    assert cache.get('cpf', '1') is None
+    assert len(cache) == 2
+
+
+def test_acerto_compartilhado_nao_copia_para_o_l1(shared):
+    cache = ResultCache(policies=POLICIES, shared=shared)
+    cache.set('cpf', '1', {'nome': 'A'})
+    assert cache.get('cpf', '1').result == {'nome': 'A'}
+    assert len(cache) == 0
+
+
+def test_invalidacao_em_outro_worker_vale_na_hora(shared, tmp_path):
+    worker_a = ResultCache(policies=POLICIES, shared=shared)
+    other = SharedResultCache(shared.path, slots=64, slot_size=256)
+    worker_b = ResultCache(policies=POLICIES, shared=other)
+    worker_a.set('cpf', '1', {'nome': 'A'})
+    assert worker_b.get('cpf', '1') is not None
+    worker_a.invalidate('cpf', '1')
+    assert worker_b.get('cpf', '1') is None
+    other.close()
+
+
+def test_valor_grande_fica_no_l1_e_invalida_versao_compartilhada(shared):
+    cache = ResultCache(policies=POLICIES, shared=shared)
+    cache.set('cpf', '1', 'curto')
+    grande = 'x' * 1000
+    cache.set('cpf', '1', grande)
+    assert shared.get('cpf', '1') is None
+    assert cache.get('cpf', '1').result == grande
+    assert len(cache) == 1
+
+
+def _serve(cache, fetch, available=True):
+    async def run():
+        refresh = RefreshQueue(cache, fetch=None, capacity_available=lambda: True)
+        result = await serve_with_fallback(cache, refresh, 'cpf', '1', fetch, lambda: available)
+        return result, refresh.pending
+    return asyncio.run(run())
+
+
+def test_resultado_fresco_nao_consulta_o_telegram():
+    cache = ResultCache(policies=POLICIES)
+    cache.set('cpf', '1', {'nome': 'A'})
+
+    async def fetch():
+        raise AssertionError('não deveria consultar')
+    result, pending = _serve(cache, fetch)
+    assert result['nome'] == 'A' and result['cache']['hit'] and not result['cache']['stale']
+
+
+def test_stale_servido_quando_telegram_desconectado():
+    cache = ResultCache(policies=POLICIES)
+    cache.set('cpf', '1', {'nome': 'A'}, stored_at=time.time() - 600)
+
+    async def fetch():
+        raise AssertionError('não deveria consultar')
+    result, pending = _serve(cache, fetch, available=False)
+    assert result['cache']['stale'] and result['cache']['stale_reason'] == 'disconnected'
+    assert pending == 1
+
+
+def test_stale_servido_quando_consulta_falha_por_indisponibilidade():
+    cache = ResultCache(policies=POLICIES)
+    cache.set('cpf', '1', {'nome': 'A'}, stored_at=time.time() - 600)
+
+    async def fetch():
+        raise asyncio.TimeoutError()
+    result, pending = _serve(cache, fetch)
+    assert result['cache']['stale_reason'] == 'timeout' and pending == 1
+
+
+def test_erro_comum_nao_cai_para_stale():
+    cache = ResultCache(policies=POLICIES)
+    cache.set('cpf', '1', {'nome': 'A'}, stored_at=time.time() - 600)
+
+    async def fetch():
+        raise ValueError('resposta inválida')
+    with pytest.raises(ValueError):
+        _serve(cache, fetch)
+
+
+def test_sem_cache_propaga_indisponibilidade():
+    cache = ResultCache(policies=POLICIES)
+
+    async def fetch():
+        raise TelegramUnavailable('restarting')
+    with pytest.raises(TelegramUnavailable):
+        _serve(cache, fetch)
+
+
+def test_consulta_bem_sucedida_atualiza_o_cache():
+    cache = ResultCache(policies=POLICIES)
+
+    async def fetch():
+        return {'nome': 'B'}
+    result, _ = _serve(cache, fetch)
+    assert not result['cache']['hit']
+    assert cache.get('cpf', '1').result == {'nome': 'B'}
+
+
+def test_refresh_queue_espera_capacidade_e_nao_duplica():
+    cache = ResultCache(policies=POLICIES)
+    capacity = [False]
+    calls = []
+
+    async def fetch(query_type, value):
+        calls.append(value)
+        return {'nome': value}
+
+    async def run():
+        queue = RefreshQueue(cache, fetch, lambda: capacity[0], concurrency=1, poll_interval=0.01)
+        assert queue.enqueue('cpf', '1')
+        assert not queue.enqueue('cpf', '1')
+        queue.start()
+        await asyncio.sleep(0.05)
+        assert calls == []
+        capacity[0] = True
+        await asyncio.wait_for(queue._queue.join(), 1)
+        queue.stop()
+        return queue.pending
+    assert asyncio.run(run()) == 0
+    assert calls == ['1'] and cache.get('cpf', '1').result == {'nome': '1'}
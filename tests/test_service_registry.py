@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import service_registry
+from service_registry import ServiceSpec, _start_order, load_registry, supervised_by
+
+
+def _spec(name, **config):
+    config.setdefault('command', [name])
+    config.setdefault('port', 1000)
+    return ServiceSpec(name, config)
+
+
+def _registry_file(tmp_path, services):
+    path = tmp_path / 'services.json'
+    path.write_text(json.dumps({'services': services}), encoding='utf-8')
+    return str(path)
+
+
+def test_ordem_de_inicializacao_coloca_dependencias_primeiro():
+    specs = {
+        'node': _spec('node', depends_on=['python']),
+        'manager': _spec('manager'),
+        'python': _spec('python'),
+    }
+    order = _start_order(specs)
+    assert order.index('python') < order.index('node')
+    assert sorted(order) == ['manager', 'node', 'python']
+
+
+def test_dependencia_circular():
+    specs = {'a': _spec('a', depends_on=['b']), 'b': _spec('b', depends_on=['a'])}
+    with pytest.raises(ValueError, match='circular'):
+        _start_order(specs)
+
+
+def test_dependencia_inexistente():
+    with pytest.raises(ValueError, match='inexistente: redis'):
+        _start_order({'node': _spec('node', depends_on=['redis'])})
+
+
+def test_portas_das_replicas():
+    spec = _spec('python', port=8001, port_step=100, replicas=3)
+    assert spec.replica_ports() == [8001, 8101, 8201]
+    assert _spec('node', port=3000, ports=[3000, 3005], replicas=2).replica_ports() == [3000, 3005]
+
+
+def test_conflito_de_portas_entre_replicas(tmp_path, monkeypatch):
+    monkeypatch.delenv('SERVICES_OVERRIDES', raising=False)
+    path = _registry_file(tmp_path, {
+        'python': {'command': ['py'], 'port': 8001, 'replicas': 2},
+        'node': {'command': ['node'], 'port': 8002},
+    })
+    with pytest.raises(ValueError, match='Porta 8002'):
+        load_registry(path)
+
+
+def test_conflito_com_porta_reservada(tmp_path, monkeypatch):
+    monkeypatch.delenv('SERVICES_OVERRIDES', raising=False)
+    path = _registry_file(tmp_path, {'python': {'command': ['py'], 'port': 8001, 'replicas': 2}})
+    with pytest.raises(ValueError, match='PYTHON_STANDBY_PORT'):
+        load_registry(path, reserved_ports={8002: 'python (PYTHON_STANDBY_PORT)'})
+    assert list(load_registry(path, reserved_ports={8011: 'owner'})) == ['python']
+
+
+def test_overrides_e_supervisor(tmp_path, monkeypatch):
+    path = _registry_file(tmp_path, {
+        'python': {'command': ['py'], 'port': 8001},
+        'manager': {'command': ['server'], 'port': 9000, 'supervisor': 'monitor'},
+    })
+    monkeypatch.setenv('SERVICES_OVERRIDES', json.dumps({'python': {'replicas': 2, 'port_step': 100}}))
+    registry = load_registry(path)
+    assert registry['python'].replica_ports() == [8001, 8101]
+    assert supervised_by(registry, 'manager') == ['python']
+    assert supervised_by(registry, 'monitor') == ['manager']
+
+
+def test_supervisor_invalido():
+    with pytest.raises(ValueError, match='supervisor'):
+        _spec('python', supervisor='systemd')
+
+
+def test_registro_do_repositorio_e_valido(monkeypatch):
+    monkeypatch.delenv('SERVICES_OVERRIDES', raising=False)
+    registry = load_registry(service_registry.SERVICES_FILE)
+    assert {'python', 'node'} <= set(supervised_by(registry, 'manager'))
@@ -0,0 +1,63 @@
+import pytest
+
+from shm_cache import SharedResultCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'shm')
+
+
+def test_set_get_e_sobrescrita(path):
+    cache = SharedResultCache(path, slots=8, slot_size=256)
+    assert cache.set('cpf', '1', {'nome': 'A'}, stored_at=100.0)
+    assert cache.set('cpf', '1', {'nome': 'B'}, stored_at=200.0)
+    assert cache.get('cpf', '1') == ({'nome': 'B'}, 200.0)
+    assert cache.get('cpf', '2') is None
+    assert cache.stats()['used'] == 1
+    cache.close()
+
+
+def test_tombstone_preserva_cadeia_de_sondagem(path):
+    # Dois slots: as chaves colidem e dividem a mesma cadeia
+    cache = SharedResultCache(path, slots=2, slot_size=256)
+    cache.set('cpf', 'a', 'A')
+    cache.set('cpf', 'b', 'B')
+    cache.invalidate('cpf', 'a')
+    assert cache.get('cpf', 'a') is None
+    assert cache.get('cpf', 'b')[0] == 'B'
+    # O slot liberado é reaproveitado sem quebrar a cadeia
+    cache.set('cpf', 'c', 'C')
+    assert cache.get('cpf', 'b')[0] == 'B' and cache.get('cpf', 'c')[0] == 'C'
+    cache.close()
+
+
+def test_tabela_cheia_substitui_a_entrada_mais_antiga(path):
+    cache = SharedResultCache(path, slots=2, slot_size=256)
+    cache.set('cpf', 'a', 'A', stored_at=1.0)
+    cache.set('cpf', 'b', 'B', stored_at=2.0)
+    cache.set('cpf', 'c', 'C', stored_at=3.0)
+    assert cache.get('cpf', 'a') is None
+    assert cache.get('cpf', 'b')[0] == 'B' and cache.get('cpf', 'c')[0] == 'C'
+    cache.close()
+
+
+def test_valor_que_nao_cabe_no_slot(path):
+    cache = SharedResultCache(path, slots=8, slot_size=128)
+    assert not cache.set('cpf', '1', 'x' * 500)
+    assert cache.stats()['oversized'] == 1
+    assert not cache.set('cpf', '1', object())
+    cache.close()
+
+
+def test_outro_processo_ve_as_escritas_e_layout_diferente_recria(path):
+    writer = SharedResultCache(path, slots=8, slot_size=256)
+    reader = SharedResultCache(path, slots=8, slot_size=256)
+    writer.set('cpf', '1', [1, 2, 3])
+    assert reader.get('cpf', '1')[0] == [1, 2, 3]
+    reader.close()
+    writer.close()
+
+    resized = SharedResultCache(path, slots=16, slot_size=256)
+    assert resized.get('cpf', '1') is None
+    resized.close()
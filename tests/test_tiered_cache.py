@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from result_cache import CachePolicy, ResultCache
+from tiered_cache import CacheBackend, MemoryBackend, TieredResultCache, create_backend
+
+POLICIES = {'cpf': CachePolicy(60, 3600)}
+
+
+def _node(backend):
+    return TieredResultCache(ResultCache(policies=POLICIES), backend)
+
+
+def test_backend_incompleto_nao_instancia():
+    class SemPublish(CacheBackend):
+        async def get_many(self, keys):
+            return []
+
+    with pytest.raises(TypeError):
+        SemPublish()
+
+
+def test_create_backend_padrao_desligado():
+    assert create_backend('none') is None
+    assert isinstance(create_backend('memory'), MemoryBackend)
+
+
+def test_l2_compartilhado_entre_nos_e_invalidacao():
+    async def run():
+        backend = MemoryBackend()
+        a, b = _node(backend), _node(backend)
+        await a.start()
+        await b.start()
+        a.set('cpf', '1', {'nome': 'A'})
+        await asyncio.sleep(0)
+        await asyncio.gather(*a._tasks)
+        entry = await b.aget('cpf', '1')
+        assert entry.result == {'nome': 'A'} and b.l2_hits == 1
+
+        a.set('cpf', '1', {'nome': 'A2'})
+        await asyncio.gather(*a._tasks)
+        # b recebeu a invalidação e relê do L2
+        assert b.invalidations_received == 2
+        assert (await b.aget('cpf', '1')).result == {'nome': 'A2'}
+
+    asyncio.run(run())
+
+
+def test_aget_many_um_unico_mget():
+    async def run():
+        backend = MemoryBackend()
+        node = _node(backend)
+        node.set('cpf', '1', 'um')
+        node.set('cpf', '2', 'dois')
+        await asyncio.gather(*node._tasks)
+        other = _node(backend)
+        found = await other.aget_many([('cpf', '1'), ('cpf', '2'), ('cpf', '3')])
+        assert {k[1]: v.result for k, v in found.items()} == {'1': 'um', '2': 'dois'}
+        assert other.l2_misses == 1
+
+    asyncio.run(run())
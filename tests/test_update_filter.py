@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from telethon.tl import types
+
+from update_filter import BotUpdateDispatcher, default_chat, parse_chat
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def test_id_numerico_vira_int():
+    assert parse_chat('-1001234567890') == -1001234567890
+    assert parse_chat(' 123456 ') == 123456
+
+
+def test_username_continua_str():
+    assert parse_chat('@meu_bot') == '@meu_bot'
+    assert parse_chat('https://t.me/meu_bot') == 'https://t.me/meu_bot'
+
+
+def test_int_e_none_inalterados():
+    assert parse_chat(42) == 42
+    assert parse_chat(None) is None
+
+
+def test_default_chat(monkeypatch):
+    monkeypatch.setenv('CHAT_ID', '-1001234567890')
+    assert default_chat() == -1001234567890
+
+
+def _dispatcher():
+    client = SimpleNamespace(add_event_handler=lambda *args: None, remove_event_handler=lambda *args: None)
+    dispatcher = BotUpdateDispatcher(client, '@bot')
+    asyncio.run(dispatcher.start(types.InputPeerUser(42, 1)))
+    received = []
+    dispatcher.subscribe(received.append)
+    return dispatcher, received
+
+
+def _new_message(from_peer, msg_id=5, out=False, text='ok', reply_to=None):
+    message = types.Message(id=msg_id, peer_id=from_peer, date=NOW, message=text, out=out,
+                            reply_to=types.MessageReplyHeader(reply_to_msg_id=reply_to) if reply_to else None)
+    return types.UpdateNewMessage(message, 1, 1)
+
+
+def test_dispatcher_entrega_so_mensagens_recebidas_do_bot():
+    dispatcher, received = _dispatcher()
+    updates = [
+        _new_message(types.PeerUser(42), reply_to=3),
+        _new_message(types.PeerUser(7)),
+        _new_message(types.PeerUser(42), out=True),
+        types.UpdateShortMessage(id=6, user_id=42, message='curta', pts=1, pts_count=1, date=NOW),
+        types.UpdateShortMessage(id=8, user_id=99, message='outro', pts=1, pts_count=1, date=NOW),
+    ]
+    for update in updates:
+        asyncio.run(dispatcher._on_update(update))
+    assert [(m.id, m.text, m.reply_to_msg_id) for m in received] == [(5, 'ok', 3), (6, 'curta', None)]
+    assert (dispatcher.accepted, dispatcher.dropped, dispatcher.outgoing) == (2, 2, 1)
+
+
+def test_comandos_enviados_por_outra_sessao_vao_para_os_subscribers_de_saida():
+    dispatcher, received = _dispatcher()
+    outgoing = []
+    dispatcher.subscribe_outgoing(outgoing.append)
+    updates = [
+        _new_message(types.PeerUser(42), msg_id=10, out=True, text='/cpf 1'),
+        _new_message(types.PeerUser(7), msg_id=11, out=True),
+        types.UpdateEditMessage(_new_message(types.PeerUser(42), msg_id=10, out=True).message, 1, 1),
+        types.UpdateShortMessage(id=12, user_id=42, message='/cpf 2', out=True, pts=1, pts_count=1, date=NOW),
+    ]
+    for update in updates:
+        asyncio.run(dispatcher._on_update(update))
+    assert outgoing == [10, 12] and received == []
+
+
+def test_dispatcher_marca_edicoes_e_isola_erros_dos_subscribers():
+    dispatcher, received = _dispatcher()
+
+    def broken(message):
+        raise RuntimeError('falhou')
+    dispatcher._subscribers.insert(0, broken)
+    message = types.Message(id=5, peer_id=types.PeerUser(42), date=NOW, message='resultado final')
+    asyncio.run(dispatcher._on_update(types.UpdateEditMessage(message, 1, 1)))
+    assert received[0].edited and received[0].text == 'resultado final'
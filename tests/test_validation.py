@@ -0,0 +1,65 @@
+import pytest
+
+import validation
+from validation import ValidationError, validate_query, bulk_validate_cpf, bulk_validate_cnpj
+
+CPF_VALIDO = '52998224725'
+CNPJ_VALIDO = '11222333000181'
+CPF_ARABE = '٥٢٩٩٨٢٢٤٧٢٥'
+
+
+def test_cpf_formatado_normalizado():
+    assert validate_query('cpf', '529.982.247-25') == CPF_VALIDO
+
+
+def test_cpf_digito_invalido():
+    with pytest.raises(ValidationError):
+        validate_query('cpf', '52998224724')
+
+
+def test_cpf_repetido_invalido():
+    assert not validation.is_valid_cpf('11111111111')
+
+
+def test_cpf_com_digitos_unicode_rejeitado():
+    assert not validation.is_valid_cpf(CPF_ARABE)
+    with pytest.raises(ValidationError):
+        validate_query('cpf', CPF_ARABE)
+
+
+def test_cnpj_valido():
+    assert validate_query('cnpj', '11.222.333/0001-81') == CNPJ_VALIDO
+    assert not validation.is_valid_cnpj('11222333000182')
+
+
+def test_telefone_remove_codigo_do_pais():
+    assert validate_query('telefone', '+55 (11) 91234-5678') == '11912345678'
+
+
+def test_placa_mercosul_e_antiga():
+    assert validate_query('placa', 'abc-1d23') == 'ABC1D23'
+    assert validate_query('placa', 'ABC 1234') == 'ABC1234'
+    with pytest.raises(ValidationError):
+        validate_query('placa', 'AB12345')
+
+
+def test_tipo_nao_suportado():
+    with pytest.raises(ValidationError):
+        validate_query('rg', '123')
+
+
+def test_parse_command():
+    assert validation.parse_command('/cpf 529.982.247-25') == ('cpf', CPF_VALIDO)
+
+
+def test_bulk_cpf_igual_ao_escalar():
+    valores = [CPF_VALIDO, '529.982.247-25', '52998224724', '11111111111', '123', CPF_ARABE]
+    assert list(bulk_validate_cpf(valores)) == [True, True, False, False, False, False]
+
+
+def test_bulk_cnpj():
+    assert list(bulk_validate_cnpj([CNPJ_VALIDO, '11222333000182'])) == [True, False]
+
+
+def test_bulk_vazio():
+    assert len(bulk_validate_cpf([])) == 0
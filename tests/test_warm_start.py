@@ -0,0 +1,38 @@
+import json
+
+from telethon.tl import types
+
+from warm_start import EntityCache, StartupTimer
+
+
+def test_entity_cache_persiste_e_reconstroi_input_peer(tmp_path):
+    path = str(tmp_path / 'data' / 'entities.json')
+    cache = EntityCache(path)
+    cache.put('@bot', types.InputPeerUser(42, 777))
+    cache.put(-100123, types.InputPeerChannel(123, 555))
+    cache.put('@ignorado', types.InputPeerSelf())
+
+    reloaded = EntityCache(path)
+    assert reloaded.get('@bot') == types.InputPeerUser(42, 777)
+    assert reloaded.get(-100123) == types.InputPeerChannel(123, 555)
+    assert reloaded.get('@ignorado') is None
+    reloaded.forget('@bot')
+    assert reloaded.get('@bot') is None
+
+
+def test_entity_cache_corrompido_e_ignorado(tmp_path):
+    path = tmp_path / 'entities.json'
+    path.write_text('{corrompido', encoding='utf-8')
+    assert EntityCache(str(path)).get('@bot') is None
+
+
+def test_startup_timer_registra_fases_e_prontidao():
+    timer = StartupTimer()
+    with timer.phase('connect'):
+        pass
+    assert not timer.ready and timer.to_dict()['time_to_ready_ms'] is None
+    timer.mark_ready()
+    data = timer.to_dict()
+    assert data['ready'] and 'connect' in data['phases_ms']
+    assert data['time_to_ready_ms'] >= 0
+    json.dumps(data)